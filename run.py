@@ -6,18 +6,22 @@
 
 import sys
 import os
+import multiprocessing
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-try:
-    from main import main
-    main()
-except ImportError as e:
-    print(f"导入错误: {e}")
-    print("请确保已安装所需依赖:")
-    print("pip install -r requirements.txt")
-    input("按回车键退出...")
-except Exception as e:
-    print(f"运行错误: {e}")
-    input("按回车键退出...")
+# 查重用进程池：spawn 方式的子进程会以 __mp_main__ 重新导入本脚本，入口必须放在 __main__ 判断里
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    try:
+        from main import main
+        main()
+    except ImportError as e:
+        print(f"导入错误: {e}")
+        print("请确保已安装所需依赖:")
+        print("pip install -r requirements.txt")
+        input("按回车键退出...")
+    except Exception as e:
+        print(f"运行错误: {e}")
+        input("按回车键退出...")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+番号提取：预编译正则 + 按文件名缓存（有界 LRU）
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+BANGOU_RE = re.compile(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', re.IGNORECASE)
+CID_RE = re.compile(r'([a-zA-Z]+)(\d+)')
+_ALNUM_RUN = re.compile(r'[A-Za-z0-9]+')
+
+CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def find_id(name: str) -> Optional[str]:
+	"""名称中第一个番号（保留原大小写），没有则 None"""
+	m = BANGOU_RE.search(name)
+	return m.group(1) if m else None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def extract_id(name: str) -> Optional[str]:
+	"""名称中第一个番号（大写），没有则 None"""
+	raw = find_id(name)
+	return raw.upper() if raw else None
+
+
+def extract_ids(names: Iterable[str]) -> List[Optional[str]]:
+	"""批量提取，结果与输入一一对应"""
+	return [extract_id(n) for n in names]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def id_tokens(name: str) -> Tuple[str, ...]:
+	"""名称中所有可作为完整番号匹配（两侧为非字母数字）的片段，大写"""
+	tokens, chain = [], []
+	for m in _ALNUM_RUN.finditer(name):
+		st, txt = m.start(), m.group(0)
+		if chain and not (st == chain[-1][0] + 1 and name[chain[-1][0]] == '-'): chain = []
+		chain.append((m.end(), txt))
+		if txt.isdigit():
+			for k in range(len(chain) - 1):
+				tokens.append('-'.join(c[1] for c in chain[k:]).upper())
+	return tuple(tokens)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cid_to_bangou(stem: str) -> Optional[str]:
+	"""DMM CID（如 h_1234abc00123）转番号 ABC-123，无法识别则 None"""
+	ms = CID_RE.findall(stem)
+	if not ms: return None
+	label, num = ms[-1]
+	if len(label) < 2: return None
+	return f"{label.upper()}-{int(num):03d}"
+
+
+def cache_clear():
+	for f in (find_id, extract_id, id_tokens, cid_to_bangou): f.cache_clear()
+
+
+if __name__ == "__main__":
+	# 微基准：python src/bangou.py [数量]
+	import random, sys, time
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+	rnd = random.Random(0)
+	labels = ["ABP", "SSIS", "IPX", "300NTK", "FC2-PPV", "MIDV", "STARS", "HEYZO"]
+	pool = []
+	for _ in range(max(1, n // 20)):
+		bid = f"{rnd.choice(labels)}-{rnd.randint(1, 9999):03d}"
+		pool.append(rnd.choice(["{}.mp4", "{}-C.mkv", "{}-poster.jpg", "{}-fanart.jpg", "[字幕]{}.chs.ass", "readme.txt"]).format(bid))
+	names = [rnd.choice(pool) for _ in range(n)]
+
+	t = time.perf_counter()
+	for s in names:
+		m = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', s, re.IGNORECASE)
+		_ = m.group(1).upper() if m else None
+	t_old = time.perf_counter() - t
+
+	cache_clear()
+	t = time.perf_counter(); extract_ids(names); t_new = time.perf_counter() - t
+	info = extract_id.cache_info()
+	t = time.perf_counter(); extract_ids(names); t_warm = time.perf_counter() - t
+	print(f"{n} 个文件名（{len(pool)} 个不同）")
+	print(f"  re.search 逐次:   {t_old:.3f}s")
+	print(f"  extract_ids 首轮: {t_new:.3f}s  {info}")
+	print(f"  extract_ids 复用: {t_warm:.3f}s")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件目录库：SQLite 持久化 路径/大小/mtime/扩展名/番号，按目录 mtime 增量重扫；
+以及会话内的内存快照缓存
+"""
+
+import os, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from bangou import extract_id
+from scanner import DirLister, FileRecord
+
+
+def _range(prefix: str):
+	"""path 落在 prefix 目录之下的 [lo, hi) 字符串区间"""
+	base = prefix.rstrip("\\/") + os.sep
+	return base, base[:-1] + chr(ord(os.sep) + 1)
+
+
+class FileCatalog:
+	SCHEMA = """
+		CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER);
+		CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+		CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dir TEXT, name TEXT, ext TEXT,
+			size INTEGER, mtime_ns INTEGER, bangou TEXT);
+		CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+		CREATE INDEX IF NOT EXISTS files_bangou ON files(bangou);
+	"""
+
+	def __init__(self, db_path: Path, workers: Optional[int] = None):
+		self.db_path = Path(db_path)
+		self.workers = workers
+		self.db_path.parent.mkdir(parents=True, exist_ok=True)
+		self.lock = threading.RLock()
+		self.db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+		self.db.executescript(self.SCHEMA)
+		self.db.execute("PRAGMA journal_mode=WAL")
+
+	# ------------ 增量刷新 ------------
+	def refresh(self, root: Path, full: bool = False) -> dict:
+		"""刷新 root 子树：目录 mtime 未变的直接沿用库中记录，只重新列出变化的目录。
+		按层处理：同一层的目录 stat 与列举都并行发出，数据库读写留在当前线程"""
+		stats = {"listed": 0, "reused": 0}
+		root = str(root)
+		lister = DirLister(self.workers)
+		with self.lock, self.db, ThreadPoolExecutor(max_workers=lister.workers, thread_name_prefix="catalog") as pool:
+			level = [(root, os.path.dirname(root))]
+			while level:
+				nxt, changed = [], []
+				for (d, parent), mtime in zip(level, pool.map(_dir_mtime, [d for d, _ in level])):
+					if mtime is None:
+						self._forget(d); continue
+					row = self.db.execute("SELECT mtime_ns FROM dirs WHERE path=?", (d,)).fetchone()
+					if row and row[0] == mtime and not full:
+						stats["reused"] += 1
+						nxt.extend((c, d) for (c,) in self.db.execute("SELECT path FROM dirs WHERE parent=?", (d,)))
+					else:
+						changed.append((d, parent, mtime))
+				for (d, parent, mtime), listing in zip(changed, pool.map(lambda c: _try_list(lister, c[0]), changed)):
+					stats["listed"] += 1
+					nxt.extend((c, d) for c in self._store(d, parent, mtime, listing))
+				level = nxt
+		stats["lister"] = lister.stats.summary()
+		return stats
+
+	def _store(self, d: str, parent: str, mtime: int, listing) -> List[str]:
+		"""写入一个目录的列举结果；listing 为 None 表示目录已无法访问"""
+		if listing is None:
+			self._forget(d); return []
+		files, subdirs = listing
+		rows = [(p, d, os.path.basename(p), os.path.splitext(p)[1].lower(), st.st_size, st.st_mtime_ns, extract_id(os.path.basename(p)))
+			for p, st in files]
+		self.db.execute("DELETE FROM files WHERE dir=?", (d,))
+		self.db.executemany("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?)", rows)
+		alive = set(subdirs)
+		for (old,) in self.db.execute("SELECT path FROM dirs WHERE parent=?", (d,)).fetchall():
+			if old not in alive: self._forget(old)
+		self.db.execute("INSERT OR REPLACE INTO dirs VALUES (?,?,?)", (d, parent, mtime))
+		return subdirs
+
+	def _forget(self, d: str):
+		lo, hi = _range(d)
+		self.db.execute("DELETE FROM files WHERE dir=? OR (path>=? AND path<?)", (d, lo, hi))
+		self.db.execute("DELETE FROM dirs WHERE path=? OR (path>=? AND path<?)", (d, lo, hi))
+
+	# ------------ 查询 ------------
+	def files(self, root: Path, exts: Optional[Iterable[str]] = None) -> List[FileRecord]:
+		lo, hi = _range(str(root))
+		sql, args = "SELECT path, size, mtime_ns FROM files WHERE path>=? AND path<?", [lo, hi]
+		if exts:
+			exts = [x.lower() for x in exts]
+			sql += f" AND ext IN ({','.join('?' * len(exts))})"; args += exts
+		with self.lock:
+			rows = self.db.execute(sql + " ORDER BY path", args).fetchall()
+		return [FileRecord(Path(p), s, m / 1e9) for p, s, m in rows]
+
+	def dirs(self, root: Path) -> Dict[str, int]:
+		"""root 及其下全部目录的 {路径: 上次列举前的 mtime_ns}"""
+		root = str(root)
+		lo, hi = _range(root)
+		with self.lock:
+			return dict(self.db.execute("SELECT path, mtime_ns FROM dirs WHERE path=? OR (path>=? AND path<?)", (root, lo, hi)).fetchall())
+
+	def scan(self, root: Path, exts: Optional[Iterable[str]] = None, full: bool = False) -> List[FileRecord]:
+		self.refresh(root, full=full)
+		return self.files(root, exts)
+
+	# ------------ 工具自身写入后的修正 ------------
+	def update_files(self, paths: Iterable[Path]):
+		"""就地覆盖写入不会改变目录 mtime，写完后单独刷新这些文件的大小/mtime"""
+		with self.lock, self.db:
+			for p in paths:
+				p = str(p)
+				try: st = os.stat(p)
+				except OSError:
+					self.db.execute("DELETE FROM files WHERE path=?", (p,)); continue
+				self.db.execute("UPDATE files SET size=?, mtime_ns=? WHERE path=?", (st.st_size, st.st_mtime_ns, p))
+
+	def close(self):
+		with self.lock: self.db.close()
+
+
+def _dir_mtime(d: str) -> Optional[int]:
+	try: return os.stat(d).st_mtime_ns
+	except OSError: return None
+
+
+def _try_list(lister: DirLister, d: str):
+	try: return lister.list_dir(d)
+	except OSError: return None
+
+
+class ScanCache:
+	"""会话内的目录快照：root -> (时间, {目录: mtime_ns}, {path: FileRecord})。
+	取用时逐个比对目录 mtime（与目录库的增量判断相同），任一目录变化或消失即作废，另有 TTL 兜底；
+	工具自身写入的文件就地更新，改名/移动则直接作废相关快照"""
+
+	def __init__(self, ttl: float = 600, workers: int = 16):
+		self.ttl = ttl
+		self.workers = max(1, workers)
+		self.lock = threading.RLock()
+		self.snaps: Dict[str, Tuple[float, Dict[str, int], Dict[str, FileRecord]]] = {}
+
+	@staticmethod
+	def _key(p) -> str:
+		return os.path.normcase(os.path.abspath(str(p))).rstrip("\\/")
+
+	@staticmethod
+	def _under(key: str, root: str) -> bool:
+		return key == root or key.startswith(root + os.sep)
+
+	def get(self, root: Path) -> Optional[List[FileRecord]]:
+		k = self._key(root)
+		with self.lock:
+			snap = self.snaps.get(k)
+			if not snap: return None
+			if self.ttl and time.monotonic() - snap[0] > self.ttl:
+				del self.snaps[k]; return None
+			dirs = dict(snap[1])
+		# 目录 stat 不占锁；期间快照若被替换/作废，以当前状态为准
+		with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan-cache") as pool:
+			mtimes = list(pool.map(_dir_mtime, list(dirs)))
+		with self.lock:
+			if self.snaps.get(k) is not snap: return None
+			if any(m is None or m != old for old, m in zip(dirs.values(), mtimes)):
+				del self.snaps[k]; return None
+			return list(snap[2].values())
+
+	def put(self, root: Path, records: Iterable[FileRecord], dirs: Optional[Dict[str, int]] = None):
+		"""dirs 为 {目录: 列举前的 mtime_ns}，应覆盖 root 下全部目录；缺省时按文件所在目录及其上级补齐并现取 mtime"""
+		k = self._key(root)
+		files = {self._key(r.path): r for r in records}
+		if dirs is None:
+			known = {k}
+			for f in files:
+				d = os.path.dirname(f)
+				while d not in known and self._under(d, k):
+					known.add(d); d = os.path.dirname(d)
+			dirs = {d: _dir_mtime(d) for d in known}
+		dirs = {self._key(d): m for d, m in dirs.items() if m is not None}
+		with self.lock:
+			self.snaps[k] = (time.monotonic(), dirs, files)
+
+	def invalidate(self, path: Optional[Path] = None):
+		"""path 为空清空全部；否则丢弃与 path 互相包含的快照"""
+		with self.lock:
+			if path is None: self.snaps.clear(); return
+			k = self._key(path)
+			for root in [r for r in self.snaps if self._under(k, r) or self._under(r, k)]:
+				del self.snaps[root]
+
+	def updated(self, paths: Iterable[Path]):
+		"""文件被写入/新建/删除后，重新 stat 并更新所在快照；新建/删除改变了所在目录的 mtime，一并记下"""
+		with self.lock:
+			for p in paths:
+				k = self._key(p)
+				parent = os.path.dirname(k)
+				try:
+					st = os.stat(p); rec = FileRecord(Path(p), st.st_size, st.st_mtime)
+				except OSError:
+					rec = None
+				mtime = _dir_mtime(parent)
+				for root, (_, dirs, files) in self.snaps.items():
+					if not self._under(k, root): continue
+					if rec: files[k] = rec
+					else: files.pop(k, None)
+					if parent in dirs and mtime is not None: dirs[parent] = mtime
+
+	def moved(self, src: Path, dst: Path):
+		"""文件或目录改名/移动：作废涉及 src 或 dst 的快照，下次访问经目录库只重新列出变化的目录。
+		（逐条改挂要扫描快照内全部条目，大目录下每次移动的开销与快照大小成正比）"""
+		with self.lock:
+			self.invalidate(src); self.invalidate(dst)
@@ -2,11 +2,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os, re
 from pathlib import Path
 
 SETTINGS = {
 	"TOPAZ_PHOTO_AI_PATH": r"C:\Program Files\Topaz Labs LLC\Topaz Photo AI\Topaz Photo AI.exe",
 	"BANDIZIP_PATH": r"bandizip.exe",
+	"ARCHIVE_WORKERS": 4,
+	"ARCHIVE_PER_DISK_LIMIT": 2,
 
 	"LOG_DIR_PATH": r"C:\Users\a5258\Downloads\Compressed\工具\py脚本\整合\logs",
 
@@ -37,14 +40,57 @@ SETTINGS = {
 	"DOWNLOAD_SAVE_DIR": r"C:\Users\a5258\Downloads\Compressed\图片",
 	"IMAGE_SOURCE_DIR": r"C:\Users\a5258\Downloads\Compressed\图片",
 	"DOWNLOAD_URL_TEMPLATE": "https://image.mgstage.com/images/magictabloid/300ntk/{num}/pf_e_300ntk-{num}.jpg",
+	"DOWNLOAD_WORKERS": 8,
+	"DOWNLOAD_RATE": 0,  # 每秒请求数上限，0 表示按 batch/pause 推算
 
 	"ED2K_SOURCE_DIR": r"C:\Users\a5258\Downloads\Compressed\X1080",
 	"ED2K_OUTPUT_DIR": r"C:\Users\a5258\Downloads",
 	"ED2K_TARGET_HEADER": "115視頻格式離綫下載地址：",
+	"ED2K_SCAN_WORKERS": 8,
+	"ED2K_SCAN_ZIP_IN_MEMORY": True,  # .zip 内的 txt 直接在内存中解析，不解压到磁盘
 
 	"LOG_FILE_NAME": "整理日志.txt",
+	"CATALOG_ENABLED": True,
+	"CATALOG_PATH": "",  # 留空则为 LOG_DIR_PATH/file_catalog.sqlite3
+	"CATALOG_FULL_RESCAN": False,
+	"SCAN_CACHE_TTL": 600,  # 会话内目录快照有效期（秒），0 表示不过期
+	"HASH_CACHE_PATH": "",  # 留空则为 LOG_DIR_PATH/hash_cache.sqlite3
+	"SCAN_WORKERS": 16,  # 并行列目录的线程数（网盘挂载延迟高时可调大）
+	"TRANSFER_BUFFER_SIZE": 8 * 1024 * 1024,  # 跨盘移动/复制的单次块大小
+	"PLACE_STRATEGY": "copy",  # 导出海报/替换封面/复制字幕的放置方式：copy / hardlink / reflink / symlink（符号链接在源文件被移走后失效）
+	"COPY_WORKERS": 8,  # 批量复制（导出/导回海报、替换封面）的并行数
+	"COPY_MAX_INFLIGHT_BYTES": 256 * 1024 * 1024,
+	"COPY_PER_VOLUME_LIMIT": 4,  # 同一目标卷上同时进行的复制数
+	"ORGANIZE_STREAMING": True,  # 媒体整理边扫描边移动，不先列出全部文件
+	"ORGANIZE_WORKERS": 4,
+	"ORGANIZE_QUEUE_SIZE": 256,  # 扫描与移动之间的队列上限
+	"LOG_FLUSH_BYTES": 64 * 1024,
+	"LOG_FLUSH_INTERVAL": 2.0,
+	"LOG_MAX_BYTES": 10 * 1024 * 1024,
+	"LOG_BACKUP_COUNT": 5,
+	"LOG_JSONL": True,
+	"UI_FPS": 30,
 	"VIDEO_EXTENSIONS": ('.mkv', '.mp4', '.avi', '.ts', '.mov', '.webm'),
 	"SUBTITLE_EXTENSIONS": ('.srt', '.ass', '.ssa', '.vtt'),
 	"SUBTITLE_EXCLUDE_KEYWORDS": ['trailer'],
 	"IMAGE_EXTENSIONS": ('.jpg', '.jpeg', '.png', '.webp'),
+	"DUPE_HASH_WORKERS": 0,  # 查重哈希进程数，0 表示 CPU 核数
+	"DUPE_PARTIAL_BLOCK": 64 * 1024,  # 部分哈希读取的首/尾块大小
+	"NFO_WORKERS": 8,
+	"PROBE_WORKERS": 16,  # 读取图片/视频文件头的并行数
+	"UHD_MIN_LONG_EDGE": 3800,  # 自动标记时，视频长边不小于此值视为 4K
 }
+
+# 重复文件查找的默认目录：各成品库 + 下载目录
+SETTINGS["DUPLICATE_SCAN_DIRS"] = [SETTINGS[k] for k in ("DEST_CENSORED", "DEST_4K_SERIES", "DEST_AI_4K", "DOWNLOAD_SAVE_DIR", "ED2K_SOURCE_DIR")]
+
+
+def _usable_dir(p: str) -> bool:
+	"""其他系统上的 Windows 盘符路径（会被当成当前目录下的一个怪名字目录）、或盘符不存在，视为不可用"""
+	drive = re.match(r"^[A-Za-z]:[\\/]", p or "")
+	if not p or (drive and os.name != "nt"): return False
+	return not drive or os.path.exists(p[:3])
+
+# 日志/目录库/哈希缓存所在目录不可用时，退回用户目录下
+if not _usable_dir(SETTINGS["LOG_DIR_PATH"]):
+	SETTINGS["LOG_DIR_PATH"] = str(Path.home() / "MediaOrganizer" / "logs")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发下载引擎：共享连接池 Session + 令牌桶限速 + 断点续传清单
+"""
+
+import json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Tuple
+
+
+class TokenBucket:
+	"""令牌桶：rate 个/秒补充，最多积攒 capacity 个；rate<=0 表示不限速"""
+	def __init__(self, rate: float, capacity: float = 1):
+		self.rate, self.capacity = float(rate), max(1.0, float(capacity))
+		self.tokens, self.stamp = self.capacity, time.monotonic()
+		self.lock = threading.Lock()
+
+	def acquire(self, n: float = 1):
+		if self.rate <= 0: return
+		while True:
+			with self.lock:
+				now = time.monotonic()
+				self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+				self.stamp = now
+				if self.tokens >= n:
+					self.tokens -= n; return
+				wait = (n - self.tokens) / self.rate
+			time.sleep(wait)
+
+
+class DownloadManifest:
+	"""save_dir 下的下载清单：文件名 -> {url, etag, last_modified, size, complete}"""
+	NAME = ".download_manifest.json"
+
+	def __init__(self, save_dir: Path):
+		self.path = Path(save_dir) / self.NAME
+		self.lock = threading.Lock()
+		self.dirty = 0
+		try: self.entries: Dict[str, dict] = json.loads(self.path.read_text(encoding="utf-8"))
+		except Exception: self.entries = {}
+
+	def get(self, name: str) -> dict:
+		with self.lock: return dict(self.entries.get(name) or {})
+
+	def update(self, name: str, **fields):
+		with self.lock:
+			self.entries.setdefault(name, {}).update(fields)
+			self.dirty += 1
+			flush = self.dirty >= 50
+		if flush: self.save()
+
+	def save(self):
+		with self.lock:
+			if not self.dirty: return
+			tmp = self.path.with_name(self.path.name + ".tmp")
+			tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=0), encoding="utf-8")
+			os.replace(tmp, self.path)
+			self.dirty = 0
+
+
+class DownloadEngine:
+	def __init__(self, workers: int = 8, rate: float = 0, burst: float = 1, timeout: float = 30, session=None):
+		self.workers, self.timeout = max(1, workers), timeout
+		self.bucket = TokenBucket(rate, burst)
+		self.session = session or self._make_session(self.workers)
+		self.manifests: Dict[Path, DownloadManifest] = {}
+		self.lock = threading.Lock()
+
+	@staticmethod
+	def _make_session(pool_size: int):
+		import requests
+		from requests.adapters import HTTPAdapter
+		s = requests.Session()
+		adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+		s.mount("http://", adapter); s.mount("https://", adapter)
+		return s
+
+	def manifest(self, save_dir: Path) -> DownloadManifest:
+		with self.lock:
+			if save_dir not in self.manifests: self.manifests[save_dir] = DownloadManifest(save_dir)
+			return self.manifests[save_dir]
+
+	def fetch(self, url: str, dest: Path) -> str:
+		"""下载单个文件，返回 'ok' / 'skip'（已存在或服务器 304 未变化） / 'fail'
+
+		先写入 <name>.part，完成后改名；清单记录 ETag/Last-Modified，
+		已完成的文件发条件请求重新校验，未完成的 .part 用 Range 续传。
+		"""
+		man = self.manifest(dest.parent)
+		entry = man.get(dest.name)
+		part = dest.with_name(dest.name + ".part")
+		validators = {k: v for k, v in (("If-None-Match", entry.get("etag")), ("If-Modified-Since", entry.get("last_modified"))) if v}
+		# 要原始字节：压缩传输时 Content-Length/Range 针对的是压缩后的数据，与写入的解码内容对不上
+		headers, offset = {"Accept-Encoding": "identity"}, 0
+		if dest.exists():
+			size = dest.stat().st_size
+			if not entry and size > 0: return "skip"
+			if entry.get("complete") and entry.get("size") == size:
+				if not validators: return "skip"
+				headers.update(validators)
+		elif part.exists() and entry.get("url") == url and validators:
+			offset = part.stat().st_size
+			if offset:
+				headers["Range"] = f"bytes={offset}-"
+				headers["If-Range"] = entry.get("etag") or entry.get("last_modified")
+		self.bucket.acquire()
+		try:
+			with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as r:
+				if r.status_code == 304: return "skip"
+				if r.status_code == 206 and offset: mode = "ab"
+				elif r.status_code == 200: mode, offset = "wb", 0
+				else:
+					if r.status_code == 416:
+						try: part.unlink()
+						except OSError: pass
+					return "fail"
+				man.update(dest.name, url=url, etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"), complete=False)
+				length = r.headers.get("Content-Length")
+				encoded = r.headers.get("Content-Encoding", "identity").lower() not in ("", "identity")
+				expected = offset + int(length) if length and length.isdigit() and not encoded else None
+				with part.open(mode) as f:
+					for chunk in r.iter_content(chunk_size=65536): f.write(chunk)
+			size = part.stat().st_size
+			if expected is not None and size != expected: return "fail"
+			os.replace(part, dest)
+			man.update(dest.name, size=size, complete=True)
+			return "ok"
+		except Exception:
+			return "fail"
+
+	def run(self, jobs: Iterable[Tuple[str, Path]], progress: Callable[[int, int], None] = lambda done, total: None,
+			cancelled: Callable[[], bool] = lambda: False) -> Dict[str, int]:
+		jobs = list(jobs)
+		counts = {"ok": 0, "skip": 0, "fail": 0, "cancel": 0}
+		with ThreadPoolExecutor(max_workers=self.workers) as pool:
+			def task(url, dest):
+				return "cancel" if cancelled() else self.fetch(url, dest)
+			futs = [pool.submit(task, url, dest) for url, dest in jobs]
+			try:
+				for i, fut in enumerate(as_completed(futs), 1):
+					counts[fut.result()] += 1
+					progress(i, len(jobs))
+			finally:
+				for m in list(self.manifests.values()): m.save()
+		return counts
+
+	def close(self):
+		try: self.session.close()
+		except Exception: pass
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重复文件查找：按大小分组 -> 首尾块部分哈希 -> 全文件哈希，逐级缩小候选；哈希在进程池中计算并写入持久缓存
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, List, Optional
+from config import SETTINGS
+from catalog import FileRecord
+from hashcache import HashCache, hash_job
+
+
+def _stat_or_none(path) -> Optional[os.stat_result]:
+	try: return os.stat(path)
+	except OSError: return None
+
+
+class DuplicateFinder:
+	def __init__(self, hashes: HashCache, workers: Optional[int] = None, block: Optional[int] = None,
+			progress: Callable[[int, int], None] = lambda done, total: None, cancelled: Callable[[], bool] = lambda: False):
+		self.hashes = hashes
+		self.workers = workers or SETTINGS.get("DUPE_HASH_WORKERS") or os.cpu_count() or 4
+		self.block = block or SETTINGS.get("DUPE_PARTIAL_BLOCK", 64 * 1024)
+		self.progress, self.cancelled = progress, cancelled
+		self.stale: List = []  # 记录与当前 stat 不一致（或已不存在）的路径，供调用方刷新目录库
+		self.stats = {"files": 0, "hardlinks": 0, "size_candidates": 0, "partial_hashed": 0, "full_hashed": 0, "cache_hits": 0}
+
+	def find(self, records: Iterable[FileRecord], min_size: int = 1) -> List[List[FileRecord]]:
+		"""返回重复组（每组内容完全相同，按路径排序），按可节省空间从大到小排列。
+		records 可能来自目录库/快照，大小以当前 stat 为准（就地覆盖不改变目录 mtime）"""
+		seen, unique = set(), []
+		for r in records:
+			key = os.path.normcase(os.path.abspath(str(r.path)))
+			if key in seen: continue
+			seen.add(key); unique.append(r)
+		with ThreadPoolExecutor(max_workers=max(1, SETTINGS.get("SCAN_WORKERS", 16))) as pool:
+			stats = list(pool.map(_stat_or_none, [r.path for r in unique]))
+		by_size, inodes = {}, set()
+		for r, st in zip(unique, stats):
+			if st is None or st.st_size != r.size or abs(st.st_mtime - r.mtime) > 1e-6: self.stale.append(r.path)
+			if st is None: continue
+			# 同一文件的多个硬链接不占额外空间，只保留第一个（st_ino 为 0 表示文件系统不提供）
+			if st.st_ino:
+				if (st.st_dev, st.st_ino) in inodes:
+					self.stats["hardlinks"] += 1; continue
+				inodes.add((st.st_dev, st.st_ino))
+			r = r._replace(size=st.st_size, mtime=st.st_mtime)
+			if r.size < min_size: continue
+			by_size.setdefault(r.size, []).append(r)
+		self.stats["files"] = sum(len(g) for g in by_size.values())
+		groups = [g for g in by_size.values() if len(g) > 1]
+		self.stats["size_candidates"] = sum(len(g) for g in groups)
+		# 第二级：首尾块；不超过两个块的文件部分哈希已覆盖全文，无需第三级
+		groups = self._split(groups, f"partial{self.block}")
+		small = [g for g in groups if g[0].size <= 2 * self.block]
+		large = self._split([g for g in groups if g[0].size > 2 * self.block], "full")
+		result = [sorted(g, key=lambda r: str(r.path)) for g in small + large]
+		result.sort(key=lambda g: (-(len(g) - 1) * g[0].size, str(g[0].path)))
+		return result
+
+	def _split(self, groups: List[List[FileRecord]], kind: str) -> List[List[FileRecord]]:
+		"""按 kind 哈希把每个候选组再细分，只保留仍有 2 个以上成员的组"""
+		digests = self._digests([r for g in groups for r in g], kind)
+		out = []
+		for g in groups:
+			sub: Dict[str, List[FileRecord]] = {}
+			for r in g:
+				d = digests.get(str(r.path))
+				if d: sub.setdefault(d, []).append(r)
+			out.extend(s for s in sub.values() if len(s) > 1)
+		return out
+
+	def _digests(self, records: List[FileRecord], kind: str) -> Dict[str, str]:
+		digests, todo, stats = {}, [], {}
+		for r in records:
+			p = str(r.path)
+			try: st = os.stat(p)
+			except OSError: continue
+			d = self.hashes.get(p, kind, st)
+			if d: digests[p] = d; self.stats["cache_hits"] += 1
+			else: todo.append(p); stats[p] = st
+		if not todo or self.cancelled(): return digests
+		self.stats["full_hashed" if kind == "full" else "partial_hashed"] += len(todo)
+		jobs = [(p, "full" if kind == "full" else "partial", self.block) for p in todo]
+		try:
+			results = self._run(ProcessPoolExecutor, jobs)
+		except (BrokenProcessPool, OSError, RuntimeError):
+			# 进程池不可用（打包环境、受限系统等）时退回线程池
+			results = self._run(ThreadPoolExecutor, jobs)
+		for p, d in results:
+			if d is None: continue
+			digests[p] = d
+			self.hashes.put(p, kind, stats[p], d)
+		return digests
+
+	def _run(self, executor, jobs) -> List:
+		"""同时提交的任务不超过 2×workers，每次提交前检查取消；取消后不再等待在途任务"""
+		results, pending, queued = [], set(), iter(jobs)
+		pool = executor(max_workers=self.workers)
+		try:
+			while True:
+				while len(pending) < 2 * self.workers and not self.cancelled():
+					job = next(queued, None)
+					if job is None: break
+					pending.add(pool.submit(hash_job, job))
+				if not pending: break
+				done, pending = wait(pending, return_when=FIRST_COMPLETED)
+				for fut in done:
+					results.append(fut.result())
+					self.progress(len(results), len(jobs))
+				if self.cancelled(): break
+		finally:
+			pool.shutdown(wait=not self.cancelled(), cancel_futures=True)
+		return results
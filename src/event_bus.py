@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作线程到界面的事件总线：进度按帧合并，日志分块追加
+"""
+
+import threading
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+class UiEventBus(QObject):
+    """post_* 可在任意线程调用（只加锁写缓冲，不发 Qt 事件）；界面线程定时器按帧率统一刷新"""
+    progress_changed = pyqtSignal(int)
+    log_chunk = pyqtSignal(str)
+    status_changed = pyqtSignal(str)
+
+    def __init__(self, fps=30, max_lines_per_frame=500, max_pending_lines=50000, parent=None):
+        super().__init__(parent)
+        self.max_lines_per_frame = max_lines_per_frame
+        self.max_pending_lines = max_pending_lines
+        self._lock = threading.Lock()
+        self._progress = None
+        self._status = None
+        self._lines = deque()
+        self._omitted = 0
+        # 统计：被合并掉的中间进度/状态，以及积压过多被丢弃的日志行
+        self.dropped_progress = 0
+        self.dropped_status = 0
+        self.dropped_lines = 0
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start(max(1, int(1000 / max(1, fps))))
+
+    def post_progress(self, value):
+        with self._lock:
+            if self._progress is not None:
+                self.dropped_progress += 1
+            self._progress = int(value)
+
+    def post_status(self, msg):
+        with self._lock:
+            if self._status is not None:
+                self.dropped_status += 1
+            self._status = msg
+
+    def post_log(self, msg):
+        with self._lock:
+            if len(self._lines) >= self.max_pending_lines:
+                self._lines.popleft()
+                self._omitted += 1
+                self.dropped_lines += 1
+            self._lines.append(str(msg))
+
+    def flush(self):
+        """在界面线程调用：发出最新进度/状态，并把积压日志合并为一次追加"""
+        with self._lock:
+            progress, self._progress = self._progress, None
+            status, self._status = self._status, None
+            n = min(len(self._lines), self.max_lines_per_frame)
+            lines = [self._lines.popleft() for _ in range(n)]
+            omitted, self._omitted = self._omitted, 0
+        if omitted:
+            lines.insert(0, f"……（日志过多，已省略 {omitted} 行）")
+        if lines:
+            self.log_chunk.emit("\n".join(lines))
+        if status is not None:
+            self.status_changed.emit(status)
+        if progress is not None:
+            self.progress_changed.emit(progress)
+
+    def drain(self):
+        """刷新直到缓冲为空（任务结束时调用）"""
+        while True:
+            self.flush()
+            with self._lock:
+                if not self._lines:
+                    return
+
+    def stats(self, reset=False):
+        """被合并的进度/状态更新数与丢弃的日志行数；reset=True 时读出后清零（按任务统计）"""
+        with self._lock:
+            s = {
+                "dropped_progress": self.dropped_progress,
+                "dropped_status": self.dropped_status,
+                "dropped_lines": self.dropped_lines,
+            }
+            if reset:
+                self.dropped_progress = self.dropped_status = self.dropped_lines = 0
+        return s
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件内容哈希：流式计算，按 (路径, 大小, mtime) 缓存在 SQLite 中，文件变化后自动失效；
+另有只读首尾块的部分哈希（查重时先粗筛）
+"""
+
+import hashlib, os, sqlite3, threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+CHUNK = 1024 * 1024
+
+
+def hash_file(path: Path, chunk: int = CHUNK) -> str:
+	h = hashlib.blake2b(digest_size=20)
+	with open(path, "rb") as f:
+		buf = bytearray(chunk); view = memoryview(buf)
+		while True:
+			n = f.readinto(buf)
+			if not n: break
+			h.update(view[:n])
+	return h.hexdigest()
+
+
+def partial_hash(path: Path, block: int = 64 * 1024) -> str:
+	"""首、尾各 block 字节加文件大小的哈希；文件不超过 2*block 时等于读全文件"""
+	h = hashlib.blake2b(digest_size=20)
+	with open(path, "rb") as f:
+		size = os.fstat(f.fileno()).st_size
+		h.update(str(size).encode())
+		h.update(f.read(block))
+		if size > block:
+			f.seek(max(block, size - block))
+			h.update(f.read(block))
+	return h.hexdigest()
+
+
+def hash_job(job):
+	"""进程池任务：(路径, 'full'|'partial', block) -> (路径, 哈希或 None)"""
+	path, kind, block = job
+	try: return path, (hash_file(path) if kind == "full" else partial_hash(path, block))
+	except OSError: return path, None
+
+
+class HashCache:
+	"""按 (路径, kind) 缓存由文件内容得出的值（哈希、NFO 字段等），大小或 mtime 变化即失效"""
+	SCHEMA = """
+		CREATE TABLE IF NOT EXISTS hashes (path TEXT, kind TEXT, size INTEGER, mtime_ns INTEGER, digest TEXT,
+			PRIMARY KEY (path, kind));
+	"""
+
+	def __init__(self, db_path: Path):
+		self.db_path = Path(db_path)
+		self.db_path.parent.mkdir(parents=True, exist_ok=True)
+		self.lock = threading.RLock()
+		self.db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+		self.db.executescript(self.SCHEMA)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.hits = self.misses = 0
+
+	def get(self, path: Path, kind: str, st: os.stat_result) -> Optional[str]:
+		with self.lock:
+			row = self.db.execute("SELECT size, mtime_ns, digest FROM hashes WHERE path=? AND kind=?", (str(path), kind)).fetchone()
+		if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+			self.hits += 1; return row[2]
+		return None
+
+	def put(self, path: Path, kind: str, st: os.stat_result, digest: str):
+		with self.lock, self.db:
+			self.db.execute("INSERT OR REPLACE INTO hashes VALUES (?,?,?,?,?)", (str(path), kind, st.st_size, st.st_mtime_ns, digest))
+
+	def digest(self, path: Path, st: Optional[os.stat_result] = None) -> str:
+		"""整文件哈希；大小和 mtime 与缓存一致时直接复用"""
+		st = st or os.stat(path)
+		d = self.get(path, "full", st)
+		if d is None:
+			self.misses += 1
+			d = hash_file(path); self.put(path, "full", st, d)
+		return d
+
+	def same_content(self, a: Path, b: Path) -> bool:
+		"""a 与 b 内容是否相同：大小不同直接否；大小与 mtime 都相同视为相同（快速检查）；否则比对哈希"""
+		try:
+			sa, sb = os.stat(a), os.stat(b)
+		except OSError:
+			return False
+		if sa.st_size != sb.st_size: return False
+		if (sa.st_dev, sa.st_ino) == (sb.st_dev, sb.st_ino) and sa.st_ino: return True
+		if sa.st_mtime_ns == sb.st_mtime_ns: return True
+		return self.digest(a, sa) == self.digest(b, sb)
+
+	def close(self):
+		with self.lock: self.db.close()
+
+
+def cached_batch(paths: Iterable[Path], kind: str, fn: Callable[[Path], Any], cache: Optional[HashCache] = None,
+		workers: int = 8, dumps: Callable[[Any], str] = str, loads: Callable[[str], Any] = str) -> Dict[Path, Any]:
+	"""对每个文件求 fn(path)（线程池并行），结果以 dumps/loads 序列化后存入 cache 的 kind 下；
+	fn 返回 None 记为空串，读回时也还原为 None"""
+	result: Dict[Path, Any] = {}
+	todo = []
+	for p in paths:
+		try: st = os.stat(p)
+		except OSError:
+			result[p] = None; continue
+		hit = cache.get(p, kind, st) if cache is not None else None
+		if hit is not None: result[p] = loads(hit) if hit else None
+		else: todo.append((p, st))
+	if todo:
+		with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+			values = list(pool.map(lambda x: fn(x[0]), todo))
+		for (p, st), v in zip(todo, values):
+			result[p] = v
+			if cache is not None: cache.put(p, kind, st, "" if v is None else dumps(v))
+	return result
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os, sys
+import os, sys, multiprocessing
 
 # HiDPI 支持（必须在 QApplication 创建前设置）
 os.environ["QT_ENABLE_HIGHDPI_SCALING"] = "1"
@@ -34,4 +34,6 @@ def main():
 	sys.exit(app.exec_())
 
 if __name__ == "__main__":
+	# 打包后查重的进程池子进程会重新执行本入口，必须先交给 freeze_support 处理，否则每个子进程都会再开一个窗口
+	multiprocessing.freeze_support()
 	main()
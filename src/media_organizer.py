@@ -2,187 +2,566 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os, re, csv, shutil, subprocess, datetime, time
+import os, re, csv, copy, json, queue, atexit, functools, shutil, sqlite3, subprocess, datetime, tempfile, time, threading, zipfile
 from pathlib import Path
-from typing import Callable, List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
 from config import SETTINGS
+from bangou import find_id, extract_id, extract_ids, id_tokens, cid_to_bangou
+from ed2k import links_from_file, links_from_zip
+from downloader import DownloadEngine
+from catalog import FileCatalog, ScanCache
+from scanner import DirLister, FileRecord
+from pipeline import Collector, Stage, run_stages
+from transfer import BatchReport, CopyExecutor, TransferEngine
+from hashcache import HashCache
+from dupes import DuplicateFinder
+from nfo import read_makers
+from probe import image_sizes, is_uhd, video_sizes
 
 def _ensure_dir(p: Path): p.mkdir(parents=True, exist_ok=True)
 
+def _stat_or_none(p: Path) -> Optional[os.stat_result]:
+	try: return os.stat(p)
+	except OSError: return None
+
+_PART_RAR = re.compile(r"^(.+)\.part(\d+)\.rar$", re.I)       # xxx.part1.rar, xxx.part2.rar ...
+_NUMBERED = re.compile(r"^(.+\.(?:7z|zip|rar))\.(\d{3})$", re.I)  # xxx.7z.001, xxx.7z.002 ...
+_OLD_VOLUME = re.compile(r"^(.+)\.([rz])(\d{2})$", re.I)         # xxx.rar + xxx.r00 / xxx.zip + xxx.z01 ...
+
+def _archive_sets(files: List[Path]) -> Dict[Path, List[Path]]:
+	"""把同一目录下的压缩包按分卷归组：{首卷: 全部分卷（按序）}。单个压缩包自成一组；
+	缺少首卷的分卷（如只有 .part2.rar、只有 .r00）不归组，留给用户处理"""
+	groups: Dict[Tuple[str, str], List[Tuple[int, Path]]] = {}
+	for p in files:
+		name = p.name
+		m = _PART_RAR.match(name)
+		if m: groups.setdefault((m.group(1).lower(), "part"), []).append((int(m.group(2)), p)); continue
+		m = _NUMBERED.match(name)
+		if m: groups.setdefault((m.group(1).lower(), "num"), []).append((int(m.group(2)), p)); continue
+		m = _OLD_VOLUME.match(name)
+		if m:
+			base = m.group(1) + (".rar" if m.group(2).lower() == "r" else ".zip")
+			groups.setdefault((base.lower(), "single"), []).append((int(m.group(3)) + 1, p)); continue
+		if p.suffix.lower() in (".rar", ".zip", ".7z"):
+			groups.setdefault((name.lower(), "single"), []).append((0, p))
+	sets = {}
+	for (_, kind), vols in groups.items():
+		vols.sort(key=lambda x: x[0])
+		if kind == "single" and vols[0][0] != 0: continue
+		if kind == "num" and vols[0][0] != 1: continue
+		if kind == "part" and vols[0][0] > 1: continue
+		sets[vols[0][1]] = [p for _, p in vols]
+	return sets
+
+def _merge_into(src: Path, dst: Path):
+	"""把 src 下的内容改名移入 dst（同一文件系统）：同名文件覆盖，同名目录逐层合并"""
+	for e in os.scandir(src):
+		target = os.path.join(dst, e.name)
+		if e.is_dir(follow_symlinks=False) and os.path.isdir(target) and not os.path.islink(target):
+			_merge_into(Path(e.path), Path(target))
+		else:
+			os.replace(e.path, target)
+
+LOG_HEADER = "--- 全局操作日志 ---\n"
+
+class _LogWriter:
+	"""每个日志文件一个后台写线程：攒批按大小/时间落盘，超过大小上限轮转为 .1 .2 ..."""
+	_writers: Dict[str, "_LogWriter"] = {}
+	_writers_lock = threading.Lock()
+
+	@classmethod
+	def for_path(cls, path: Path, header: str = "") -> "_LogWriter":
+		with cls._writers_lock:
+			key = str(path)
+			if key not in cls._writers: cls._writers[key] = cls(path, header)
+			return cls._writers[key]
+
+	@classmethod
+	def close_all(cls):
+		with cls._writers_lock: writers = list(cls._writers.values())
+		for w in writers: w.close()
+
+	def __init__(self, path: Path, header: str = ""):
+		self.path, self.header = Path(path), header
+		self.flush_bytes = SETTINGS.get("LOG_FLUSH_BYTES", 64 * 1024)
+		self.flush_interval = SETTINGS.get("LOG_FLUSH_INTERVAL", 2.0)
+		self.max_bytes = SETTINGS.get("LOG_MAX_BYTES", 10 * 1024 * 1024)
+		self.backups = SETTINGS.get("LOG_BACKUP_COUNT", 5)
+		self.queue: "queue.SimpleQueue" = queue.SimpleQueue()
+		self.closed = False
+		self.thread = threading.Thread(target=self._run, name=f"log-writer:{self.path.name}", daemon=True)
+		self.thread.start()
+
+	def put(self, text: str):
+		self.queue.put(text)
+
+	def flush(self):
+		"""阻塞到此前写入的内容全部落盘"""
+		if self.closed or not self.thread.is_alive(): return
+		done = threading.Event(); self.queue.put(done); done.wait()
+
+	def close(self):
+		if self.closed: return
+		self.closed = True
+		self.queue.put(None); self.thread.join()
+
+	def _run(self):
+		buf, size, last = [], 0, time.monotonic()
+		while True:
+			try: item = self.queue.get(timeout=self.flush_interval)
+			except queue.Empty: item = ""
+			if isinstance(item, str) and item:
+				buf.append(item); size += len(item)
+			if buf and (item is None or isinstance(item, threading.Event) or size >= self.flush_bytes
+					or time.monotonic() - last >= self.flush_interval):
+				self._write("".join(buf)); buf, size = [], 0
+			if not buf: last = time.monotonic()
+			if isinstance(item, threading.Event): item.set()
+			elif item is None: return
+
+	def _write(self, data: str):
+		try:
+			if self.max_bytes and self.path.exists() and self.path.stat().st_size + len(data.encode("utf-8")) > self.max_bytes:
+				self._rotate()
+			new = not self.path.exists()
+			with self.path.open("a", encoding="utf-8") as f:
+				if new and self.header: f.write(self.header)
+				f.write(data)
+		except OSError:
+			pass
+
+	def _rotate(self):
+		if self.backups <= 0:
+			self.path.unlink(); return
+		for i in range(self.backups - 1, 0, -1):
+			src = self.path.with_name(f"{self.path.name}.{i}")
+			if src.exists(): os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+		os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+
+atexit.register(_LogWriter.close_all)
+
 class Logger:
 	def __init__(self, log_dir: Path, filename: str, sink: Callable[[str], None] = lambda s: None):
 		self.log_dir, self.filename, self.sink = Path(log_dir), filename, sink
 		_ensure_dir(self.log_dir)
 		self.path = self.log_dir / filename
 		if not self.path.exists():
-			self.path.write_text("--- 全局操作日志 ---\n", encoding="utf-8")
+			self.path.write_text(LOG_HEADER, encoding="utf-8")
+		self.writer = _LogWriter.for_path(self.path, LOG_HEADER)
+		# 结构化记录（JSON Lines）：与文本日志同名，扩展名 .jsonl
+		self.jsonl = _LogWriter.for_path(self.path.with_suffix(".jsonl")) if SETTINGS.get("LOG_JSONL", True) else None
+
+	def bind(self, sink: Callable[[str], None]) -> "Logger":
+		"""同一日志文件，换一个 sink"""
+		lg = copy.copy(self); lg.sink = sink
+		return lg
 
 	def write(self, msg: str):
 		ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 		self.sink(msg)
-		with self.path.open("a", encoding="utf-8") as f:
-			f.write(f"[{ts}] {msg}\n")
+		self.writer.put(f"[{ts}] {msg}\n")
+
+	def record(self, operation: str, counts: Dict[str, int], duration: float, **extra):
+		"""写一条结构化记录：{"ts", "operation", "counts", "duration", ...}"""
+		if not self.jsonl: return
+		rec = {"ts": datetime.datetime.now().isoformat(timespec="seconds"), "operation": operation,
+			"counts": counts, "duration": round(duration, 3), **extra}
+		self.jsonl.put(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+	def flush(self):
+		self.writer.flush()
+		if self.jsonl: self.jsonl.flush()
+
+def _saved_note(saved: int) -> str:
+	return f"（链接节省 {saved / 1048576:.1f} MB）" if saved else ""
+
+def _recorded(*names: str):
+	"""工具方法结束后记录一条结构化日志：操作名、返回的计数（按 names 命名）、耗时、是否取消"""
+	names = names or ("count",)
+	def deco(func):
+		@functools.wraps(func)
+		def wrapper(self, *args, **kwargs):
+			t0 = time.perf_counter()
+			result = func(self, *args, **kwargs)
+			values = result if isinstance(result, tuple) else (result,)
+			counts = result if isinstance(result, dict) else dict(zip(names, values))
+			self.logger.record(func.__name__, counts, time.perf_counter() - t0, cancelled=self.cancelled())
+			return result
+		return wrapper
+	return deco
 
 class MediaToolkit:
-	def __init__(self, notify: Callable[[str], None] = lambda s: None, progress: Callable[[int], None] = lambda v: None):
-		self.notify, self.progress = notify, progress
+	def __init__(self, notify: Callable[[str], None] = lambda s: None, progress: Callable[[int], None] = lambda v: None,
+			extractor: Optional[Callable[[Path, Path, Optional[str]], None]] = None):
+		# extractor(archive, out_dir, password)：替换 Bandizip 的解压器（测试用），失败时抛异常
+		self.notify, self.progress, self.extractor = notify, progress, extractor
 		self.logger = Logger(Path(SETTINGS["LOG_DIR_PATH"]), SETTINGS["LOG_FILE_NAME"], sink=self.notify)
+		self.cancel_event = threading.Event()
+		self._poster_src_cache: Dict[str, Tuple[int, Dict[str, Path]]] = {}
+		self.scan_cache = ScanCache(SETTINGS.get("SCAN_CACHE_TTL", 600), SETTINGS.get("SCAN_WORKERS", 16))
+		self.mover = TransferEngine()
+		self.catalog: Optional[FileCatalog] = None
+		if SETTINGS.get("CATALOG_ENABLED", True):
+			try: self.catalog = FileCatalog(Path(SETTINGS.get("CATALOG_PATH") or Path(SETTINGS["LOG_DIR_PATH"]) / "file_catalog.sqlite3"))
+			except (sqlite3.Error, OSError) as e: self.notify(f"文件目录库不可用，改为直接遍历: {e}")
+		try: self.hashes = HashCache(Path(SETTINGS.get("HASH_CACHE_PATH") or Path(SETTINGS["LOG_DIR_PATH"]) / "hash_cache.sqlite3"))
+		except (sqlite3.Error, OSError): self.hashes = HashCache(Path(":memory:"))
+
+	def fork(self, notify: Callable[[str], None], progress: Callable[[int], None], cancel_event: Optional[threading.Event] = None) -> "MediaToolkit":
+		"""给后台任务用的副本：独立的回调与取消标志，共享缓存"""
+		t = copy.copy(self)
+		t.notify, t.progress = notify, progress
+		t.cancel_event = cancel_event or threading.Event()
+		t.logger = self.logger.bind(notify)
+		return t
+
+	def cancelled(self) -> bool:
+		return self.cancel_event.is_set()
+
+	# ------------ 内部：文件列表 ------------
+	def _scan(self, root: Path, exts=None) -> List[FileRecord]:
+		"""root 下全部文件（递归），可按扩展名过滤。
+		先查会话快照（目录 mtime 全部未变才沿用）；未命中时走目录库（只重新列出 mtime 变化的目录），再不行直接遍历。
+		快照与目录库都察觉不到就地覆盖，要按大小/mtime 决定覆盖的调用方先经 _restat"""
+		records = self.scan_cache.get(root)
+		if records is None:
+			dirs: Dict[str, int] = {}
+			if self.catalog is not None:
+				try:
+					records = self.catalog.scan(Path(root), full=SETTINGS.get("CATALOG_FULL_RESCAN", False))
+					dirs = self.catalog.dirs(Path(root))
+				except sqlite3.Error as e: self.notify(f"文件目录库查询失败，改为直接遍历: {e}"); records = None
+			if records is None: records = list(DirLister().walk(Path(root), dirs=dirs))
+			self.scan_cache.put(root, records, dirs)
+		exts = tuple(x.lower() for x in exts) if exts else None
+		return [r for r in records if not exts or r.path.suffix.lower() in exts]
+
+	def _touched(self, paths: List[Path]):
+		"""工具自己写入/新建的文件：更新会话快照；覆盖写入不改变目录 mtime，也要同步进目录库"""
+		if not paths: return
+		self.scan_cache.updated(paths)
+		if self.catalog is None: return
+		try: self.catalog.update_files(paths)
+		except sqlite3.Error: pass
+
+	def _restat(self, records: List[FileRecord]) -> List[FileRecord]:
+		"""就地覆盖不改变目录 mtime，目录库/快照中的大小可能已过期：按大小做覆盖等判断前逐个重新 stat，
+		不一致的同步回目录库与快照；已不存在的丢弃"""
+		with ThreadPoolExecutor(max_workers=max(1, SETTINGS.get("SCAN_WORKERS", 16))) as pool:
+			stats = list(pool.map(_stat_or_none, [r.path for r in records]))
+		fresh, stale = [], []
+		for r, st in zip(records, stats):
+			if st is None: stale.append(r.path); continue
+			if st.st_size != r.size or abs(st.st_mtime - r.mtime) > 1e-6:
+				stale.append(r.path); r = r._replace(size=st.st_size, mtime=st.st_mtime)
+			fresh.append(r)
+		self._touched(stale)
+		return fresh
+
+	def _moved(self, src: Path, dst: Path):
+		"""工具自己做的改名/移动：就地更新会话快照（目录库靠目录 mtime 在下次刷新时更新）"""
+		self.scan_cache.moved(src, dst)
+
+	def _move(self, src: Path, dst: Path, overwrite: bool = False, progress: Optional[Callable[[int, int], None]] = None):
+		"""移动到完整目标路径：同设备 rename，跨设备内核复制后删除源，并同步会话快照"""
+		self.mover.move(src, dst, overwrite=overwrite, progress=progress)
+		self._moved(src, dst)
+
+	def _place(self, src: Path, dst: Path) -> int:
+		"""按 PLACE_STRATEGY 放置文件（硬链接/reflink/符号链接，不行则复制），返回因链接省下的字节数"""
+		return 0 if self.mover.place(src, dst) == "copy" else os.path.getsize(dst)
+
+	def _unchanged(self, src: Path, dst: Path) -> bool:
+		"""dst 已与 src 内容相同（大小+mtime 快速判断，再比对缓存的哈希），不必再写"""
+		try: return self.hashes.same_content(src, dst)
+		except (OSError, sqlite3.Error): return False
+
+	def _batch(self, jobs: List[Tuple[Path, Path]], op: Callable[[Path, Path], object]) -> BatchReport:
+		"""并行执行一批文件操作（COPY_WORKERS / COPY_MAX_INFLIGHT_BYTES / COPY_PER_VOLUME_LIMIT），进度按完成项数"""
+		return CopyExecutor().run(jobs, op, progress=lambda done, total: self.progress(int(done*100/total)), cancelled=self.cancelled)
+
+	def invalidate_scan_cache(self, root: Optional[Path] = None):
+		"""丢弃会话快照（root 为空则全部），下次访问重新扫描"""
+		self.scan_cache.invalidate(root)
+
+	def _run_stages(self, root: Path, stages: List[Stage]) -> Dict[str, int]:
+		"""stages 共享 root 的一次遍历，再依次执行"""
+		return run_stages(self._scan(Path(root)), stages, self.cancelled)
+
+	# ------------ 内部：压缩包解压 ------------
+	_disk_slots: Dict[int, threading.BoundedSemaphore] = {}
+	_disk_slots_lock = threading.Lock()
 
-	# ------------ 内部：Bandizip 解压 ------------
-	def _preprocess_archives(self, directory: Path):
-		bz = SETTINGS.get("BANDIZIP_PATH")
-		if not bz or not shutil.which(bz):
-			self.notify("找不到 Bandizip，请在设置中配置 BANDIZIP_PATH")
-			return
+	@classmethod
+	def _disk_slot(cls, directory: Path) -> threading.BoundedSemaphore:
+		# 同一磁盘（st_dev）上的解压并发数受 ARCHIVE_PER_DISK_LIMIT 限制，跨任务共享
+		try: dev = directory.stat().st_dev
+		except OSError: dev = -1
+		with cls._disk_slots_lock:
+			if dev not in cls._disk_slots:
+				cls._disk_slots[dev] = threading.BoundedSemaphore(max(1, SETTINGS.get("ARCHIVE_PER_DISK_LIMIT", 2)))
+			return cls._disk_slots[dev]
+
+	@staticmethod
+	def _extract_zip_native(arc: Path, directory: Path, pwd) -> bool:
+		"""普通 .zip 直接用 zipfile 解压，不启动进程；不支持的情况返回 False 交给外部解压器"""
+		try:
+			with zipfile.ZipFile(arc) as zf:
+				# 非 UTF-8 标记的中文文件名编码无法可靠判断，交给 Bandizip
+				if any(not (i.flag_bits & 0x800) and not i.filename.isascii() for i in zf.infolist()): return False
+				zf.extractall(directory, pwd=pwd.encode("utf-8") if pwd else None)
+			return True
+		except Exception:
+			return False
+
+	@staticmethod
+	def _scan_zip_links(arc: Path, directory: Path, pwd, header: str) -> Optional[List[str]]:
+		"""在内存中读取 .zip 内的 .txt 提取 ED2K 链接，含链接的 txt 不再落盘，只解压其余成员；
+		加密方式不支持、密码错误等无法原生读取的情况返回 None，交给完整解压"""
+		try:
+			with zipfile.ZipFile(arc) as zf:
+				found = links_from_zip(zf, header, pwd)
+				rest = [i for i in zf.infolist() if not found.get(i.filename)]
+				if any(not (i.flag_bits & 0x800) and not i.filename.isascii() for i in rest): return None
+				for i in rest: zf.extract(i, directory, pwd=pwd.encode("utf-8") if pwd else None)
+		except Exception:
+			return None
+		return [link for links in found.values() for link in links]
+
+	def _bandizip_extract(self, arc: Path, directory: Path, pwd):
+		cmd = [SETTINGS.get("BANDIZIP_PATH"), "x", f"-o:{str(directory)}", "-y"]
+		if pwd: cmd.append(f"-p:{pwd}")
+		cmd.append(str(arc))
+		startupinfo=None
+		if os.name=="nt":
+			startupinfo = subprocess.STARTUPINFO(); startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+		subprocess.run(cmd, check=True, capture_output=True, text=True, encoding="cp950", errors="ignore", startupinfo=startupinfo)
+
+	def _preprocess_archives(self, directory: Path, header: Optional[str] = None) -> List[str]:
+		"""解压目录下的压缩包；给出 header 时 .zip 先尝试内存扫描，返回其中 txt 的 ED2K 链接（按压缩包名顺序）。
+		分卷按组作为一个任务；各组先解压到各自的临时目录，全部结束后按首卷名顺序合并回目录（同名文件后者覆盖），
+		整组成功后才删除该组全部分卷"""
+		sets = _archive_sets([p for p in directory.iterdir() if p.is_file()])
+		archives = sorted(sets)
+		native = lambda arc: arc.suffix.lower() == ".zip" and len(sets[arc]) == 1
 		pwd = None
 		pwd_file = directory / "解壓密碼.txt"
-		if pwd_file.exists():
+		if archives and pwd_file.exists():
 			try:
 				pwd = pwd_file.read_text(encoding="utf-8", errors="ignore").strip().splitlines()[0]
 				self.notify("发现密码文件，将尝试使用")
 			except Exception:
 				pass
-		archives = [p for p in directory.iterdir() if p.suffix.lower() in (".rar",".zip",".7z")]
-		for i, arc in enumerate(archives, 1):
-			cmd = [bz, "x", f"-o:{str(directory)}", "-y"]
-			if pwd: cmd.append(f"-p:{pwd}")
-			cmd.append(str(arc))
+		extractor, skipped = self.extractor, False
+		if extractor is None:
+			bz = SETTINGS.get("BANDIZIP_PATH")
+			if bz and shutil.which(bz): extractor = self._bandizip_extract
+			elif any(not native(a) for a in archives):
+				self.notify("找不到 Bandizip，请在设置中配置 BANDIZIP_PATH")
+				archives = [a for a in archives if native(a)]; skipped = True
+		slot = self._disk_slot(directory)
+		found: Dict[Path, List[str]] = {}
+
+		def extract_one(arc: Path) -> Optional[Path]:
+			with slot:
+				if self.cancelled(): return None
+				tmp = Path(tempfile.mkdtemp(prefix=".extracting-", dir=directory))
+				try:
+					if native(arc) and header is not None:
+						links = self._scan_zip_links(arc, tmp, pwd, header)
+						if links is not None: found[arc] = links; return tmp
+					if native(arc) and self._extract_zip_native(arc, tmp, pwd): return tmp
+					if extractor is None: raise RuntimeError("找不到 Bandizip")
+					extractor(arc, tmp, pwd)
+					return tmp
+				except BaseException:
+					shutil.rmtree(tmp, ignore_errors=True); raise
+
+		done: Dict[Path, Path] = {}
+		if archives:
+			with ThreadPoolExecutor(max_workers=max(1, SETTINGS.get("ARCHIVE_WORKERS", 4))) as pool:
+				futs = {pool.submit(extract_one, arc): arc for arc in archives}
+				for i, fut in enumerate(as_completed(futs), 1):
+					arc = futs[fut]
+					try:
+						tmp = fut.result()
+						if tmp is None: skipped = True; continue
+						done[arc] = tmp
+					except subprocess.CalledProcessError as e:
+						self.notify(f"解压失败: {arc.name} ({(e.stderr or '')[:200]})")
+					except Exception as e:
+						self.notify(f"解压失败: {arc.name} ({e})")
+					self.progress(int(i*100/len(archives)))
+		for arc in sorted(done):
 			try:
-				startupinfo=None
-				if os.name=="nt":
-					startupinfo = subprocess.STARTUPINFO(); startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-				subprocess.run(cmd, check=True, capture_output=True, text=True, encoding="cp950", errors="ignore", startupinfo=startupinfo)
-				self.notify(f"解压成功: {arc.name}")
-				try: arc.unlink()
+				_merge_into(done[arc], directory)
+			except OSError as e:
+				self.notify(f"解压失败: {arc.name} ({e})"); found.pop(arc, None); continue
+			finally:
+				shutil.rmtree(done[arc], ignore_errors=True)
+			self.notify(f"解压成功: {arc.name}")
+			for vol in sets[arc]:
+				try: vol.unlink()
 				except Exception: pass
-			except subprocess.CalledProcessError as e:
-				self.notify(f"解压失败: {arc.name} ({(e.stderr or '')[:200]})")
-			self.progress(int(i*100/len(archives)) if archives else 0)
-		if pwd_file.exists():
+		if not skipped and pwd_file.exists():
 			try: pwd_file.unlink()
 			except Exception: pass
+		return [link for arc in sorted(found) for link in found[arc]]
 
 	# ------------ ED2K 提取 ------------
+	@_recorded()
 	def extract_ed2k(self, base_dir: Path, output_dir: Path, auto_delete_txt: bool = True) -> int:
 		self.notify("开始 ED2K 提取")
 		_ensure_dir(output_dir)
 		ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 		out_file = output_dir / f"ed2k_links_{ts}.txt"
-		total = 0
-		for folder in [p for p in Path(base_dir).rglob("*") if p.is_dir()] + [Path(base_dir)]:
-			self._preprocess_archives(folder)
-			extracted, deletions = [], []
-			header = SETTINGS["ED2K_TARGET_HEADER"]
-			for txt in folder.rglob("*.txt"):
-				in_block = False; found = False
-				try:
-					for line in txt.read_text(encoding="utf-8", errors="ignore").splitlines():
-						line = line.strip()
-						if header in line: in_block=True; continue
-						if in_block:
-							if not line or line.endswith((':','：')): in_block=False; continue
-							if line.startswith("ed2k://"):
-								extracted.append(line); found=True
-				except Exception:
-					pass
-				if found: deletions.append(txt)
-			if extracted:
-				with out_file.open("a", encoding="utf-8") as f:
-					for link in extracted: f.write(link+"\n")
-				total += len(extracted)
-				if auto_delete_txt:
-					for t in deletions:
-						try: t.unlink()
-						except Exception: pass
+		header = SETTINGS["ED2K_TARGET_HEADER"]
+		# 单次遍历：每个目录先解压、再列一次目录；每个 txt 只解析一次（线程池并行）
+		# 自动删除 txt 时 .zip 在内存中扫描，含链接的 txt 不必解压再删除
+		in_memory = auto_delete_txt and SETTINGS.get("ED2K_SCAN_ZIP_IN_MEMORY", True)
+		futures: List[Tuple[Path, Future]] = []
+		archived: List[str] = []
+		with ThreadPoolExecutor(max_workers=SETTINGS.get("ED2K_SCAN_WORKERS", 8)) as pool:
+			stack = [Path(base_dir)]
+			while stack and not self.cancelled():
+				folder = stack.pop()
+				archived.extend(self._preprocess_archives(folder, header if in_memory else None))
+				try: entries = sorted(os.scandir(folder), key=lambda e: e.name)
+				except OSError: continue
+				subdirs = []
+				for e in entries:
+					if e.is_dir(follow_symlinks=False): subdirs.append(Path(e.path))
+					elif e.name.lower().endswith(".txt") and e.is_file():
+						futures.append((Path(e.path), pool.submit(links_from_file, Path(e.path), header)))
+				stack.extend(reversed(subdirs))
+			extracted, deletions = list(archived), []
+			for i, (txt, fut) in enumerate(futures, 1):
+				links = fut.result()
+				if links: extracted.extend(links); deletions.append(txt)
+				self.progress(int(i*100/len(futures)))
+		total = len(extracted)
+		if extracted:
+			with out_file.open("a", encoding="utf-8") as f:
+				f.write("".join(link+"\n" for link in extracted))
+			if auto_delete_txt:
+				for t in deletions:
+					try: t.unlink()
+					except Exception: pass
+		self.scan_cache.invalidate(Path(base_dir))
 		self.logger.write(f"[ED2K] 共提取 {total} 条 -> {out_file}")
 		self.notify(f"完成，输出: {out_file}")
 		return total
 
 	# ------------ Topaz 导出/导回 ------------
+	@_recorded()
 	def export_posters_for_enhance(self, source_dir: Path, work_dir: Path, open_topaz: bool = True) -> int:
+		return self._run_stages(source_dir, [self._export_stage(work_dir, open_topaz)])["export_posters"]
+
+	def _export_stage(self, work_dir: Path, open_topaz: bool) -> Stage:
+		return Collector("export_posters", SETTINGS["IMAGE_EXTENSIONS"], lambda r: "poster" in r.path.name.lower(),
+			lambda recs: self._export_posters(recs, Path(work_dir), open_topaz))
+
+	def _export_posters(self, records: List[FileRecord], work_dir: Path, open_topaz: bool) -> int:
 		mapping_csv = Path(SETTINGS["LOG_DIR_PATH"]) / "poster_mapping.csv"
 		_ensure_dir(work_dir); _ensure_dir(mapping_csv.parent)
-		items = []
-		for p in Path(source_dir).rglob("*"):
-			if p.is_file() and ("poster" in p.name.lower()) and p.suffix.lower() in SETTINGS["IMAGE_EXTENSIONS"]:
-				try: size = p.stat().st_size
-				except Exception: continue
-				items.append({"path": p, "name": p.name, "size": size})
+		# 同名文件按大小排序后大的覆盖小的：前面的阶段或外部程序可能已就地改写，按当前 stat 排序
+		items = [{"path": r.path, "name": r.path.name, "size": r.size} for r in self._restat(records)]
 		items.sort(key=lambda x: x["size"])
+		jobs = [(it["path"], Path(work_dir)/it["name"]) for it in items]
+		report = self._batch(jobs, self._place)
 		with mapping_csv.open("w", newline="", encoding="utf-8") as f:
 			w = csv.writer(f); w.writerow(["filename","original_path"])
-			for i, it in enumerate(items, 1):
-				shutil.copy2(str(it["path"]), str(Path(work_dir)/it["name"]))
-				w.writerow([it["name"], str(it["path"])])
-				self.progress(int(i*100/len(items)) if items else 0)
-		self.logger.write(f"[Topaz导出] {len(items)} 个 -> {work_dir} / 映射: {mapping_csv}")
+			for it, st in zip(items, report.status):
+				if st == "ok": w.writerow([it["name"], str(it["path"])])
+		for i, e in report.errors: self.notify(f"导出失败 {items[i]['name']}: {e}")
+		self._touched([dst for (_, dst), st in zip(jobs, report.status) if st == "ok"])
+		exported, saved = report.count("ok"), sum(r or 0 for r in report.results)
+		self.logger.write(f"[Topaz导出] {exported} 个 -> {work_dir} / 映射: {mapping_csv}" + _saved_note(saved))
 		topaz = SETTINGS.get("TOPAZ_PHOTO_AI_PATH")
-		if open_topaz and topaz and Path(topaz).exists():
+		if open_topaz and topaz and Path(topaz).exists() and not self.cancelled():
 			try: subprocess.Popen([topaz, str(work_dir)]); self.notify("Topaz Photo AI 已启动")
 			except Exception as e: self.notify(f"启动 Topaz 失败: {e}")
-		return len(items)
+		return exported
 
+	@_recorded()
 	def import_enhanced_posters(self, work_dir: Path) -> int:
 		mapping_csv = Path(SETTINGS["LOG_DIR_PATH"]) / "poster_mapping.csv"
 		if not mapping_csv.exists():
 			self.notify("找不到 poster_mapping.csv，请先执行导出"); return 0
 		rows = list(csv.reader(mapping_csv.open("r", encoding="utf-8")))
 		if rows and rows[0] and rows[0][0]=="filename": rows = rows[1:]
-		count = 0
-		for i, (fname, orig) in enumerate(rows, 1):
-			src = Path(work_dir)/fname; dst = Path(orig)
-			if src.exists():
-				try: shutil.copy2(str(src), str(dst)); count += 1
-				except Exception as e: self.notify(f"导回失败 {fname}: {e}")
-			self.progress(int(i*100/len(rows)) if rows else 0)
-		self.logger.write(f"[Topaz导回] 成功 {count}/{len(rows)}")
+		def put_back(src: Path, dst: Path) -> str:
+			if not src.exists(): return "missing"
+			if self._unchanged(src, dst): return "unchanged"
+			# 先写临时文件再替换：原图若与工作目录是硬链接，不会被写穿
+			self.mover.copy_file(src, dst); return "written"
+		jobs = [(Path(work_dir)/fname, Path(orig)) for fname, orig in rows]
+		report = self._batch(jobs, put_back)
+		for i, e in report.errors: self.notify(f"导回失败 {rows[i][0]}: {e}")
+		written = [dst for (_, dst), res in zip(jobs, report.results) if res == "written"]
+		unchanged = report.results.count("unchanged")
+		count = len(written)
+		self._touched(written)
+		self.logger.write(f"[Topaz导回] 成功 {count}/{len(rows)}" + (f"（未变化跳过 {unchanged}）" if unchanged else ""))
 		return count
 
 	# ------------ 封面替换（对比大小） ------------
-	def replace_covers_by_size(self, cover_repo: Path, target_root: Path) -> int:
-		def id_from_name(name: str):
-			m = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', name, re.IGNORECASE)
-			return m.group(1).upper() if m else None
-		index: Dict[str, Dict] = {}
-		for p in Path(cover_repo).rglob("*"):
-			if p.is_file() and p.suffix.lower() in SETTINGS["IMAGE_EXTENSIONS"]:
-				bid = id_from_name(p.name)
-				if not bid: continue
-				sz = p.stat().st_size
-				if bid not in index or sz > index[bid]["size"]:
-					index[bid] = {"path": p, "size": sz}
+	@_recorded()
+	def replace_covers_by_size(self, cover_repo: Path, target_root: Path, mode: str = "size") -> int:
+		"""mode='size' 按文件大小比较；mode='resolution' 按像素数（只读文件头），相同再比大小"""
+		return self._run_stages(target_root, [self._covers_stage(cover_repo, mode)])["replace_covers"]
+
+	def _covers_stage(self, cover_repo: Path, mode: str = "size") -> Stage:
+		return Collector("replace_covers", SETTINGS["IMAGE_EXTENSIONS"], lambda r: r.path.stem.lower().endswith(("-fanart", "-thumb")),
+			lambda recs: self._replace_covers(Path(cover_repo), recs, mode))
+
+	def _replace_covers(self, cover_repo: Path, targets: List[FileRecord], mode: str = "size") -> int:
+		repo = [(r, bid) for r in self._scan(Path(cover_repo), SETTINGS["IMAGE_EXTENSIONS"]) for bid in [extract_id(r.path.name)] if bid]
+		repo_ids = {bid for _, bid in repo}
+		targets = [(r, bid) for r in targets for bid in [extract_id(r.path.name)] if bid in repo_ids]
+		# 覆盖与否取决于大小，参与比较的两侧都以当前 stat 为准
+		target_ids = {bid for _, bid in targets}
+		repo = [(r, extract_id(r.path.name)) for r in self._restat([r for r, bid in repo if bid in target_ids])]
+		targets = [(r, extract_id(r.path.name)) for r in self._restat([r for r, _ in targets])]
+		repo_ids = {bid for _, bid in repo}
+		targets = [(r, bid) for r, bid in targets if bid in repo_ids]
+		if mode == "resolution":
+			dims = image_sizes([r.path for r, _ in repo + targets], cache=self.hashes)
+			def key(r: FileRecord):
+				d = dims.get(r.path)
+				return (d[0] * d[1] if d else 0, r.size)
+		else:
+			key = lambda r: r.size
+		index: Dict[str, FileRecord] = {}
+		for r, bid in repo:
+			if bid not in index or key(r) > key(index[bid]): index[bid] = r
 		replaces = []
-		for img in Path(target_root).rglob("*"):
-			if not (img.is_file() and img.suffix.lower() in SETTINGS["IMAGE_EXTENSIONS"]): continue
-			stem = img.stem.lower()
-			if not (stem.endswith("-fanart") or stem.endswith("-thumb")): continue
-			bid = id_from_name(img.name)
-			if not bid or bid not in index: continue
-			try: tsize = img.stat().st_size
-			except Exception: continue
-			if index[bid]["size"] > tsize:
-				replaces.append({"src": index[bid]["path"], "dst": img})
-		for i, it in enumerate(replaces, 1):
-			try:
-				if it["dst"].exists(): it["dst"].unlink()
-				shutil.copy2(str(it["src"]), str(it["dst"]))
-			except Exception as e:
-				self.notify(f"替换失败 {it['dst'].name}: {e}")
-			self.progress(int(i*100/len(replaces)) if replaces else 0)
-		self.logger.write(f"[封面替换] 成功 {len(replaces)}")
-		return len(replaces)
+		for r, bid in targets:
+			if self.cancelled(): break
+			if key(index[bid]) > key(r):
+				replaces.append({"src": index[bid].path, "dst": r.path})
+		def replace(src: Path, dst: Path):
+			return "unchanged" if self._unchanged(src, dst) else self._place(src, dst)
+		report = self._batch([(it["src"], it["dst"]) for it in replaces], replace)
+		for i, e in report.errors: self.notify(f"替换失败 {replaces[i]['dst'].name}: {e}")
+		attempted = [it["dst"] for it, st, res in zip(replaces, report.status, report.results) if st != "cancel" and res != "unchanged"]
+		self._touched(attempted)
+		unchanged = report.results.count("unchanged")
+		done, saved = len(attempted), sum(r for r in report.results if isinstance(r, int))
+		self.logger.write(f"[封面替换] 成功 {done}" + (f"（未变化跳过 {unchanged}）" if unchanged else "") + _saved_note(saved))
+		return done
 
 	# ------------ 字幕匹配复制 ------------
+	@_recorded()
 	def match_and_copy_subtitles(self, video_root: Path, subs_root: Path, priority_dirs: list, exts=('.srt','.ass','.ssa','.vtt')) -> int:
-		def base_id(name: str):
-			m = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', name, re.IGNORECASE)
-			return m.group(1).upper() if m else None
 		video_map: Dict[str, List[Path]] = {}
-		for p in video_root.rglob("*"):
-			if p.is_file() and p.suffix.lower() in SETTINGS["VIDEO_EXTENSIONS"]:
-				if any(x in p.name.lower() for x in [k.lower() for k in SETTINGS["SUBTITLE_EXCLUDE_KEYWORDS"]]): continue
-				bid = base_id(p.name)
-				if bid: video_map.setdefault(bid, []).append(p)
+		exclude = [k.lower() for k in SETTINGS["SUBTITLE_EXCLUDE_KEYWORDS"]]
+		for r in self._scan(video_root, SETTINGS["VIDEO_EXTENSIONS"]):
+			p = r.path
+			if any(x in p.name.lower() for x in exclude): continue
+			bid = extract_id(p.name)
+			if bid: video_map.setdefault(bid, []).append(p)
 
 		search_paths = []
 		for d in (priority_dirs or []):
@@ -190,22 +569,37 @@ class MediaToolkit:
 			if pp.is_dir(): search_paths.append(pp)
 		if subs_root not in search_paths: search_paths.append(subs_root)
 
+		# 每个搜索根只遍历一次，建立 番号 -> {whole, whole_ass, ass_parts, srt_parts} 倒排索引
+		def index_root(root: Path) -> Dict[str, Dict[str, List[Path]]]:
+			idx: Dict[str, Dict[str, List[Path]]] = {}
+			for r in self._scan(root, exts):
+				p = r.path; suf = p.suffix.lower()
+				bid = extract_id(p.name)
+				if not bid: continue
+				e = idx.setdefault(bid, {"whole": [], "whole_ass": [], "ass_parts": [], "srt_parts": []})
+				if p.stem.upper() == bid:
+					e["whole"].append(p)
+					if suf == '.ass': e["whole_ass"].append(p)
+				elif suf == '.ass': e["ass_parts"].append(p)
+				elif suf == '.srt': e["srt_parts"].append(p)
+			for e in idx.values():
+				e["ass_parts"].sort(); e["srt_parts"].sort()
+			return idx
+		sub_index = [index_root(root) for root in search_paths]
+
 		def best_for_id(bid: str) -> List[Path]:
-			for root in search_paths:
-				cands = [p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in exts and base_id(p.name)==bid]
-				if not cands: continue
-				whole = [p for p in cands if p.stem.upper()==bid]
-				if whole:
-					ass = [p for p in whole if p.suffix.lower()=='.ass']
-					return [ass[0]] if ass else [whole[0]]
-				ass_parts = [p for p in cands if p.suffix.lower()=='.ass']
-				if ass_parts: return sorted(ass_parts)
-				srt_parts = [p for p in cands if p.suffix.lower()=='.srt']
-				if srt_parts: return sorted(srt_parts)
+			for idx in sub_index:
+				e = idx.get(bid)
+				if not e: continue
+				if e["whole"]:
+					return [e["whole_ass"][0]] if e["whole_ass"] else [e["whole"][0]]
+				if e["ass_parts"]: return list(e["ass_parts"])
+				if e["srt_parts"]: return list(e["srt_parts"])
 			return []
 
-		copied = 0
+		copied = saved = 0
 		for i, (bid, vids) in enumerate(video_map.items(), 1):
+			if self.cancelled(): break
 			sel = best_for_id(bid)
 			for v in vids:
 				base = v.with_suffix('')
@@ -215,35 +609,37 @@ class MediaToolkit:
 						dest = base.parent / (newname + '.chs' + sub.suffix)
 					else:
 						dest = base.parent / (newname + sub.suffix)
-					if not dest.exists():
-						shutil.copy2(str(sub), str(dest)); copied += 1
+					if dest.exists(): continue
+					try: saved += self._place(sub, dest)
+					except OSError as e: self.notify(f"字幕复制失败 {dest.name}: {e}"); continue
+					copied += 1
+					self._touched([dest])
 			self.progress(int(i*100/len(video_map)) if video_map else 0)
-		self.logger.write(f"[字幕匹配] 复制 {copied} 个")
+		self.logger.write(f"[字幕匹配] 复制 {copied} 个" + _saved_note(saved))
 		return copied
 
 	# ------------ DMM 字幕重命名 ------------
+	@_recorded()
 	def rename_srt_cid_to_bangou(self, root: Path) -> int:
 		def conv(name: str):
 			if not name.lower().endswith('.srt'): return None
-			n = Path(name).stem
-			ms = re.findall(r'([a-zA-Z]+)(\d+)', n)
-			if not ms: return None
-			label, num = ms[-1]
-			if len(label) < 2: return None
-			return f"{label.upper()}-{int(num):03d}.srt"
+			bid = cid_to_bangou(Path(name).stem)
+			return f"{bid}.srt" if bid else None
 		renamed = 0
-		all_srt = [p for p in root.rglob("*.srt")]
+		all_srt = [r.path for r in self._scan(root, ('.srt',))]
 		for i, p in enumerate(all_srt, 1):
+			if self.cancelled(): break
 			new = conv(p.name)
 			if new and new != p.name:
 				dest = p.with_name(new)
-				try: p.rename(dest); renamed += 1
+				try: p.rename(dest); renamed += 1; self._moved(p, dest)
 				except Exception: pass
 			self.progress(int(i*100/len(all_srt)) if all_srt else 0)
 		self.logger.write(f"[字幕重命名] {renamed} 个")
 		return renamed
 
 	# ------------ 书库整理 ------------
+	@_recorded()
 	def organize_books(self, source_dir: Path, target_dir: Path, logic_type: str='1') -> int:
 		def title_A(fn: str):
 			name = Path(fn).stem
@@ -264,41 +660,47 @@ class MediaToolkit:
 		files = [p for p in Path(source_dir).iterdir() if p.is_file()]
 		moved = 0
 		for i, f in enumerate(files, 1):
+			if self.cancelled(): break
+			# 跨盘移动大文件时按已复制字节推进进度条
+			bp = lambda done, total, i=i: self.progress(int((i - 1 + done / max(1, total)) * 100 / len(files)))
 			base = title_A(f.name) if logic_type=='2' else title_B(f.name)
 			dest_dir = Path(target_dir)/base
 			_ensure_dir(dest_dir)
 			dest = dest_dir / f.name
 			if dest.exists():
 				if f.stat().st_size == dest.stat().st_size:
-					shutil.move(str(f), str(dest))
+					self._move(f, dest, overwrite=True, progress=bp)
 				else:
 					exist = [x for x in dest_dir.iterdir() if x.is_file()]
 					if len(exist) == 1:
 						old = exist[0]
-						old.rename(dest_dir / f"{base}-版本1{old.suffix}")
+						old.rename(dest_dir / f"{base}-版本1{old.suffix}"); self._moved(old, dest_dir / f"{base}-版本1{old.suffix}")
 					new_ver = len(list(dest_dir.iterdir())) + 1
-					shutil.move(str(f), str(dest_dir / f"{base}-版本{new_ver}{f.suffix}"))
+					self._move(f, dest_dir / f"{base}-版本{new_ver}{f.suffix}", progress=bp)
 			else:
-				shutil.move(str(f), str(dest))
+				self._move(f, dest, progress=bp)
 			moved += 1
 			self.progress(int(i*100/len(files)) if files else 0)
 		self.logger.write(f"[书库整理] {moved} 个")
 		return moved
 
 	# ------------ Coser 二级整理 ------------
+	@_recorded()
 	def coser_group_level2(self, root: Path) -> int:
 		moved = 0
 		for top in [p for p in Path(root).iterdir() if p.is_dir()]:
+			if self.cancelled(): break
 			for sub in [p for p in top.iterdir() if p.is_dir() and ' - ' in p.name]:
 				name = sub.name.split(' - ', 1)[0].strip()
 				dest_parent = Path(root) / name
 				_ensure_dir(dest_parent)
-				shutil.move(str(sub), str(dest_parent))
+				self._move(sub, dest_parent / sub.name)
 				moved += 1
 		self.logger.write(f"[Coser二级] 移动 {moved} 个")
 		return moved
 
 	# ------------ Coser 按首字母 ------------
+	@_recorded()
 	def coser_group_by_letter(self, root: Path) -> int:
 		try:
 			from pypinyin import pinyin, Style
@@ -314,118 +716,211 @@ class MediaToolkit:
 			return '#'
 		moved = 0
 		for folder in [p for p in Path(root).iterdir() if p.is_dir()]:
+			if self.cancelled(): break
 			if re.match(r'^【[A-Z0-9#]】$', folder.name): continue
 			dest = Path(root) / f"【{first_letter(folder.name)}】"
 			_ensure_dir(dest)
-			shutil.move(str(folder), str(dest))
+			self._move(folder, dest / folder.name)
 			moved += 1
 		self.logger.write(f"[Coser首字母] 归档 {moved} 个")
 		return moved
 
 	# ------------ 视频批量重命名（文件） ------------
+	@_recorded()
 	def video_batch_rename_files(self, directory: Path, suffix="-4K") -> int:
-		pat = re.compile(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)')
+		"""suffix='auto' 时读取视频文件头：4K 加 -4K，其余加 -C，分辨率读不出的不动；
+		字幕/NFO/图片等附属文件跟随同番号视频的判定（同番号任一视频为 4K 即按 4K），没有可判定视频的不动"""
 		ren = 0
 		files = [p for p in Path(directory).iterdir() if p.is_file()]
-		for i, f in enumerate(files, 1):
-			m = pat.search(f.name.upper())
-			if m:
-				new = f"{m.group(1)}{suffix}{f.suffix}"
+		bids = extract_ids(f.name for f in files)
+		auto = suffix == "auto"
+		own: Dict[Path, Optional[bool]] = {}
+		by_bid: Dict[str, bool] = {}
+		if auto:
+			videos = [f for f in files if f.suffix.lower() in SETTINGS["VIDEO_EXTENSIONS"]]
+			dims = video_sizes(videos, cache=self.hashes)
+			for f, bid in zip(files, bids):
+				if f.suffix.lower() not in SETTINGS["VIDEO_EXTENSIONS"]: continue
+				own[f] = uhd = is_uhd(dims.get(f))
+				if bid and uhd is not None: by_bid[bid] = by_bid.get(bid, False) or uhd
+		for i, (f, bid) in enumerate(zip(files, bids), 1):
+			if self.cancelled(): break
+			uhd = (own[f] if f in own else by_bid.get(bid)) if auto else None
+			if bid and not (auto and uhd is None):
+				new = f"{bid}{('-4K' if uhd else '-C') if auto else suffix}{f.suffix}"
 				if new != f.name:
-					f.rename(f.with_name(new)); ren += 1
+					f.rename(f.with_name(new)); ren += 1; self._moved(f, f.with_name(new))
 			self.progress(int(i*100/max(1,len(files))))
 		self.logger.write(f"[视频重命名] {ren} 个")
 		return ren
 
 	# ------------ 文件夹命名 C/4K ------------
+	@_recorded()
 	def folder_and_files_rename(self, source_dir: Path, mode: str='C') -> int:
-		suffix = f"-{mode.upper()}"
+		"""mode='auto' 时按文件夹内视频的实际分辨率决定：任一视频为 4K 则按 4K 处理，否则按 C；
+		文件夹内没有能读出分辨率的视频则跳过"""
+		folders = [p for p in Path(source_dir).iterdir() if p.is_dir() and not p.name.upper().endswith(('-C','-4K'))]
+		modes = {f: mode.upper() for f in folders}
+		if mode.lower() == 'auto':
+			videos = {f: [v for v in f.iterdir() if v.is_file() and v.suffix.lower() in SETTINGS["VIDEO_EXTENSIONS"]] for f in folders}
+			dims = video_sizes([v for vs in videos.values() for v in vs], cache=self.hashes)
+			for f, vs in videos.items():
+				flags = [is_uhd(dims.get(v)) for v in vs]
+				modes[f] = '4K' if any(flags) else ('C' if False in flags else None)
+			self.logger.write(f"[文件夹命名auto] 4K {sum(m == '4K' for m in modes.values())} 个，"
+				f"C {sum(m == 'C' for m in modes.values())} 个，无法识别 {sum(m is None for m in modes.values())} 个")
 		changed = 0
-		for folder in [p for p in Path(source_dir).iterdir() if p.is_dir()]:
-			if folder.name.upper().endswith(('-C','-4K')): continue
-			new_folder = folder.with_name(folder.name + suffix)
-			folder.rename(new_folder); changed += 1
-			if mode.upper() == '4K':
+		for folder in folders:
+			if self.cancelled(): break
+			m = modes[folder]
+			if m is None: continue
+			new_folder = folder.with_name(folder.name + f"-{m}")
+			folder.rename(new_folder); changed += 1; self._moved(folder, new_folder)
+			if m == '4K':
 				for f in new_folder.iterdir():
 					if f.is_file():
 						base = f.stem
 						if '-4K' in base: continue
-						m = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', base, re.IGNORECASE)
-						if m: newbase = base.replace(m.group(1), f"{m.group(1)}-4K", 1)
+						raw = find_id(base)
+						if raw: newbase = base.replace(raw, f"{raw}-4K", 1)
 						else: newbase = base + '-4K'
-						f.rename(f.with_name(newbase + f.suffix))
+						f.rename(f.with_name(newbase + f.suffix)); self._moved(f, f.with_name(newbase + f.suffix))
 		self.logger.write(f"[文件夹命名{mode}] {changed} 个")
 		return changed
 
 	# ------------ NFO 厂商整理 ------------
+	@_recorded()
 	def nfo_organize_by_maker(self, source_root: Path, dest_root: Path) -> int:
-		import xml.etree.ElementTree as ET
-		def maker_from_dir(d: Path):
-			try:
-				nfo = next(x for x in d.iterdir() if x.suffix.lower()=='.nfo')
-				root = ET.parse(str(nfo)).getroot()
-				for tag in ('maker','studio'):
-					el = root.find(tag)
-					if el is not None and el.text: 
-						return re.sub(r'[\\/*?:"<>|]', '_', el.text.strip())
-			except Exception:
-				return None
+		return self._run_stages(source_root, [self._nfo_stage(dest_root)])["nfo_organize"]
+
+	def _nfo_stage(self, dest_root: Path) -> Stage:
+		return Collector("nfo_organize", ('.nfo',), lambda r: True, lambda recs: self._nfo_organize(recs, Path(dest_root)))
+
+	def _nfo_organize(self, nfo_files: List[FileRecord], dest_root: Path) -> int:
+		# 每个目录取名称最靠前的 .nfo；并行流式读取 maker/studio，未变化的 NFO 直接用缓存
+		nfo_of: Dict[Path, Path] = {}
+		for r in sorted(nfo_files, key=lambda r: str(r.path)): nfo_of.setdefault(r.path.parent, r.path)
+		makers = read_makers(nfo_of.values(), cache=self.hashes)
+		# 含 .nfo 的目录，按层级由浅到深（与 os.walk 自顶向下一致）；上级已被移走的跳过
+		nfo_dirs = sorted(nfo_of, key=lambda d: (len(d.parts), str(d)))
 		moved = 0
-		for d, _, files in os.walk(source_root):
-			p = Path(d)
-			if not any(x.lower().endswith('.nfo') for x in files): continue
-			maker = maker_from_dir(p)
+		for p in nfo_dirs:
+			if self.cancelled(): break
+			if not p.is_dir(): continue
+			maker = makers.get(nfo_of[p])
 			if not maker: continue
 			folder_name = p.name
-			key_m = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', folder_name, re.IGNORECASE)
+			key = find_id(folder_name)
 			dest_man = Path(dest_root)/f"【{maker}】"
-			dest_parent = dest_man / f"【{key_m.group(1).split('-')[0]}】" if key_m else dest_man
+			dest_parent = dest_man / f"【{key.split('-')[0]}】" if key else dest_man
 			_ensure_dir(dest_parent)
 			if not (dest_parent/folder_name).exists():
-				shutil.move(str(p), str(dest_parent)); moved += 1
+				self._move(p, dest_parent / p.name); moved += 1
 		self.logger.write(f"[NFO整理] 移动 {moved} 个")
 		return moved
 
 	# ------------ Poster 匹配替换 ------------
+	def _poster_source_index(self, image_source: Path) -> Dict[str, Path]:
+		# 图片源按文件名中出现的所有番号片段建索引；同一会话内目录未变化则直接复用
+		key = str(image_source)
+		try: mtime = image_source.stat().st_mtime_ns
+		except OSError: mtime = None
+		cached = self._poster_src_cache.get(key)
+		if cached and cached[0] == mtime: return cached[1]
+		index: Dict[str, Path] = {}
+		for s in image_source.iterdir():
+			if s.is_file() and s.suffix.lower() in SETTINGS["IMAGE_EXTENSIONS"]:
+				for tok in id_tokens(s.name): index.setdefault(tok, s)
+		self._poster_src_cache[key] = (mtime, index)
+		return index
+
+	@_recorded()
 	def poster_replace_from_source(self, jav_output: Path, image_source: Path) -> int:
-		def id_of(name: str):
-			m = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', name, re.IGNORECASE)
-			return m.group(1).upper() if m else None
-		src_list = [p for p in Path(image_source).iterdir() if p.is_file() and p.suffix.lower() in SETTINGS["IMAGE_EXTENSIONS"]]
-		replaced = 0
-		for p in Path(jav_output).rglob("*"):
-			if p.is_file() and 'poster' in p.name.lower() and p.suffix.lower() in SETTINGS["IMAGE_EXTENSIONS"]:
-				bid = id_of(p.name); 
-				if not bid: continue
-				pat = re.compile(r'(?:^|[^a-zA-Z0-9])' + re.escape(bid) + r'(?:[^a-zA-Z0-9]|$)', re.IGNORECASE)
-				src = next((s for s in src_list if pat.search(s.name)), None)
-				if src:
-					shutil.copy2(str(src), str(p)); replaced += 1
+		return self._run_stages(jav_output, [self._poster_stage(image_source)])["poster_replace"]
+
+	def _poster_stage(self, image_source: Path) -> Stage:
+		return Collector("poster_replace", SETTINGS["IMAGE_EXTENSIONS"], lambda r: 'poster' in r.path.name.lower(),
+			lambda recs: self._poster_replace(recs, Path(image_source)))
+
+	def _poster_replace(self, posters: List[FileRecord], image_source: Path) -> int:
+		src_index = self._poster_source_index(image_source)
+		written = []
+		for r in posters:
+			if self.cancelled(): break
+			p = r.path
+			bid = extract_id(p.name)
+			if not bid: continue
+			src = src_index.get(bid)
+			if not src: continue
+			try: self.mover.copy_file(src, p)
+			except OSError as e: self.notify(f"Poster替换失败 {p.name}: {e}"); continue
+			written.append(p)
+		self._touched(written)
+		replaced = len(written)
 		self.logger.write(f"[Poster替换] {replaced} 个")
 		return replaced
 
+	# ------------ 组合任务（单次遍历） ------------
+	@_recorded()
+	def run_combined(self, root: Path, cover_repo: Optional[Path] = None, image_source: Optional[Path] = None,
+			export_dir: Optional[Path] = None, nfo_dest: Optional[Path] = None, open_topaz: bool = False,
+			cover_mode: str = "size") -> Dict[str, int]:
+		"""对同一目录树组合执行多个操作，只遍历一次；未给参数的操作不执行。
+		执行顺序固定为 封面替换 -> Poster替换 -> Topaz导出 -> NFO整理（移动目录放最后），
+		结果与按此顺序分别调用各方法相同"""
+		stages: List[Stage] = []
+		if cover_repo: stages.append(self._covers_stage(cover_repo, cover_mode))
+		if image_source: stages.append(self._poster_stage(image_source))
+		if export_dir: stages.append(self._export_stage(export_dir, open_topaz))
+		if nfo_dest: stages.append(self._nfo_stage(nfo_dest))
+		if not stages: return {}
+		return self._run_stages(root, stages)
+
+	# ------------ 重复文件查找 ------------
+	@_recorded()
+	def find_duplicates(self, roots: List[Path], exts=None, min_size: int = 1) -> Dict[str, object]:
+		"""在多个目录中查找内容完全相同的文件，结果写入 LOG_DIR_PATH/duplicates_<时间>.csv（组号,大小,路径）"""
+		exts = exts or tuple(SETTINGS["VIDEO_EXTENSIONS"]) + tuple(SETTINGS["IMAGE_EXTENSIONS"])
+		records: List[FileRecord] = []
+		for root in roots:
+			if self.cancelled(): break
+			if Path(root).is_dir(): records.extend(self._scan(Path(root), exts))
+			else: self.notify(f"[查重] 跳过不存在的目录: {root}")
+		finder = DuplicateFinder(self.hashes, progress=lambda done, total: self.progress(int(done*100/max(1, total))), cancelled=self.cancelled)
+		groups = finder.find(records, min_size)
+		self._touched(finder.stale)
+		ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+		report = Path(SETTINGS["LOG_DIR_PATH"]) / f"duplicates_{ts}.csv"
+		_ensure_dir(report.parent)
+		with report.open("w", newline="", encoding="utf-8") as f:
+			w = csv.writer(f); w.writerow(["group", "size", "path"])
+			for gi, g in enumerate(groups, 1):
+				for r in g: w.writerow([gi, r.size, str(r.path)])
+		extra = sum(len(g) - 1 for g in groups)
+		wasted = sum((len(g) - 1) * g[0].size for g in groups)
+		st = finder.stats
+		links = f"（跳过硬链接 {st['hardlinks']}）" if st["hardlinks"] else ""
+		self.logger.write(f"[查重] 文件 {st['files']}{links}，重复组 {len(groups)}（多余 {extra} 个，可节省 {wasted / 1073741824:.2f} GB）"
+			f"，部分哈希 {st['partial_hashed']} / 全量哈希 {st['full_hashed']} / 缓存命中 {st['cache_hits']} -> {report}")
+		return {"groups": len(groups), "duplicates": extra, "wasted_bytes": wasted, "report": str(report)}
+
 	# ------------ 序列下载 ------------
-	def sequence_download(self, url_tmpl: str, save_dir: Path, start: int, end: int, padding: int=3, batch: int=50, pause: int=30) -> Tuple[int,int]:
-		import requests
+	@_recorded("ok", "fail")
+	def sequence_download(self, url_tmpl: str, save_dir: Path, start: int, end: int, padding: int=3, batch: int=50, pause: int=30,
+			workers: Optional[int] = None) -> Tuple[int,int]:
+		# 原先每 batch 个暂停 pause 秒；现以令牌桶限速：容量 batch，补充速率 batch/pause（DOWNLOAD_RATE 可覆盖）
 		_ensure_dir(save_dir)
-		ok = fail = 0
-		total = max(1, end-start+1)
+		rate = SETTINGS.get("DOWNLOAD_RATE") or (batch/pause if batch>0 and pause>0 else 0)
+		engine = DownloadEngine(workers=workers or SETTINGS.get("DOWNLOAD_WORKERS", 8), rate=rate, burst=max(1, batch))
+		jobs = []
 		for i in range(start, end+1):
-			num = f"{i:0{padding}d}"
-			url = url_tmpl.format(num=num)
-			dest = save_dir / url.split('/')[-1]
-			try:
-				r = requests.get(url, timeout=30, stream=True)
-				if r.status_code == 200:
-					with dest.open('wb') as f:
-						for chunk in r.iter_content(chunk_size=8192): f.write(chunk)
-					ok += 1
-				else:
-					fail += 1
-			except Exception:
-				fail += 1
-			if batch>0 and (i-start+1)%batch==0 and i<end:
-				time.sleep(pause)
-			self.progress(int((i-start+1)*100/total))
-		self.logger.write(f"[序列下载] 成功 {ok} 失败 {fail}")
+			url = url_tmpl.format(num=f"{i:0{padding}d}")
+			jobs.append((url, save_dir / url.split('/')[-1]))
+		try:
+			counts = engine.run(jobs, progress=lambda done, total: self.progress(int(done*100/max(1, total))), cancelled=self.cancelled)
+		finally:
+			engine.close()
+		ok, fail = counts["ok"] + counts["skip"], counts["fail"]
+		self.scan_cache.invalidate(save_dir)
+		self.logger.write(f"[序列下载] 成功 {ok}（未变化跳过 {counts['skip']}） 失败 {fail}" + (f" 取消 {counts['cancel']}" if counts['cancel'] else ""))
 		return ok, fail
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NFO 读取：iterparse 流式解析，拿到需要的字段即停止；线程池并行，结果按 (路径, 大小, mtime) 缓存
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from config import SETTINGS
+from hashcache import cached_batch
+
+_UNSAFE = re.compile(r'[\\/*?:"<>|]')
+
+
+def read_maker(path: Path) -> Optional[str]:
+	"""根元素下第一个 <maker>，没有则第一个 <studio>（与 root.find 的优先级一致），并替换文件名非法字符。
+	找到 maker 后立即停止读取；无法解析返回 None"""
+	maker = studio = None  # None 未出现；其余为原始文本（可能为空串）
+	depth = 0
+	try:
+		for event, el in ET.iterparse(str(path), events=("start", "end")):
+			if event == "start":
+				depth += 1; continue
+			depth -= 1
+			if depth == 1:
+				if el.tag == "maker" and maker is None:
+					maker = el.text or ""
+					if maker: break
+				elif el.tag == "studio" and studio is None:
+					studio = el.text or ""
+				# maker 为空时只看 studio；studio 已出现就不必再读
+				if maker == "" and studio is not None: break
+				el.clear()
+	except (ET.ParseError, OSError, UnicodeDecodeError):
+		return None
+	text = maker or studio
+	return _UNSAFE.sub('_', text.strip()) if text else None
+
+
+def read_makers(paths: Iterable[Path], cache=None, workers: Optional[int] = None) -> Dict[Path, Optional[str]]:
+	"""批量读取 maker；cache 为 HashCache 时命中的不再打开文件，新结果写回缓存"""
+	return cached_batch(paths, "nfo_maker", read_maker, cache, workers or SETTINGS.get("NFO_WORKERS", 8))
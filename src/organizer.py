@@ -5,10 +5,14 @@
 """
 
 import os
-import shutil
+import queue
+import threading
 from pathlib import Path
 from datetime import datetime
 from PyQt5.QtCore import QThread, pyqtSignal
+from config import SETTINGS
+from scanner import DirLister
+from transfer import TransferEngine
 
 class MediaOrganizerWorker(QThread):
     """后台工作线程，处理文件整理"""
@@ -16,26 +20,38 @@ class MediaOrganizerWorker(QThread):
     status = pyqtSignal(str)
     finished = pyqtSignal()
     error = pyqtSignal(str)
+
+    MEDIA_EXTENSIONS = {
+        '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp',  # 图片
+        '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm',    # 视频
+        '.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma',            # 音频
+        '.pdf', '.doc', '.docx', '.txt', '.rtf'                      # 文档
+    }
     
     def __init__(self, source_dir, target_dir, organize_by_date=True, 
-                 organize_by_type=True, create_subfolders=True):
+                 organize_by_type=True, create_subfolders=True, bus=None, streaming=None):
         super().__init__()
+        self.bus = bus
         self.source_dir = source_dir
         self.target_dir = target_dir
         self.organize_by_date = organize_by_date
         self.organize_by_type = organize_by_type
         self.create_subfolders = create_subfolders
         self.is_running = True
+        self.mover = TransferEngine()
+        self.streaming = SETTINGS.get("ORGANIZE_STREAMING", True) if streaming is None else streaming
         
     def run(self):
         """运行整理任务"""
+        if self.streaming:
+            return self._run_streaming()
         try:
-            self.status.emit("开始整理媒体文件...")
+            self._status("开始整理媒体文件...")
             files = self._get_media_files()
             total_files = len(files)
             
             if total_files == 0:
-                self.status.emit("未找到媒体文件")
+                self._status("未找到媒体文件")
                 self.finished.emit()
                 return
                 
@@ -45,35 +61,132 @@ class MediaOrganizerWorker(QThread):
                     
                 self._organize_file(file_path)
                 progress = int((i + 1) / total_files * 100)
-                self.progress.emit(progress)
-                self.status.emit(f"正在处理: {file_path.name}")
+                self._progress(progress)
+                self._status(f"正在处理: {file_path.name}")
                 
-            self.status.emit("文件整理完成！")
+            self._status("文件整理完成！")
             self.finished.emit()
             
         except Exception as e:
             self.error.emit(f"整理过程中出错: {str(e)}")
             
+    def _status(self, msg, log=True):
+        """有事件总线时写入总线（按帧合并），否则直接发信号；log=False 只更新状态栏（如字节进度）"""
+        if self.bus:
+            self.bus.post_status(msg)
+            if log:
+                self.bus.post_log(msg)
+        else:
+            self.status.emit(msg)
+
+    def _progress(self, value):
+        if self.bus:
+            self.bus.post_progress(value)
+        else:
+            self.progress.emit(value)
+            
+    def _run_streaming(self):
+        """边扫描边移动：扫描结果经有界队列交给移动线程，内存占用与文件总数无关；
+        扫描未结束时按已发现数估算进度"""
+        try:
+            self._status("开始整理媒体文件（边扫描边移动）...")
+            workers = max(1, SETTINGS.get("ORGANIZE_WORKERS", 4))
+            jobs = queue.Queue(maxsize=max(1, SETTINGS.get("ORGANIZE_QUEUE_SIZE", 256)))
+            lock = threading.Lock()
+            # 正在移动的目标路径：同名文件排在前面的先占用，后来者跳过（与顺序处理时“目标已存在则跳过”一致）
+            inflight = set()
+            state = {"found": 0, "done": 0, "scanning": True, "error": None}
+
+            def finish_one():
+                with lock:
+                    state["done"] += 1
+                    done, found, scanning = state["done"], state["found"], state["scanning"]
+                value = done * 100 // max(1, found)
+                self._progress(min(value, 99) if scanning else value)
+
+            def consume():
+                while True:
+                    item = jobs.get()
+                    if item is None:
+                        return
+                    file_path, target = item
+                    # 停止或出错后队列里剩下的不再处理，也不计入完成数（进度停在实际位置）
+                    handled = self.is_running and state["error"] is None
+                    try:
+                        if handled:
+                            self._move_to(file_path, target)
+                            self._status(f"正在处理: {file_path.name}")
+                    except Exception as e:
+                        with lock:
+                            state["error"] = state["error"] or e
+                    finally:
+                        with lock:
+                            inflight.discard(target)
+                        if handled:
+                            finish_one()
+
+            threads = [threading.Thread(target=consume, daemon=True) for _ in range(workers)]
+            for t in threads:
+                t.start()
+            lister = DirLister()
+            # 目标目录在源目录之内时，扫描中会遇到刚移过去的文件，跳过
+            target_root = os.path.join(os.path.abspath(self.target_dir), "")
+            try:
+                for rec in lister.walk(Path(self.source_dir), self.MEDIA_EXTENSIONS):
+                    if not self.is_running or state["error"] is not None:
+                        break
+                    if os.path.abspath(rec.path).startswith(target_root):
+                        continue
+                    target = self._target_dir(rec.path, rec.mtime) / rec.path.name
+                    with lock:
+                        state["found"] += 1
+                        busy = target in inflight
+                        if not busy:
+                            inflight.add(target)
+                    if busy:
+                        finish_one()
+                        continue
+                    jobs.put((rec.path, target))
+            finally:
+                with lock:
+                    state["scanning"] = False
+                for _ in threads:
+                    jobs.put(None)
+                for t in threads:
+                    t.join()
+
+            if state["error"] is not None:
+                raise state["error"]
+            s = lister.stats.summary()
+            if state["found"] == 0:
+                self._status("未找到媒体文件")
+            else:
+                self._progress(100 if self.is_running else state["done"] * 100 // state["found"])
+                self._status(f"文件整理完成！共 {state['found']} 个文件，列目录 {s['calls']} 次，平均 {s['mean_ms']} ms")
+            self.finished.emit()
+
+        except Exception as e:
+            self.error.emit(f"整理过程中出错: {str(e)}")
+
     def _get_media_files(self):
         """获取所有媒体文件"""
-        media_extensions = {
-            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp',  # 图片
-            '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm',    # 视频
-            '.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma',            # 音频
-            '.pdf', '.doc', '.docx', '.txt', '.rtf'                      # 文档
-        }
-        
-        files = []
-        for file_path in Path(self.source_dir).rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in media_extensions:
-                files.append(file_path)
+        # 并行列目录，每个文件只 stat 一次
+        lister = DirLister()
+        files = [r.path for r in lister.walk(Path(self.source_dir), self.MEDIA_EXTENSIONS)]
+        s = lister.stats.summary()
+        self._status(f"扫描完成：{len(files)} 个文件，列目录 {s['calls']} 次，平均 {s['mean_ms']} ms")
         return files
         
     def _organize_file(self, file_path):
         """整理单个文件"""
         # 获取文件信息
         stat = file_path.stat()
-        modified_time = datetime.fromtimestamp(stat.st_mtime)
+        target_path = self._target_dir(file_path, stat.st_mtime)
+        self._move_to(file_path, target_path / file_path.name)
+
+    def _target_dir(self, file_path, mtime):
+        """按类型 / 年 / 月计算目标目录"""
+        modified_time = datetime.fromtimestamp(mtime)
         
         # 创建目标路径
         target_path = Path(self.target_dir)
@@ -86,14 +199,17 @@ class MediaOrganizerWorker(QThread):
             year = modified_time.strftime('%Y')
             month = modified_time.strftime('%m')
             target_path = target_path / year / month
-            
+        return target_path
+
+    def _move_to(self, file_path, new_file_path):
         if self.create_subfolders:
-            target_path.mkdir(parents=True, exist_ok=True)
+            new_file_path.parent.mkdir(parents=True, exist_ok=True)
             
         # 移动文件
-        new_file_path = target_path / file_path.name
         if not new_file_path.exists():
-            shutil.move(str(file_path), str(new_file_path))
+            # 同盘直接改名；跨盘复制时在状态栏显示字节进度，不进日志（每个文件只记一行“正在处理”）
+            self.mover.move(file_path, new_file_path, progress=lambda done, total: self._status(
+                f"正在移动: {file_path.name} {done * 100 // max(1, total)}%", log=False))
             
     def _get_file_type(self, extension):
         """根据文件扩展名获取文件类型"""
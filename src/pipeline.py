@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单次遍历流水线：多个操作注册为阶段，共享同一次目录遍历
+"""
+
+from typing import Callable, Iterable, List, Optional, Tuple
+from catalog import FileRecord
+
+
+class Stage:
+	"""流水线阶段：遍历时 visit() 只收集感兴趣的文件，遍历结束后 apply() 统一执行并返回计数"""
+	name = ""
+	exts: Optional[Tuple[str, ...]] = None  # 只接收这些扩展名（小写，含点）；None 表示全部
+
+	def visit(self, rec: FileRecord):
+		pass
+
+	def apply(self):
+		return 0
+
+
+class Collector(Stage):
+	"""通用阶段：收集 pick(rec) 为真的记录，apply 时交给 run(records)"""
+	def __init__(self, name: str, exts, pick: Callable[[FileRecord], bool], run: Callable[[List[FileRecord]], object]):
+		self.name, self.exts, self.pick, self.run = name, exts, pick, run
+		self.records: List[FileRecord] = []
+
+	def visit(self, rec: FileRecord):
+		if self.pick(rec): self.records.append(rec)
+
+	def apply(self):
+		return self.run(self.records)
+
+
+def traverse(records: Iterable[FileRecord], stages: List[Stage], cancelled: Callable[[], bool] = lambda: False):
+	"""把每条记录分发给关心它的阶段（每条记录只经过一次）"""
+	stages = [(st, tuple(x.lower() for x in st.exts) if st.exts else None) for st in stages]
+	for rec in records:
+		if cancelled(): break
+		ext = rec.path.suffix.lower()
+		for st, exts in stages:
+			if exts is None or ext in exts: st.visit(rec)
+
+
+def run_stages(records: Iterable[FileRecord], stages: List[Stage], cancelled: Callable[[], bool] = lambda: False) -> dict:
+	"""一次遍历收集，再按注册顺序依次执行（取消由各阶段自行检查）；返回 {阶段名: 计数}"""
+	traverse(records, stages, cancelled)
+	return {st.name: st.apply() for st in stages}
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体头部探测：只读文件头取像素尺寸，不解码图像；视频只读 MP4 moov/tkhd 或 MKV Tracks 区域
+"""
+
+import os, struct
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+from config import SETTINGS
+from hashcache import cached_batch
+
+Size = Tuple[int, int]  # (宽, 高)
+
+# JPEG 中带尺寸的帧头：SOF0~SOF15，除去 DHT(C4)、JPG(C8)、DAC(CC)
+_SOF = {m for m in range(0xC0, 0xD0)} - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(f: BinaryIO) -> Optional[Size]:
+	"""逐段读 2 字节长度后跳过，直到 SOF；EXIF 缩略图等大段只 seek 不读"""
+	f.seek(2)
+	while True:
+		b = f.read(1)
+		while b and b != b"\xff": b = f.read(1)
+		while b == b"\xff": b = f.read(1)
+		if not b: return None
+		m = b[0]
+		if m == 0x01 or 0xD0 <= m <= 0xD8: continue  # 无长度字段的标记
+		if m in (0xD9, 0xDA): return None  # 到 EOI/SOS 仍未见 SOF
+		seg = f.read(2)
+		if len(seg) < 2: return None
+		length = struct.unpack(">H", seg)[0]
+		if m in _SOF:
+			data = f.read(5)
+			if len(data) < 5: return None
+			h, w = struct.unpack(">HH", data[1:5])
+			return (w, h) if w and h else None
+		f.seek(length - 2, 1)
+
+
+def _png_size(head: bytes) -> Optional[Size]:
+	if head[12:16] != b"IHDR": return None
+	return struct.unpack(">II", head[16:24])
+
+
+def _webp_size(head: bytes) -> Optional[Size]:
+	chunk = head[12:16]
+	if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+		w, h = struct.unpack("<HH", head[26:30])
+		return w & 0x3FFF, h & 0x3FFF
+	if chunk == b"VP8L" and head[20:21] == b"\x2f":
+		b = head[21:25]
+		return 1 + (b[0] | (b[1] & 0x3F) << 8), 1 + (b[1] >> 6 | b[2] << 2 | (b[3] & 0x0F) << 10)
+	if chunk == b"VP8X":
+		return 1 + int.from_bytes(head[24:27], "little"), 1 + int.from_bytes(head[27:30], "little")
+	return None
+
+
+def image_size(path: Path) -> Optional[Size]:
+	"""JPEG/PNG/WebP 的像素尺寸（按文件签名判断格式）；无法识别返回 None"""
+	try:
+		with open(path, "rb") as f:
+			head = f.read(32)
+			if head[:3] == b"\xff\xd8\xff": return _jpeg_size(f)
+			if head[:8] == b"\x89PNG\r\n\x1a\n": return _png_size(head)
+			if head[:4] == b"RIFF" and head[8:12] == b"WEBP": return _webp_size(head)
+	except (OSError, struct.error, IndexError):
+		pass
+	return None
+
+
+# ------------ 视频：MP4 ------------
+def _boxes(f: BinaryIO, start: int, end: int):
+	"""遍历 [start, end) 内的 MP4 box，产出 (类型, 内容起点, 终点)；只读 8/16 字节头"""
+	pos = start
+	while pos + 8 <= end:
+		f.seek(pos)
+		hdr = f.read(8)
+		if len(hdr) < 8: return
+		size, typ = struct.unpack(">I4s", hdr); hl = 8
+		if size == 1:
+			size = struct.unpack(">Q", f.read(8))[0]; hl = 16
+		elif size == 0:
+			size = end - pos
+		if size < hl: return
+		yield typ, pos + hl, min(pos + size, end)
+		pos += size
+
+
+def _mp4_size(f: BinaryIO, file_size: int) -> Optional[Size]:
+	"""moov 下各 trak 的 tkhd 宽高（16.16 定点数），取面积最大的一条（音轨为 0x0）"""
+	best = None
+	for typ, start, end in _boxes(f, 0, file_size):
+		if typ != b"moov": continue
+		for ttyp, tstart, tend in _boxes(f, start, end):
+			if ttyp != b"trak": continue
+			for htyp, hstart, hend in _boxes(f, tstart, tend):
+				if htyp != b"tkhd": continue
+				f.seek(hstart)
+				data = f.read(min(hend - hstart, 96))
+				need = 96 if data[:1] == b"\x01" else 84
+				if len(data) < need: break
+				w, h = struct.unpack(">II", data[need - 8:need])
+				w, h = w >> 16, h >> 16
+				if w and h and (best is None or w * h > best[0] * best[1]): best = (w, h)
+				break
+		break
+	return best
+
+
+# ------------ 视频：Matroska / WebM ------------
+_EBML, _SEGMENT, _SEEKHEAD, _SEEK, _SEEKID, _SEEKPOS = 0x1A45DFA3, 0x18538067, 0x114D9B74, 0x4DBB, 0x53AB, 0x53AC
+_TRACKS, _TRACKENTRY, _TRACKTYPE, _VIDEO, _WIDTH, _HEIGHT, _CLUSTER = 0x1654AE6B, 0xAE, 0x83, 0xE0, 0xB0, 0xBA, 0x1F43B675
+
+
+def _ebml_id(f: BinaryIO) -> Optional[int]:
+	b = f.read(1)
+	if not b or not b[0]: return None
+	n = 8 - b[0].bit_length() + 1
+	if n > 4: return None
+	return int.from_bytes(b + f.read(n - 1), "big")
+
+
+def _ebml_size(f: BinaryIO) -> Tuple[Optional[int], bool]:
+	"""返回 (长度, 是否未知长度)"""
+	b = f.read(1)
+	if not b or not b[0]: return None, False
+	n = 8 - b[0].bit_length() + 1
+	value = b[0] & (0xFF >> n)
+	rest = f.read(n - 1)
+	for x in rest: value = (value << 8) | x
+	return value, value == (1 << (7 * n)) - 1
+
+
+def _elements(f: BinaryIO, start: int, end: int):
+	"""遍历 [start, end) 内的 EBML 元素，产出 (ID, 内容起点, 内容终点, 未知长度)"""
+	pos = start
+	while pos < end:
+		f.seek(pos)
+		eid = _ebml_id(f)
+		size, unknown = _ebml_size(f)
+		if eid is None or size is None: return
+		data = f.tell()
+		stop = end if unknown else min(data + size, end)
+		yield eid, data, stop, unknown
+		if unknown: return
+		pos = data + size
+
+
+def _uint(f: BinaryIO, start: int, end: int) -> int:
+	f.seek(start); return int.from_bytes(f.read(min(end - start, 8)), "big")
+
+
+def _mkv_tracks(f: BinaryIO, start: int, end: int) -> Optional[Size]:
+	for eid, s, e, _ in _elements(f, start, end):
+		if eid != _TRACKENTRY: continue
+		kind, size = None, None
+		for cid, cs, ce, _ in _elements(f, s, e):
+			if cid == _TRACKTYPE: kind = _uint(f, cs, ce)
+			elif cid == _VIDEO:
+				w = h = 0
+				for vid, vs, ve, _ in _elements(f, cs, ce):
+					if vid == _WIDTH: w = _uint(f, vs, ve)
+					elif vid == _HEIGHT: h = _uint(f, vs, ve)
+				if w and h: size = (w, h)
+		if kind == 1 and size: return size
+	return None
+
+
+def _mkv_size(f: BinaryIO, file_size: int) -> Optional[Size]:
+	"""Segment 下找 Tracks；Tracks 在 Cluster 之后时按 SeekHead 记录的位置跳过去"""
+	elements = _elements(f, 0, file_size)
+	first = next(elements, None)
+	if not first or first[0] != _EBML: return None
+	seg = next(elements, None)
+	if not seg or seg[0] != _SEGMENT: return None
+	_, seg_start, seg_end, _ = seg
+	tracks_at = None
+	for eid, s, e, unknown in _elements(f, seg_start, seg_end):
+		if eid == _TRACKS: return _mkv_tracks(f, s, e)
+		if eid == _SEEKHEAD:
+			for sid, ss, se, _ in _elements(f, s, e):
+				if sid != _SEEK: continue
+				target = pos = None
+				for cid, cs, ce, _ in _elements(f, ss, se):
+					if cid == _SEEKID: target = _uint(f, cs, ce)
+					elif cid == _SEEKPOS: pos = _uint(f, cs, ce)
+				if target == _TRACKS and pos is not None: tracks_at = seg_start + pos
+		if eid == _CLUSTER or unknown: break
+	if tracks_at is not None:
+		for eid, s, e, _ in _elements(f, tracks_at, seg_end):
+			return _mkv_tracks(f, s, e) if eid == _TRACKS else None
+	return None
+
+
+def video_size(path: Path) -> Optional[Size]:
+	"""MP4/MOV（ftyp 等 box 开头）或 MKV/WebM（EBML 开头）的视频分辨率；只读头部，不调用 ffprobe"""
+	try:
+		with open(path, "rb") as f:
+			file_size = os.fstat(f.fileno()).st_size
+			head = f.read(12)
+			if head[:4] == b"\x1a\x45\xdf\xa3": return _mkv_size(f, file_size)
+			if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"): return _mp4_size(f, file_size)
+	except (OSError, struct.error, IndexError):
+		pass
+	return None
+
+
+def is_uhd(size: Optional[Size]) -> Optional[bool]:
+	"""长边达到 UHD_MIN_LONG_EDGE（默认 3800，覆盖 3840/4096 及裁切版本）视为 4K；尺寸未知返回 None"""
+	if not size: return None
+	return max(size) >= SETTINGS.get("UHD_MIN_LONG_EDGE", 3800)
+
+
+def _dumps(size: Size) -> str:
+	return f"{size[0]}x{size[1]}"
+
+
+def _loads(s: str) -> Size:
+	w, h = s.split("x"); return int(w), int(h)
+
+
+def image_sizes(paths: Iterable[Path], cache=None, workers: Optional[int] = None) -> Dict[Path, Optional[Size]]:
+	"""批量探测图片尺寸；结果按 (路径, 大小, mtime) 缓存在 HashCache 中"""
+	return cached_batch(paths, "image_size", image_size, cache, workers or SETTINGS.get("PROBE_WORKERS", 16), _dumps, _loads)
+
+
+def video_sizes(paths: Iterable[Path], cache=None, workers: Optional[int] = None) -> Dict[Path, Optional[Size]]:
+	"""批量探测视频分辨率；结果按 (路径, 大小, mtime) 缓存在 HashCache 中"""
+	return cached_batch(paths, "video_size", video_size, cache, workers or SETTINGS.get("PROBE_WORKERS", 16), _dumps, _loads)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行目录列举：线程池同时列多个目录，掩盖网盘挂载（CloudDrive 等）每次往返的延迟
+"""
+
+import os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from config import SETTINGS
+
+
+class FileRecord(NamedTuple):
+	path: Path
+	size: int
+	mtime: float
+
+
+class ListStats:
+	"""每次列目录（scandir + 条目 stat）的耗时统计"""
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.latencies: List[float] = []
+		self.entries = 0
+		self.errors = 0
+
+	def add(self, seconds: float, entries: int, error: bool = False):
+		with self.lock:
+			self.latencies.append(seconds); self.entries += entries; self.errors += error
+
+	def summary(self) -> Dict[str, float]:
+		with self.lock: lat = sorted(self.latencies)
+		n = len(lat)
+		return {"calls": n, "entries": self.entries, "errors": self.errors,
+			"total_s": round(sum(lat), 3),
+			"mean_ms": round(sum(lat) * 1000 / n, 2) if n else 0.0,
+			"p95_ms": round(lat[min(n - 1, int(n * 0.95))] * 1000, 2) if n else 0.0,
+			"max_ms": round(lat[-1] * 1000, 2) if n else 0.0}
+
+
+class DirLister:
+	"""scandir 只做一次：类型判断用 DirEntry 缓存的结果，每个文件只 stat 一次（Windows 下 stat 也来自缓存）。
+	walk() 顺序与逐个目录串行遍历相同（目录内按名称排序，深度优先），即将走到的子目录在后台提前列举，
+	同时在途的列举结果不超过 prefetch 个（默认 2×workers），调用方消费慢时内存不随目录数增长"""
+
+	def __init__(self, workers: Optional[int] = None, prefetch: Optional[int] = None):
+		self.workers = max(1, workers or SETTINGS.get("SCAN_WORKERS", 16))
+		self.prefetch = max(1, prefetch or 2 * self.workers)
+		self.stats = ListStats()
+
+	def list_dir(self, d: str) -> Tuple[List[Tuple[str, os.stat_result]], List[str]]:
+		"""返回 ([(文件路径, stat)], [子目录路径])，均按名称排序；目录本身无法列出时抛 OSError"""
+		t0 = time.perf_counter()
+		files, subdirs, n = [], [], 0
+		try:
+			with os.scandir(d) as it:
+				for e in sorted(it, key=lambda e: e.name):
+					n += 1
+					try:
+						if e.is_dir(follow_symlinks=False): subdirs.append(e.path)
+						elif e.is_file(): files.append((e.path, e.stat()))
+					except OSError:
+						continue
+		except OSError:
+			self.stats.add(time.perf_counter() - t0, n, True); raise
+		self.stats.add(time.perf_counter() - t0, n)
+		return files, subdirs
+
+	def _list_safe(self, d: str, dirs: Optional[Dict[str, int]] = None):
+		try:
+			# 先取 mtime 再列举：列举期间发生的改动会让记下的 mtime 过期，而不是被漏掉
+			if dirs is not None: dirs[d] = os.stat(d).st_mtime_ns
+			return self.list_dir(d)
+		except OSError: return [], []
+
+	def walk(self, root: Path, exts: Optional[Iterable[str]] = None, dirs: Optional[Dict[str, int]] = None) -> Iterator[FileRecord]:
+		"""递归列出 root 下的文件，可按扩展名（小写含点）过滤；给出 dirs 时顺带记下每个目录列举前的 mtime_ns"""
+		exts = tuple(x.lower() for x in exts) if exts else None
+		pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dir-lister")
+		try:
+			# 栈元素为 [目录, Future 或 None]；只给栈顶（即将访问）的若干目录提交列举
+			stack, inflight = [[str(root), None]], 0
+			while stack:
+				d, fut = stack.pop()
+				if fut is None: files, subdirs = self._list_safe(d, dirs)
+				else: files, subdirs = fut.result(); inflight -= 1
+				stack.extend([s, None] for s in reversed(subdirs))
+				# 先补足预取窗口，再产出本目录文件，调用方处理时后台继续列举
+				i = len(stack) - 1
+				while inflight < self.prefetch and i >= 0:
+					if stack[i][1] is None:
+						stack[i][1] = pool.submit(self._list_safe, stack[i][0], dirs); inflight += 1
+					i -= 1
+				for p, st in files:
+					if exts is None or os.path.splitext(p)[1].lower() in exts:
+						yield FileRecord(Path(p), st.st_size, st.st_mtime)
+		finally:
+			pool.shutdown(wait=False, cancel_futures=True)
+
+
+def walk_files(root: Path, exts: Optional[Iterable[str]] = None, workers: Optional[int] = None) -> Iterator[FileRecord]:
+	return DirLister(workers).walk(root, exts)
+
+
+if __name__ == "__main__":
+	# 简易对比：python scanner.py <目录> [线程数]
+	import sys
+	root = sys.argv[1] if len(sys.argv) > 1 else "."
+	t0 = time.perf_counter(); n1 = sum(1 for p in Path(root).rglob("*") if p.is_file() and p.stat())
+	t1 = time.perf_counter()
+	lister = DirLister(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+	n2 = sum(1 for _ in lister.walk(Path(root)))
+	t2 = time.perf_counter()
+	print(f"rglob+stat: {n1} 个文件 {t1 - t0:.3f}s")
+	print(f"DirLister : {n2} 个文件 {t2 - t1:.3f}s  {lister.stats.summary()}")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具任务后台运行器
+"""
+
+import os
+import threading
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+
+class ToolkitTask(QThread):
+    """在后台线程执行一个 MediaToolkit 方法，回调通过信号转回界面线程"""
+    external = False
+    notify = pyqtSignal(str)
+    progress = pyqtSignal(int)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, name, toolkit, method, args=(), kwargs=None, paths=(), bus=None):
+        super().__init__()
+        self.name = name
+        self.paths = [_norm(p) for p in paths if str(p)]
+        self.cancel_event = threading.Event()
+        # 有事件总线时直接写入总线缓冲，不再逐条发 Qt 信号
+        self.post_notify = bus.post_log if bus else self.notify.emit
+        self.post_progress = bus.post_progress if bus else self.progress.emit
+        self.toolkit = toolkit.fork(self.post_notify, self.post_progress, self.cancel_event)
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs or {}
+
+    def run(self):
+        """运行工具方法"""
+        try:
+            self.result.emit(getattr(self.toolkit, self.method)(*self.args, **self.kwargs))
+        except Exception as e:
+            self.error.emit(f"{self.name} 出错: {str(e)}")
+
+    def cancel(self):
+        """请求取消（工具方法在循环中检查）"""
+        self.cancel_event.set()
+
+    def overlaps(self, paths):
+        """是否与给定路径互相包含"""
+        for a in self.paths:
+            for b in paths:
+                if a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep):
+                    return True
+        return False
+
+
+class WorkerTask:
+    """由界面自行创建的 QThread（如媒体整理线程）登记为任务，参与路径冲突检查与统一取消"""
+    external = True
+
+    def __init__(self, name, thread, paths=(), stop=None, bus=None):
+        self.name = name
+        self.thread = thread
+        self.paths = [_norm(p) for p in paths if str(p)]
+        self.cancel_event = threading.Event()
+        self.stop = stop
+        self.post_notify = bus.post_log if bus else (lambda msg: None)
+
+    overlaps = ToolkitTask.overlaps
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.stop: self.stop()
+
+    def wait(self):
+        self.thread.wait()
+
+
+class TaskRunner(QObject):
+    """管理并行的工具任务；路径互相包含的任务不允许同时运行"""
+    task_started = pyqtSignal(str)
+    task_finished = pyqtSignal(str)
+
+    def __init__(self, toolkit, bus=None, parent=None):
+        super().__init__(parent)
+        self.toolkit = toolkit
+        self.bus = bus
+        self.tasks = []
+
+    def conflict(self, paths):
+        """返回与 paths 重叠的运行中任务名，没有则 None"""
+        paths = [_norm(p) for p in paths if str(p)]
+        for t in self.tasks:
+            if t.overlaps(paths):
+                return t.name
+        return None
+
+    def submit(self, name, method, *args, paths=(), notify=None, progress=None, on_result=None, on_error=None, **kwargs):
+        """启动任务；与运行中任务冲突时返回 None"""
+        if self.conflict(paths):
+            return None
+        task = ToolkitTask(name, self.toolkit, method, args, kwargs, paths, self.bus)
+        if notify: task.notify.connect(notify)
+        if progress: task.progress.connect(progress)
+        if on_result: task.result.connect(on_result)
+        if on_error: task.error.connect(on_error)
+        task.finished.connect(lambda t=task: self._finished(t))
+        self.tasks.append(task)
+        task.start()
+        self.task_started.emit(name)
+        return task
+
+    def adopt(self, name, thread, paths=(), stop=None, done_signals=None):
+        """登记一个已创建的线程（由调用方启动）；done_signals 中任一信号触发即视为结束，
+        默认 thread.finished。与运行中任务冲突时返回 None"""
+        if self.conflict(paths):
+            return None
+        task = WorkerTask(name, thread, paths, stop, self.bus)
+        for sig in (done_signals or (thread.finished,)):
+            sig.connect(lambda *_, t=task: self._finished(t))
+        self.tasks.append(task)
+        self.task_started.emit(name)
+        return task
+
+    def cancel_all(self, include_external=True):
+        """取消运行中的任务；include_external=False 时只取消工具任务"""
+        for t in self.tasks:
+            if include_external or not t.external:
+                t.cancel()
+
+    def wait_all(self):
+        for t in list(self.tasks):
+            t.wait()
+
+    def _finished(self, task):
+        if task not in self.tasks:
+            return
+        self.tasks.remove(task)
+        if task.cancel_event.is_set():
+            task.post_notify(f"⏹️ {task.name} 已取消")
+        if self.bus:
+            s = self.bus.stats(reset=True)
+            if any(s.values()):
+                # 多个任务并行时计数为它们共同产生，只作界面负载参考
+                task.post_notify(f"   界面刷新：合并进度 {s['dropped_progress']} 次、状态 {s['dropped_status']} 次"
+                                 + (f"，日志积压丢弃 {s['dropped_lines']} 行" if s["dropped_lines"] else ""))
+            self.bus.drain()
+        self.task_finished.emit(task.name)
+        if not task.external:
+            task.deleteLater()
+
+
+def _norm(p):
+    return os.path.normcase(os.path.abspath(str(p))).rstrip(os.sep)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+移动/复制引擎：同一设备直接 rename；跨设备用内核复制（copy_file_range/sendfile）或大缓冲区复制，
+带字节进度，先写临时文件再改名，中途失败不会留下半个目标文件；
+以及放置策略：复制 / 硬链接 / reflink / 符号链接，不支持时自动退回复制；
+批量复制用的并行执行器
+"""
+
+import errno, os, shutil, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from config import SETTINGS
+
+Progress = Callable[[int, int], None]  # (已复制字节, 总字节)
+
+PLACE_STRATEGIES = ("copy", "hardlink", "reflink", "symlink")
+_FICLONE = 0x40049409  # Linux ioctl：Btrfs/XFS 等写时复制克隆
+
+# 这些错误出现在第一次调用时，说明该内核复制方式不可用，换下一种
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.EPERM,
+	getattr(errno, "EOPNOTSUPP", errno.EINVAL), getattr(errno, "ENOTSUP", errno.EINVAL)}
+
+
+def _device(path: Path) -> int:
+	"""path 所在设备（path 可尚不存在，取最近的已存在上级）；无法判断时返回 -1"""
+	d = Path(path)
+	while not d.exists() and d.parent != d: d = d.parent
+	try: return os.stat(d).st_dev
+	except OSError: return -1
+
+
+def same_device(src: Path, dst: Path) -> bool:
+	"""src 与 dst 所在目录（dst 可尚不存在）是否在同一设备"""
+	try: return os.stat(src).st_dev == _device(dst)
+	except OSError: return False
+
+
+def _reflink(src: Path, dst: Path):
+	if not sys.platform.startswith("linux"): raise OSError(errno.EOPNOTSUPP, "当前系统不支持 reflink")
+	import fcntl
+	with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+		fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+	shutil.copystat(src, dst)
+
+
+class TransferEngine:
+	def __init__(self, buffer_size: Optional[int] = None, progress: Optional[Progress] = None, strategy: Optional[str] = None):
+		self.buffer_size = buffer_size or SETTINGS.get("TRANSFER_BUFFER_SIZE", 8 * 1024 * 1024)
+		self.progress = progress
+		self.strategy = strategy or SETTINGS.get("PLACE_STRATEGY", "copy")
+		self.lock = threading.Lock()
+		self.stats = {"renamed": 0, "copied": 0, "linked": 0, "bytes": 0, "avoided_bytes": 0}
+
+	def _count(self, key: str, nbytes: int = 0):
+		with self.lock:
+			self.stats[key] += 1; self.stats["bytes"] += nbytes
+
+	# ------------ 移动 ------------
+	def move(self, src: Path, dst: Path, overwrite: bool = False, progress: Optional[Progress] = None) -> str:
+		"""把 src（文件或目录）移动为 dst（完整目标路径），返回 'rename' 或 'copy'。
+		dst 已存在时：overwrite 且两者都是文件则覆盖，否则抛 FileExistsError"""
+		src, dst = Path(src), Path(dst)
+		if os.path.lexists(dst) and not (overwrite and src.is_file() and dst.is_file()):
+			raise FileExistsError(errno.EEXIST, "目标已存在", str(dst))
+		if same_device(src, dst.parent):
+			try:
+				os.replace(src, dst); self._count("renamed")
+				return "rename"
+			except OSError as e:
+				if e.errno != errno.EXDEV: raise
+		cb = progress or self.progress
+		if src.is_dir():
+			self._copy_tree(src, dst, cb)
+			shutil.rmtree(src)
+		else:
+			self.copy_file(src, dst, cb)
+			os.unlink(src)
+		return "copy"
+
+	# ------------ 放置（复制或链接） ------------
+	def place(self, src: Path, dst: Path, strategy: Optional[str] = None) -> str:
+		"""让 dst 拥有 src 的内容（已存在则替换），返回实际采用的方式。
+		链接方式失败（跨设备、文件系统或权限不支持）时退回复制"""
+		src, dst = Path(src), Path(dst)
+		strategy = strategy or self.strategy
+		if strategy != "copy":
+			try:
+				if os.path.lexists(dst) and os.path.samefile(src, dst):
+					self._link_done(src); return strategy
+				tmp = dst.with_name(dst.name + ".linking")
+				if os.path.lexists(tmp): os.unlink(tmp)
+				try:
+					if strategy == "hardlink": os.link(src, tmp)
+					elif strategy == "reflink": _reflink(src, tmp)
+					elif strategy == "symlink": os.symlink(os.path.abspath(src), tmp)
+					else: raise ValueError(f"未知的放置策略: {strategy}")
+					os.replace(tmp, dst)
+				except BaseException:
+					if os.path.lexists(tmp): os.unlink(tmp)
+					raise
+				self._link_done(src)
+				return strategy
+			except (OSError, NotImplementedError):
+				pass
+		self.copy_file(src, dst)
+		return "copy"
+
+	def _link_done(self, src: Path):
+		size = os.path.getsize(src)
+		with self.lock:
+			self.stats["linked"] += 1; self.stats["avoided_bytes"] += size
+
+	# ------------ 复制 ------------
+	def copy_file(self, src: Path, dst: Path, progress: Optional[Progress] = None) -> int:
+		"""复制单个文件（含 mtime 等元数据），先写 <dst>.moving 再原子改名；返回字节数"""
+		src, dst = Path(src), Path(dst)
+		tmp = dst.with_name(dst.name + ".moving")
+		cb = progress or self.progress
+		try:
+			with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+				total = os.fstat(fsrc.fileno()).st_size
+				done = self._copy_fd(fsrc, fdst, total, cb)
+			shutil.copystat(src, tmp)
+			os.replace(tmp, dst)
+		except BaseException:
+			try: os.unlink(tmp)
+			except OSError: pass
+			raise
+		self._count("copied", done)
+		return done
+
+	def _copy_tree(self, src: Path, dst: Path, progress: Optional[Progress]):
+		"""跨设备移动目录：完整复制到 <dst>.moving 后再改名为 dst。
+		符号链接（含指向目录的）按原样重建为链接，不跟随；无法重建时抛错，源目录保持不动"""
+		files, links = [], []
+		for d, ds, fs in os.walk(src):
+			links.extend(Path(d) / n for n in ds + fs if os.path.islink(os.path.join(d, n)))
+			files.extend((Path(d), f) for f in fs if not os.path.islink(os.path.join(d, f)))
+		total = sum(os.path.getsize(d / f) for d, f in files)
+		tmp = dst.with_name(dst.name + ".moving")
+		base = [0]
+		def cb(done, _):
+			if progress: progress(base[0] + done, total)
+		try:
+			for d, _, _ in os.walk(src):
+				os.makedirs(tmp / Path(d).relative_to(src), exist_ok=True)
+			for d, f in files:
+				base[0] += self.copy_file(d / f, tmp / d.relative_to(src) / f, cb)
+			for link in links:
+				os.symlink(os.readlink(link), tmp / link.relative_to(src), target_is_directory=link.is_dir())
+			for d, _, _ in os.walk(src, topdown=False):
+				shutil.copystat(d, tmp / Path(d).relative_to(src))
+			os.rename(tmp, dst)
+		except BaseException:
+			shutil.rmtree(tmp, ignore_errors=True)
+			raise
+
+	def _copy_fd(self, fsrc, fdst, total: int, progress: Optional[Progress]) -> int:
+		"""依次尝试 copy_file_range、sendfile（Linux），都不可用时用大缓冲区 readinto"""
+		ins, outs = fsrc.fileno(), fdst.fileno()
+		kernel = []
+		if hasattr(os, "copy_file_range"): kernel.append(lambda n: os.copy_file_range(ins, outs, n))
+		if sys.platform.startswith("linux") and hasattr(os, "sendfile"): kernel.append(lambda n: os.sendfile(outs, ins, None, n))
+		for fn in kernel:
+			done = 0
+			try:
+				while True:
+					n = fn(self.buffer_size)
+					if n == 0: break
+					done += n
+					if progress: progress(done, total)
+				return done
+			except OSError as e:
+				if done or e.errno not in _UNSUPPORTED: raise
+		done, buf = 0, bytearray(self.buffer_size)
+		view = memoryview(buf)
+		while True:
+			n = fsrc.readinto(buf)
+			if not n: break
+			fdst.write(view[:n]); done += n
+			if progress: progress(done, total)
+		return done
+
+
+class BatchReport:
+	"""CopyExecutor.run 的结果：按任务下标记录状态（ok / fail / cancel）、返回值和异常"""
+	def __init__(self, n: int):
+		self.status: List[str] = ["cancel"] * n
+		self.results: List[Any] = [None] * n
+		self.failures: Dict[int, BaseException] = {}
+
+	def count(self, status: str) -> int:
+		return self.status.count(status)
+
+	@property
+	def errors(self) -> List[Tuple[int, BaseException]]:
+		return sorted(self.failures.items(), key=lambda x: x[0])
+
+
+class CopyExecutor:
+	"""并行执行一批 (src, dst) 文件操作：线程池 + 在途字节上限 + 每个目标卷的并发上限，单项失败不影响其余。
+	目标路径相同的任务按提交顺序串行执行，结果与逐个执行一致"""
+
+	def __init__(self, workers: Optional[int] = None, max_inflight_bytes: Optional[int] = None, per_volume: Optional[int] = None):
+		self.workers = max(1, workers or SETTINGS.get("COPY_WORKERS", 8))
+		self.max_inflight = max(1, max_inflight_bytes or SETTINGS.get("COPY_MAX_INFLIGHT_BYTES", 256 * 1024 * 1024))
+		self.per_volume = max(1, per_volume or SETTINGS.get("COPY_PER_VOLUME_LIMIT", 4))
+		self.cond = threading.Condition()
+		self.inflight = 0
+		self.volumes: Dict[int, threading.BoundedSemaphore] = {}
+
+	def _reserve(self, n: int):
+		# 单个超过上限的文件在没有其他在途任务时也放行
+		with self.cond:
+			while self.inflight and self.inflight + n > self.max_inflight: self.cond.wait()
+			self.inflight += n
+
+	def _release(self, n: int):
+		with self.cond:
+			self.inflight -= n; self.cond.notify_all()
+
+	def _volume_slot(self, dst: Path) -> threading.BoundedSemaphore:
+		dev = _device(Path(dst).parent)
+		with self.cond:
+			if dev not in self.volumes: self.volumes[dev] = threading.BoundedSemaphore(self.per_volume)
+			return self.volumes[dev]
+
+	def run(self, jobs: Iterable[Tuple[Path, Path]], op: Callable[[Path, Path], Any],
+			progress: Callable[[int, int], None] = lambda done, total: None,
+			cancelled: Callable[[], bool] = lambda: False) -> BatchReport:
+		"""对每个 (src, dst) 调用 op(src, dst)；progress 在工作线程中按完成项数回调"""
+		jobs = list(jobs)
+		report = BatchReport(len(jobs))
+		groups: Dict[str, List[int]] = {}
+		for i, (_, dst) in enumerate(jobs):
+			groups.setdefault(os.path.normcase(os.path.abspath(str(dst))), []).append(i)
+		finished, lock = [0], threading.Lock()
+
+		def task(indexes: List[int], nbytes: int):
+			try:
+				for i in indexes:
+					if cancelled(): continue
+					src, dst = jobs[i]
+					try:
+						with self._volume_slot(dst):
+							report.results[i] = op(src, dst)
+						report.status[i] = "ok"
+					except Exception as e:
+						report.status[i] = "fail"; report.failures[i] = e
+					with lock:
+						finished[0] += 1; done = finished[0]
+					progress(done, len(jobs))
+			finally:
+				self._release(nbytes)
+
+		with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="copy") as pool:
+			for indexes in groups.values():
+				if cancelled(): break
+				nbytes = 0
+				for i in indexes:
+					try: nbytes += os.path.getsize(jobs[i][0])
+					except OSError: pass
+				nbytes = min(nbytes, self.max_inflight)
+				self._reserve(nbytes)
+				pool.submit(task, indexes, nbytes)
+		return report
+
+
+if __name__ == "__main__":
+	# 吞吐对比：python transfer.py [目标目录] [文件数] [单个大小KB]
+	import tempfile
+	target = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(tempfile.mkdtemp())
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+	size = (int(sys.argv[3]) if len(sys.argv) > 3 else 512) * 1024
+	src_dir = Path(tempfile.mkdtemp())
+	srcs = []
+	for i in range(count):
+		p = src_dir / f"poster_{i:05d}.jpg"; p.write_bytes(os.urandom(size)); srcs.append(p)
+	total_mb = count * size / 1048576
+	for label, run in (
+		("串行 shutil.copy2", lambda d: [shutil.copy2(str(s), str(d / s.name)) for s in srcs]),
+		("CopyExecutor", lambda d: CopyExecutor().run([(s, d / s.name) for s in srcs], TransferEngine().copy_file)),
+	):
+		out = target / label.split()[0]
+		out.mkdir(parents=True, exist_ok=True)
+		t0 = time.perf_counter(); run(out); dt = time.perf_counter() - t0
+		print(f"{label:<20} {count} 个 / {total_mb:.0f} MB  {dt:.2f}s  {total_mb / dt:.1f} MB/s")
+		shutil.rmtree(out, ignore_errors=True)
+	shutil.rmtree(src_dir, ignore_errors=True)
@@ -2,14 +2,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os
+import os, csv
 from PyQt5.QtWidgets import QScrollArea, QSizePolicy
 from pathlib import Path
 from PyQt5.QtWidgets import (
 	QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
 	QLabel, QPushButton, QLineEdit, QTextEdit, QFileDialog, QProgressBar,
 	QTabWidget, QListWidget, QListWidgetItem, QMessageBox, QGroupBox,
-	QCheckBox, QComboBox
+	QCheckBox, QComboBox, QTreeWidget, QTreeWidgetItem
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
@@ -18,6 +18,9 @@ from organizer import MediaOrganizerWorker
 from ui.styles import ModernStyles
 from config import SETTINGS
 from media_organizer import MediaToolkit
+from task_runner import TaskRunner
+from event_bus import UiEventBus
+from scanner import DirLister
 
 
 class ModernMediaOrganizer(QMainWindow):
@@ -27,10 +30,13 @@ class ModernMediaOrganizer(QMainWindow):
 		self.worker = None
 		self.init_ui()
 		self.apply_modern_style()
-		self.tools = MediaToolkit(
-			notify=lambda s: self.log_text.append(s),
-			progress=self.progress_bar.setValue
-		)
+		self.bus = UiEventBus(fps=SETTINGS.get("UI_FPS", 30), parent=self)
+		self.bus.progress_changed.connect(self.progress_bar.setValue)
+		self.bus.log_chunk.connect(self.log_text.append)
+		self.bus.status_changed.connect(self.statusBar().showMessage)
+		self.tools = MediaToolkit()
+		self.tasks = TaskRunner(self.tools, self.bus, self)
+		self.tasks.task_finished.connect(self.tool_task_finished)
 
 	def init_ui(self):
 		s = self.scale
@@ -53,6 +59,7 @@ class ModernMediaOrganizer(QMainWindow):
 		self.preview_tab = self.create_preview_tab(); self.tab_widget.addTab(self.preview_tab, "👁️ 文件预览")
 		self.settings_tab = self.create_settings_tab(); self.tab_widget.addTab(self.settings_tab, "⚙️ 设置")
 		self.tools_tab = self.create_tools_tab(); self.tab_widget.addTab(self.tools_tab, "🧰 工具套件")
+		self.dupes_tab = self.create_dupes_tab(); self.tab_widget.addTab(self.dupes_tab, "🔍 重复文件")
 		main_layout.addWidget(self.tab_widget)
 
 		self.status_bar = self.statusBar(); self.status_bar.showMessage("就绪")
@@ -123,181 +130,216 @@ class ModernMediaOrganizer(QMainWindow):
 		return tab
 
 	def create_tools_tab(self):
-	s = self.scale
-
-	# 用滚动区承载内容，防止内容太多被压乱
-	scroll = QScrollArea()
-	scroll.setWidgetResizable(True)
-
-	container = QWidget()
-	layout = QVBoxLayout(container)
-	layout.setSpacing(int(12*s))
-	layout.setContentsMargins(int(12*s), int(12*s), int(12*s), int(12*s))
-
-	# 通用 SizePolicy：输入框可扩展，按钮固定
-	def conf_lineedit(le: QLineEdit):
-		le.setStyleSheet(ModernStyles.get_input_style(s))
-		le.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
-	def conf_button(btn: QPushButton, primary=False):
-		btn.setStyleSheet(ModernStyles.get_primary_button_style(s) if primary else ModernStyles.get_button_style(s))
-		btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-
-	# Topaz Poster 增强
-	gb_topaz = QGroupBox("Topaz Poster 增强")
-	gb_topaz.setStyleSheet(ModernStyles.get_group_style(s))
-	l1 = QGridLayout(gb_topaz)
-
-	self.topaz_src = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.topaz_src)
-	self.topaz_work = QLineEdit(SETTINGS["IMAGE_SOURCE_DIR"]); conf_lineedit(self.topaz_work)
-	btn_export = QPushButton("步骤1 导出并(可)启动Topaz"); conf_button(btn_export, primary=True); btn_export.clicked.connect(self.action_export_posters)
-	btn_import = QPushButton("步骤2 导回增强Poster"); conf_button(btn_import); btn_import.clicked.connect(self.action_import_posters)
-
-	r = 0
-	l1.addWidget(QLabel("模板根:"), r, 0); l1.addWidget(self.topaz_src, r, 1)
-	l1.addWidget(QLabel("工作目录:"), r, 2); l1.addWidget(self.topaz_work, r, 3)
-	l1.addWidget(btn_export, r, 4); l1.addWidget(btn_import, r, 5)
-	# 列伸展：输入框列扩展，按钮列不扩展
-	for c in (1, 3):
-		l1.setColumnStretch(c, 2)
-	for c in (0, 2, 4, 5):
-		l1.setColumnStretch(c, 0)
-
-	layout.addWidget(gb_topaz)
-
-	# ED2K 提取（自动解压）
-	gb_ed2k = QGroupBox("ED2K 提取（自动解压）")
-	gb_ed2k.setStyleSheet(ModernStyles.get_group_style(s))
-	l2 = QGridLayout(gb_ed2k)
-
-	self.ed2k_base = QLineEdit(SETTINGS["ED2K_SOURCE_DIR"]); conf_lineedit(self.ed2k_base)
-	self.ed2k_out  = QLineEdit(SETTINGS["ED2K_OUTPUT_DIR"]); conf_lineedit(self.ed2k_out)
-	self.ed2k_delete = QCheckBox("提取后删除TXT"); self.ed2k_delete.setChecked(True)
-	btn_ed2k = QPushButton("开始提取"); conf_button(btn_ed2k, primary=True); btn_ed2k.clicked.connect(self.action_extract_ed2k)
-
-	r = 0
-	l2.addWidget(QLabel("来源:"), r, 0); l2.addWidget(self.ed2k_base, r, 1, 1, 2)
-	l2.addWidget(QLabel("输出到:"), r, 3); l2.addWidget(self.ed2k_out, r, 4, 1, 2)
-	l2.addWidget(self.ed2k_delete, r, 6); l2.addWidget(btn_ed2k, r, 7)
-	l2.setColumnStretch(1, 2); l2.setColumnStretch(4, 2)
-	for c in (0, 3, 6, 7):
-		l2.setColumnStretch(c, 0)
-
-	layout.addWidget(gb_ed2k)
-
-	# 封面替换（按大小）
-	gb_cover = QGroupBox("封面替换（按大小）")
-	gb_cover.setStyleSheet(ModernStyles.get_group_style(s))
-	l3 = QGridLayout(gb_cover)
-
-	self.cover_repo   = QLineEdit(SETTINGS["COVER_SOURCE_DIR"]); conf_lineedit(self.cover_repo)
-	self.cover_target = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.cover_target)
-	btn_cover = QPushButton("开始替换"); conf_button(btn_cover, primary=True); btn_cover.clicked.connect(self.action_replace_covers)
-
-	r = 0
-	l3.addWidget(QLabel("封面库:"), r, 0); l3.addWidget(self.cover_repo, r, 1, 1, 3)
-	l3.addWidget(QLabel("目标根:"), r, 4); l3.addWidget(self.cover_target, r, 5, 1, 3)
-	l3.addWidget(btn_cover, r, 8)
-	l3.setColumnStretch(1, 2); l3.setColumnStretch(5, 2)
-	for c in (0, 4, 8):
-		l3.setColumnStretch(c, 0)
-
-	layout.addWidget(gb_cover)
-
-	# 字幕 / 书库 / Coser
-	gb_more1 = QGroupBox("字幕 / 书库 / Coser")
-	gb_more1.setStyleSheet(ModernStyles.get_group_style(s))
-	l4 = QGridLayout(gb_more1)
-
-	self.sub_video_root = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.sub_video_root)
-	self.sub_root = QLineEdit(SETTINGS["SUBTITLE_MATCH_SOURCE_DIR"]); conf_lineedit(self.sub_root)
-	self.sub_prio = QLineEdit(",".join(SETTINGS.get("SUBTITLE_PRIORITY_DIRS", []))); conf_lineedit(self.sub_prio)
-	btn_sub = QPushButton("字幕匹配复制"); conf_button(btn_sub, primary=True); btn_sub.clicked.connect(self.action_match_subs)
-
-	self.srt_root = QLineEdit(SETTINGS["SRT_RENAME_DIR"]); conf_lineedit(self.srt_root)
-	btn_srt = QPushButton("DMM字幕重命名"); conf_button(btn_srt); btn_srt.clicked.connect(self.action_rename_srt)
-
-	self.book_src = QLineEdit(SETTINGS["BOOK_SOURCE_DIR"]); conf_lineedit(self.book_src)
-	self.book_dst = QLineEdit(next(iter(SETTINGS["BOOK_PRESET_TARGETS"].values()))); conf_lineedit(self.book_dst)
-	btn_book = QPushButton("书库整理"); conf_button(btn_book); btn_book.clicked.connect(self.action_books)
-
-	self.coser_root = QLineEdit(SETTINGS["COSER_SOURCE_DIR"]); conf_lineedit(self.coser_root)
-	btn_coser2 = QPushButton("Coser二级整理"); conf_button(btn_coser2); btn_coser2.clicked.connect(self.action_coser2)
-	btn_coserA = QPushButton("Coser首字母"); conf_button(btn_coserA); btn_coserA.clicked.connect(self.action_coserA)
-
-	r = 0
-	l4.addWidget(QLabel("视频根:"), r,0); l4.addWidget(self.sub_video_root, r,1)
-	l4.addWidget(QLabel("字幕根:"), r,2); l4.addWidget(self.sub_root, r,3)
-	l4.addWidget(btn_sub, r,4); r+=1
-
-	l4.addWidget(QLabel("字幕优先(逗号分隔):"), r,0); l4.addWidget(self.sub_prio, r,1,1,3); r+=1
-	l4.addWidget(QLabel("SRT根:"), r,0); l4.addWidget(self.srt_root, r,1); l4.addWidget(btn_srt, r,2); r+=1
-
-	l4.addWidget(QLabel("书源:"), r,0); l4.addWidget(self.book_src, r,1)
-	l4.addWidget(QLabel("目标:"), r,2); l4.addWidget(self.book_dst, r,3)
-	l4.addWidget(btn_book, r,4); r+=1
-
-	l4.addWidget(QLabel("Coser根:"), r,0); l4.addWidget(self.coser_root, r,1)
-	l4.addWidget(btn_coser2, r,2); l4.addWidget(btn_coserA, r,3)
-
-	for c in (1, 3):
-		l4.setColumnStretch(c, 2)
-	for c in (0, 2, 4):
-		l4.setColumnStretch(c, 0)
-
-	layout.addWidget(gb_more1)
-
-	# 视频 / 重命名 / NFO / Poster / 下载
-	gb_more2 = QGroupBox("视频 / 重命名 / NFO / Poster / 下载")
-	gb_more2.setStyleSheet(ModernStyles.get_group_style(s))
-	l5 = QGridLayout(gb_more2)
-
-	self.vid_rename_dir = QLineEdit(SETTINGS["VIDEO_RENAME_DIR"]); conf_lineedit(self.vid_rename_dir)
-	btn_vid_rename = QPushButton("视频批量重命名(-4K)"); conf_button(btn_vid_rename); btn_vid_rename.clicked.connect(self.action_video_rename)
-
-	self.folder_mark_dir = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.folder_mark_dir)
-	btn_markC  = QPushButton("文件夹标记 -C"); conf_button(btn_markC); btn_markC.clicked.connect(self.action_folder_mark_C)
-	btn_mark4K = QPushButton("文件夹标记 -4K(含内部)"); conf_button(btn_mark4K); btn_mark4K.clicked.connect(self.action_folder_mark_4k)
+		s = self.scale
 
-	self.nfo_src = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.nfo_src)
-	self.nfo_dst = QLineEdit(SETTINGS["DEST_NFO_SORTED"]); conf_lineedit(self.nfo_dst)
-	btn_nfo = QPushButton("NFO厂商整理"); conf_button(btn_nfo); btn_nfo.clicked.connect(self.action_nfo)
+		# 用滚动区承载内容，防止内容太多被压乱
+		scroll = QScrollArea()
+		scroll.setWidgetResizable(True)
+
+		container = QWidget()
+		layout = QVBoxLayout(container)
+		layout.setSpacing(int(12*s))
+		layout.setContentsMargins(int(12*s), int(12*s), int(12*s), int(12*s))
+
+		# 通用 SizePolicy：输入框可扩展，按钮固定
+		def conf_lineedit(le: QLineEdit):
+			le.setStyleSheet(ModernStyles.get_input_style(s))
+			le.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+		def conf_button(btn: QPushButton, primary=False):
+			btn.setStyleSheet(ModernStyles.get_primary_button_style(s) if primary else ModernStyles.get_button_style(s))
+			btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+
+		# Topaz Poster 增强
+		gb_topaz = QGroupBox("Topaz Poster 增强")
+		gb_topaz.setStyleSheet(ModernStyles.get_group_style(s))
+		l1 = QGridLayout(gb_topaz)
+
+		self.topaz_src = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.topaz_src)
+		self.topaz_work = QLineEdit(SETTINGS["IMAGE_SOURCE_DIR"]); conf_lineedit(self.topaz_work)
+		btn_export = QPushButton("步骤1 导出并(可)启动Topaz"); conf_button(btn_export, primary=True); btn_export.clicked.connect(self.action_export_posters)
+		btn_import = QPushButton("步骤2 导回增强Poster"); conf_button(btn_import); btn_import.clicked.connect(self.action_import_posters)
+
+		r = 0
+		l1.addWidget(QLabel("模板根:"), r, 0); l1.addWidget(self.topaz_src, r, 1)
+		l1.addWidget(QLabel("工作目录:"), r, 2); l1.addWidget(self.topaz_work, r, 3)
+		l1.addWidget(btn_export, r, 4); l1.addWidget(btn_import, r, 5)
+		# 列伸展：输入框列扩展，按钮列不扩展
+		for c in (1, 3):
+			l1.setColumnStretch(c, 2)
+		for c in (0, 2, 4, 5):
+			l1.setColumnStretch(c, 0)
+
+		layout.addWidget(gb_topaz)
+
+		# ED2K 提取（自动解压）
+		gb_ed2k = QGroupBox("ED2K 提取（自动解压）")
+		gb_ed2k.setStyleSheet(ModernStyles.get_group_style(s))
+		l2 = QGridLayout(gb_ed2k)
+
+		self.ed2k_base = QLineEdit(SETTINGS["ED2K_SOURCE_DIR"]); conf_lineedit(self.ed2k_base)
+		self.ed2k_out  = QLineEdit(SETTINGS["ED2K_OUTPUT_DIR"]); conf_lineedit(self.ed2k_out)
+		self.ed2k_delete = QCheckBox("提取后删除TXT"); self.ed2k_delete.setChecked(True)
+		btn_ed2k = QPushButton("开始提取"); conf_button(btn_ed2k, primary=True); btn_ed2k.clicked.connect(self.action_extract_ed2k)
+
+		r = 0
+		l2.addWidget(QLabel("来源:"), r, 0); l2.addWidget(self.ed2k_base, r, 1, 1, 2)
+		l2.addWidget(QLabel("输出到:"), r, 3); l2.addWidget(self.ed2k_out, r, 4, 1, 2)
+		l2.addWidget(self.ed2k_delete, r, 6); l2.addWidget(btn_ed2k, r, 7)
+		l2.setColumnStretch(1, 2); l2.setColumnStretch(4, 2)
+		for c in (0, 3, 6, 7):
+			l2.setColumnStretch(c, 0)
+
+		layout.addWidget(gb_ed2k)
+
+		# 封面替换（按大小 / 分辨率）
+		gb_cover = QGroupBox("封面替换（按大小 / 分辨率）")
+		gb_cover.setStyleSheet(ModernStyles.get_group_style(s))
+		l3 = QGridLayout(gb_cover)
+
+		self.cover_repo   = QLineEdit(SETTINGS["COVER_SOURCE_DIR"]); conf_lineedit(self.cover_repo)
+		self.cover_target = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.cover_target)
+		self.cover_mode = QComboBox(); self.cover_mode.addItems(["按大小", "按分辨率"]); self.cover_mode.setStyleSheet(ModernStyles.get_input_style(s))
+		btn_cover = QPushButton("开始替换"); conf_button(btn_cover, primary=True); btn_cover.clicked.connect(self.action_replace_covers)
+
+		r = 0
+		l3.addWidget(QLabel("封面库:"), r, 0); l3.addWidget(self.cover_repo, r, 1, 1, 3)
+		l3.addWidget(QLabel("目标根:"), r, 4); l3.addWidget(self.cover_target, r, 5, 1, 3)
+		l3.addWidget(self.cover_mode, r, 8); l3.addWidget(btn_cover, r, 9)
+		l3.setColumnStretch(1, 2); l3.setColumnStretch(5, 2)
+		for c in (0, 4, 8, 9):
+			l3.setColumnStretch(c, 0)
+
+		layout.addWidget(gb_cover)
+
+		# 字幕 / 书库 / Coser
+		gb_more1 = QGroupBox("字幕 / 书库 / Coser")
+		gb_more1.setStyleSheet(ModernStyles.get_group_style(s))
+		l4 = QGridLayout(gb_more1)
+
+		self.sub_video_root = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.sub_video_root)
+		self.sub_root = QLineEdit(SETTINGS["SUBTITLE_MATCH_SOURCE_DIR"]); conf_lineedit(self.sub_root)
+		self.sub_prio = QLineEdit(",".join(SETTINGS.get("SUBTITLE_PRIORITY_DIRS", []))); conf_lineedit(self.sub_prio)
+		btn_sub = QPushButton("字幕匹配复制"); conf_button(btn_sub, primary=True); btn_sub.clicked.connect(self.action_match_subs)
+
+		self.srt_root = QLineEdit(SETTINGS["SRT_RENAME_DIR"]); conf_lineedit(self.srt_root)
+		btn_srt = QPushButton("DMM字幕重命名"); conf_button(btn_srt); btn_srt.clicked.connect(self.action_rename_srt)
+
+		self.book_src = QLineEdit(SETTINGS["BOOK_SOURCE_DIR"]); conf_lineedit(self.book_src)
+		self.book_dst = QLineEdit(next(iter(SETTINGS["BOOK_PRESET_TARGETS"].values()))); conf_lineedit(self.book_dst)
+		btn_book = QPushButton("书库整理"); conf_button(btn_book); btn_book.clicked.connect(self.action_books)
+
+		self.coser_root = QLineEdit(SETTINGS["COSER_SOURCE_DIR"]); conf_lineedit(self.coser_root)
+		btn_coser2 = QPushButton("Coser二级整理"); conf_button(btn_coser2); btn_coser2.clicked.connect(self.action_coser2)
+		btn_coserA = QPushButton("Coser首字母"); conf_button(btn_coserA); btn_coserA.clicked.connect(self.action_coserA)
+
+		r = 0
+		l4.addWidget(QLabel("视频根:"), r,0); l4.addWidget(self.sub_video_root, r,1)
+		l4.addWidget(QLabel("字幕根:"), r,2); l4.addWidget(self.sub_root, r,3)
+		l4.addWidget(btn_sub, r,4); r+=1
+
+		l4.addWidget(QLabel("字幕优先(逗号分隔):"), r,0); l4.addWidget(self.sub_prio, r,1,1,3); r+=1
+		l4.addWidget(QLabel("SRT根:"), r,0); l4.addWidget(self.srt_root, r,1); l4.addWidget(btn_srt, r,2); r+=1
+
+		l4.addWidget(QLabel("书源:"), r,0); l4.addWidget(self.book_src, r,1)
+		l4.addWidget(QLabel("目标:"), r,2); l4.addWidget(self.book_dst, r,3)
+		l4.addWidget(btn_book, r,4); r+=1
+
+		l4.addWidget(QLabel("Coser根:"), r,0); l4.addWidget(self.coser_root, r,1)
+		l4.addWidget(btn_coser2, r,2); l4.addWidget(btn_coserA, r,3)
+
+		for c in (1, 3):
+			l4.setColumnStretch(c, 2)
+		for c in (0, 2, 4):
+			l4.setColumnStretch(c, 0)
+
+		layout.addWidget(gb_more1)
+
+		# 视频 / 重命名 / NFO / Poster / 下载
+		gb_more2 = QGroupBox("视频 / 重命名 / NFO / Poster / 下载")
+		gb_more2.setStyleSheet(ModernStyles.get_group_style(s))
+		l5 = QGridLayout(gb_more2)
+
+		self.vid_rename_dir = QLineEdit(SETTINGS["VIDEO_RENAME_DIR"]); conf_lineedit(self.vid_rename_dir)
+		btn_vid_rename = QPushButton("视频批量重命名(-4K)"); conf_button(btn_vid_rename); btn_vid_rename.clicked.connect(self.action_video_rename)
+		btn_vid_auto = QPushButton("自动识别 4K/C"); conf_button(btn_vid_auto); btn_vid_auto.clicked.connect(self.action_video_rename_auto)
+
+		self.folder_mark_dir = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.folder_mark_dir)
+		btn_markC  = QPushButton("文件夹标记 -C"); conf_button(btn_markC); btn_markC.clicked.connect(self.action_folder_mark_C)
+		btn_mark4K = QPushButton("文件夹标记 -4K(含内部)"); conf_button(btn_mark4K); btn_mark4K.clicked.connect(self.action_folder_mark_4k)
+		btn_markAuto = QPushButton("自动识别 4K/C"); conf_button(btn_markAuto); btn_markAuto.clicked.connect(self.action_folder_mark_auto)
+
+		self.nfo_src = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.nfo_src)
+		self.nfo_dst = QLineEdit(SETTINGS["DEST_NFO_SORTED"]); conf_lineedit(self.nfo_dst)
+		btn_nfo = QPushButton("NFO厂商整理"); conf_button(btn_nfo); btn_nfo.clicked.connect(self.action_nfo)
+
+		self.poster_tpl = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.poster_tpl)
+		self.poster_src = QLineEdit(SETTINGS["IMAGE_SOURCE_DIR"]); conf_lineedit(self.poster_src)
+		btn_poster_match = QPushButton("Poster匹配替换"); conf_button(btn_poster_match); btn_poster_match.clicked.connect(self.action_poster_match)
+
+		self.dl_url = QLineEdit(SETTINGS["DOWNLOAD_URL_TEMPLATE"]); conf_lineedit(self.dl_url)
+		self.dl_save = QLineEdit(SETTINGS["DOWNLOAD_SAVE_DIR"]); conf_lineedit(self.dl_save)
+		self.dl_range = QLineEdit("1-1000"); conf_lineedit(self.dl_range)
+		btn_dl = QPushButton("序列下载"); conf_button(btn_dl, primary=True); btn_dl.clicked.connect(self.action_seq_download)
 
-	self.poster_tpl = QLineEdit(SETTINGS["VIDEO_SOURCE_DIR"]); conf_lineedit(self.poster_tpl)
-	self.poster_src = QLineEdit(SETTINGS["IMAGE_SOURCE_DIR"]); conf_lineedit(self.poster_src)
-	btn_poster_match = QPushButton("Poster匹配替换"); conf_button(btn_poster_match); btn_poster_match.clicked.connect(self.action_poster_match)
+		r = 0
+		l5.addWidget(QLabel("重命名目录:"), r,0); l5.addWidget(self.vid_rename_dir, r,1,1,3); l5.addWidget(btn_vid_rename, r,4); l5.addWidget(btn_vid_auto, r,5); r+=1
+
+		l5.addWidget(QLabel("文件夹标记目录:"), r,0); l5.addWidget(self.folder_mark_dir, r,1,1,2)
+		l5.addWidget(btn_markC, r,3); l5.addWidget(btn_mark4K, r,4); l5.addWidget(btn_markAuto, r,5); r+=1
 
-	self.dl_url = QLineEdit(SETTINGS["DOWNLOAD_URL_TEMPLATE"]); conf_lineedit(self.dl_url)
-	self.dl_save = QLineEdit(SETTINGS["DOWNLOAD_SAVE_DIR"]); conf_lineedit(self.dl_save)
-	self.dl_range = QLineEdit("1-1000"); conf_lineedit(self.dl_range)
-	btn_dl = QPushButton("序列下载"); conf_button(btn_dl, primary=True); btn_dl.clicked.connect(self.action_seq_download)
+		l5.addWidget(QLabel("NFO源:"), r,0); l5.addWidget(self.nfo_src, r,1)
+		l5.addWidget(QLabel("目标:"), r,2); l5.addWidget(self.nfo_dst, r,3); l5.addWidget(btn_nfo, r,4); r+=1
 
-	r = 0
-	l5.addWidget(QLabel("重命名目录:"), r,0); l5.addWidget(self.vid_rename_dir, r,1,1,3); l5.addWidget(btn_vid_rename, r,4); r+=1
+		l5.addWidget(QLabel("Poster模板根:"), r,0); l5.addWidget(self.poster_tpl, r,1)
+		l5.addWidget(QLabel("图片源:"), r,2); l5.addWidget(self.poster_src, r,3); l5.addWidget(btn_poster_match, r,4); r+=1
 
-	l5.addWidget(QLabel("文件夹标记目录:"), r,0); l5.addWidget(self.folder_mark_dir, r,1,1,2)
-	l5.addWidget(btn_markC, r,3); l5.addWidget(btn_mark4K, r,4); r+=1
+		l5.addWidget(QLabel("URL模板:"), r,0); l5.addWidget(self.dl_url, r,1,1,2)
+		l5.addWidget(QLabel("保存至:"), r,3); l5.addWidget(self.dl_save, r,4); r+=1
 
-	l5.addWidget(QLabel("NFO源:"), r,0); l5.addWidget(self.nfo_src, r,1)
-	l5.addWidget(QLabel("目标:"), r,2); l5.addWidget(self.nfo_dst, r,3); l5.addWidget(btn_nfo, r,4); r+=1
+		l5.addWidget(QLabel("范围(起-止):"), r,0); l5.addWidget(self.dl_range, r,1); l5.addWidget(btn_dl, r,4)
 
-	l5.addWidget(QLabel("Poster模板根:"), r,0); l5.addWidget(self.poster_tpl, r,1)
-	l5.addWidget(QLabel("图片源:"), r,2); l5.addWidget(self.poster_src, r,3); l5.addWidget(btn_poster_match, r,4); r+=1
+		# 列伸展：输入列扩展
+		l5.setColumnStretch(1, 2); l5.setColumnStretch(3, 2)
+		for c in (0, 2, 4):
+			l5.setColumnStretch(c, 0)
 
-	l5.addWidget(QLabel("URL模板:"), r,0); l5.addWidget(self.dl_url, r,1,1,2)
-	l5.addWidget(QLabel("保存至:"), r,3); l5.addWidget(self.dl_save, r,4); r+=1
+		layout.addWidget(gb_more2)
 
-	l5.addWidget(QLabel("范围(起-止):"), r,0); l5.addWidget(self.dl_range, r,1); l5.addWidget(btn_dl, r,4)
+		task_layout = QHBoxLayout(); task_layout.addStretch()
+		btn_rescan = QPushButton("🔄 刷新扫描缓存"); conf_button(btn_rescan); btn_rescan.clicked.connect(self.action_invalidate_scan_cache)
+		task_layout.addWidget(btn_rescan)
+		self.tool_cancel_btn = QPushButton("⏹️ 取消工具任务"); self.tool_cancel_btn.setStyleSheet(ModernStyles.get_danger_button_style(s))
+		self.tool_cancel_btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed); self.tool_cancel_btn.setEnabled(False)
+		self.tool_cancel_btn.clicked.connect(self.cancel_tool_tasks)
+		task_layout.addWidget(self.tool_cancel_btn)
+		layout.addLayout(task_layout)
+		layout.addStretch()
 
-	# 列伸展：输入列扩展
-	l5.setColumnStretch(1, 2); l5.setColumnStretch(3, 2)
-	for c in (0, 2, 4):
-		l5.setColumnStretch(c, 0)
+		scroll.setWidget(container)
+		return scroll
 
-	layout.addWidget(gb_more2)
-	layout.addStretch()
+	def create_dupes_tab(self):
+		s = self.scale
+		tab = QWidget(); layout = QVBoxLayout(tab); layout.setSpacing(int(10*s))
 
-	scroll.setWidget(container)
-	return scroll
+		gb = QGroupBox("🔍 重复文件查找（大小 → 首尾块哈希 → 全文件哈希）"); gb.setStyleSheet(ModernStyles.get_group_style(s))
+		grid = QGridLayout(gb)
+		self.dupe_roots = QLineEdit(";".join(SETTINGS.get("DUPLICATE_SCAN_DIRS", []))); self.dupe_roots.setStyleSheet(ModernStyles.get_input_style(s))
+		self.dupe_video = QCheckBox("视频"); self.dupe_video.setChecked(True)
+		self.dupe_image = QCheckBox("图片"); self.dupe_image.setChecked(True)
+		self.dupe_min = QLineEdit("0"); self.dupe_min.setStyleSheet(ModernStyles.get_input_style(s)); self.dupe_min.setFixedWidth(int(80*s))
+		btn = QPushButton("开始查找"); btn.setStyleSheet(ModernStyles.get_primary_button_style(s)); btn.clicked.connect(self.action_find_duplicates)
+		grid.addWidget(QLabel("目录(分号分隔):"), 0, 0); grid.addWidget(self.dupe_roots, 0, 1, 1, 5)
+		grid.addWidget(self.dupe_video, 1, 1); grid.addWidget(self.dupe_image, 1, 2)
+		grid.addWidget(QLabel("最小(MB):"), 1, 3); grid.addWidget(self.dupe_min, 1, 4); grid.addWidget(btn, 1, 5)
+		grid.setColumnStretch(1, 2)
+		layout.addWidget(gb)
+
+		self.dupe_summary = QLabel("尚未查找")
+		self.dupe_tree = QTreeWidget(); self.dupe_tree.setStyleSheet(ModernStyles.get_tree_style(s))
+		self.dupe_tree.setHeaderLabels(["文件", "大小"]); self.dupe_tree.setColumnWidth(0, int(800*s))
+		layout.addWidget(self.dupe_summary); layout.addWidget(self.dupe_tree)
+		return tab
 
 	def apply_modern_style(self):
 		self.setStyleSheet(ModernStyles.get_main_style(self.scale))
@@ -326,13 +368,14 @@ class ModernMediaOrganizer(QMainWindow):
 			'.pdf', '.doc', '.docx', '.txt', '.rtf'
 		}
 		file_count = 0
-		for file_path in Path(source_dir).rglob('*'):
-			if file_path.is_file() and file_path.suffix.lower() in media_extensions:
-				item = QListWidgetItem(f"📄 {file_path.name}")
-				item.setToolTip(str(file_path))
-				self.file_list.addItem(item)
-				file_count += 1
-		self.log_text.append(f"找到 {file_count} 个媒体文件")
+		lister = DirLister()
+		for rec in lister.walk(Path(source_dir), media_extensions):
+			item = QListWidgetItem(f"📄 {rec.path.name}")
+			item.setToolTip(str(rec.path))
+			self.file_list.addItem(item)
+			file_count += 1
+		st = lister.stats.summary()
+		self.log_text.append(f"找到 {file_count} 个媒体文件（列目录 {st['calls']} 次，平均 {st['mean_ms']} ms，最慢 {st['max_ms']} ms）")
 
 	def start_organizing(self):
 		source_dir = self.source_path.text(); target_dir = self.target_path.text()
@@ -340,18 +383,22 @@ class ModernMediaOrganizer(QMainWindow):
 			QMessageBox.warning(self, "警告", "请选择源文件夹和目标文件夹！"); return
 		if not os.path.exists(source_dir):
 			QMessageBox.warning(self, "警告", "源文件夹不存在！"); return
+		busy = self.tasks.conflict([source_dir, target_dir])
+		if busy:
+			QMessageBox.warning(self, "任务冲突", f"「{busy}」正在处理相同的目录，请等待完成或先取消"); return
 		os.makedirs(target_dir, exist_ok=True)
 		self.worker = MediaOrganizerWorker(
 			source_dir, target_dir,
 			self.organize_by_date.isChecked(),
 			self.organize_by_type.isChecked(),
-			self.create_subfolders.isChecked()
+			self.create_subfolders.isChecked(),
+			bus=self.bus
 		)
-		self.worker.progress.connect(self.progress_bar.setValue)
-		self.worker.status.connect(self.statusBar().showMessage)
-		self.worker.status.connect(self.log_text.append)
 		self.worker.finished.connect(self.organizing_finished)
 		self.worker.error.connect(self.show_error)
+		# 登记为占用源/目标目录的任务：期间工具任务不能处理重叠目录，反之亦然
+		self.tasks.adopt("媒体整理", self.worker, paths=[source_dir, target_dir], stop=self.worker.stop,
+			done_signals=(self.worker.finished, self.worker.error))
 		self.worker.start()
 		self.start_btn.setEnabled(False); self.stop_btn.setEnabled(True)
 		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
@@ -362,90 +409,165 @@ class ModernMediaOrganizer(QMainWindow):
 		self.organizing_finished()
 
 	def organizing_finished(self):
+		self.bus.drain()
 		self.start_btn.setEnabled(True); self.stop_btn.setEnabled(False)
-		self.progress_bar.setVisible(False); self.statusBar().showMessage("就绪")
+		if self.worker:
+			# 整理在工具之外移动了文件，两侧目录的会话快照都不能再用
+			self.tools.invalidate_scan_cache(Path(self.worker.source_dir))
+			self.tools.invalidate_scan_cache(Path(self.worker.target_dir))
+		# 进度条与“就绪”交给 tool_task_finished：还有其他任务在跑时不隐藏
 
 	def show_error(self, error_msg):
 		QMessageBox.critical(self, "错误", error_msg)
 		self.organizing_finished()
 
-	# 工具套件动作
-	def action_export_posters(self):
+	# 工具套件动作（后台运行）
+	def run_tool(self, name, method, *args, paths=(), done=None, **kwargs):
+		busy = self.tasks.conflict(paths)
+		if busy:
+			QMessageBox.warning(self, "任务冲突", f"「{busy}」正在处理相同的目录，请等待完成或先取消"); return
 		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.export_posters_for_enhance(Path(self.topaz_src.text()), Path(self.topaz_work.text()), open_topaz=True)
-		QMessageBox.information(self, "完成", f"已导出 {n} 个 Poster")
+		self.bus.post_log(f"▶️ {name} 开始")
+		self.tasks.submit(
+			name, method, *args, paths=paths,
+			on_result=lambda r: done(r) if done else None,
+			on_error=lambda msg: QMessageBox.critical(self, "错误", msg),
+			**kwargs
+		)
+		self.tool_cancel_btn.setEnabled(True)
+
+	def cancel_tool_tasks(self):
+		self.tasks.cancel_all(include_external=False)
+
+	def tool_task_finished(self, name):
+		if not any(not t.external for t in self.tasks.tasks):
+			self.tool_cancel_btn.setEnabled(False)
+		if not self.tasks.tasks:
+			self.progress_bar.setVisible(False); self.statusBar().showMessage("就绪")
+
+	def closeEvent(self, event):
+		self.tasks.cancel_all(); self.tasks.wait_all()
+		if self.worker:
+			self.worker.stop(); self.worker.wait()
+		super().closeEvent(event)
+
+	def action_invalidate_scan_cache(self):
+		self.tools.invalidate_scan_cache()
+		self.bus.post_log("已清空扫描缓存，下次操作将重新扫描目录")
+
+	def action_export_posters(self):
+		src, work = Path(self.topaz_src.text()), Path(self.topaz_work.text())
+		self.run_tool("导出Poster", "export_posters_for_enhance", src, work, open_topaz=True, paths=[src, work],
+			done=lambda n: QMessageBox.information(self, "完成", f"已导出 {n} 个 Poster"))
 
 	def action_import_posters(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.import_enhanced_posters(Path(self.topaz_work.text()))
-		QMessageBox.information(self, "完成", f"已导回 {n} 个 Poster")
+		work = Path(self.topaz_work.text())
+		self.run_tool("导回Poster", "import_enhanced_posters", work, paths=[work, self.topaz_src.text()],
+			done=lambda n: QMessageBox.information(self, "完成", f"已导回 {n} 个 Poster"))
 
 	def action_extract_ed2k(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.extract_ed2k(Path(self.ed2k_base.text()), Path(self.ed2k_out.text()), auto_delete_txt=self.ed2k_delete.isChecked())
-		QMessageBox.information(self, "完成", f"提取 {n} 条链接")
+		base, out = Path(self.ed2k_base.text()), Path(self.ed2k_out.text())
+		self.run_tool("ED2K提取", "extract_ed2k", base, out, auto_delete_txt=self.ed2k_delete.isChecked(), paths=[base],
+			done=lambda n: QMessageBox.information(self, "完成", f"提取 {n} 条链接"))
 
 	def action_replace_covers(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.replace_covers_by_size(Path(self.cover_repo.text()), Path(self.cover_target.text()))
-		QMessageBox.information(self, "完成", f"替换 {n} 个封面")
+		repo, target = Path(self.cover_repo.text()), Path(self.cover_target.text())
+		mode = "resolution" if self.cover_mode.currentIndex() == 1 else "size"
+		self.run_tool("封面替换", "replace_covers_by_size", repo, target, mode=mode, paths=[target],
+			done=lambda n: QMessageBox.information(self, "完成", f"替换 {n} 个封面"))
 
 	def action_match_subs(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
 		prio = [x.strip() for x in self.sub_prio.text().split(',') if x.strip()]
-		n = self.tools.match_and_copy_subtitles(Path(self.sub_video_root.text()), Path(self.sub_root.text()), prio)
-		QMessageBox.information(self, "完成", f"复制 {n} 个字幕")
+		video_root = Path(self.sub_video_root.text())
+		self.run_tool("字幕匹配", "match_and_copy_subtitles", video_root, Path(self.sub_root.text()), prio, paths=[video_root],
+			done=lambda n: QMessageBox.information(self, "完成", f"复制 {n} 个字幕"))
 
 	def action_rename_srt(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.rename_srt_cid_to_bangou(Path(self.srt_root.text()))
-		QMessageBox.information(self, "完成", f"重命名 {n} 个字幕")
+		root = Path(self.srt_root.text())
+		self.run_tool("DMM字幕重命名", "rename_srt_cid_to_bangou", root, paths=[root],
+			done=lambda n: QMessageBox.information(self, "完成", f"重命名 {n} 个字幕"))
 
 	def action_books(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.organize_books(Path(self.book_src.text()), Path(self.book_dst.text()))
-		QMessageBox.information(self, "完成", f"整理 {n} 个文件")
+		src, dst = Path(self.book_src.text()), Path(self.book_dst.text())
+		self.run_tool("书库整理", "organize_books", src, dst, paths=[src, dst],
+			done=lambda n: QMessageBox.information(self, "完成", f"整理 {n} 个文件"))
 
 	def action_coser2(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.coser_group_level2(Path(self.coser_root.text()))
-		QMessageBox.information(self, "完成", f"移动 {n} 个文件夹")
+		root = Path(self.coser_root.text())
+		self.run_tool("Coser二级整理", "coser_group_level2", root, paths=[root],
+			done=lambda n: QMessageBox.information(self, "完成", f"移动 {n} 个文件夹"))
 
 	def action_coserA(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.coser_group_by_letter(Path(self.coser_root.text()))
-		QMessageBox.information(self, "完成", f"归档 {n} 个文件夹")
+		root = Path(self.coser_root.text())
+		self.run_tool("Coser首字母", "coser_group_by_letter", root, paths=[root],
+			done=lambda n: QMessageBox.information(self, "完成", f"归档 {n} 个文件夹"))
 
 	def action_video_rename(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.video_batch_rename_files(Path(self.vid_rename_dir.text()), suffix="-4K")
-		QMessageBox.information(self, "完成", f"重命名 {n} 个视频")
+		d = Path(self.vid_rename_dir.text())
+		self.run_tool("视频重命名", "video_batch_rename_files", d, suffix="-4K", paths=[d],
+			done=lambda n: QMessageBox.information(self, "完成", f"重命名 {n} 个视频"))
+
+	def action_video_rename_auto(self):
+		d = Path(self.vid_rename_dir.text())
+		self.run_tool("视频重命名-自动", "video_batch_rename_files", d, suffix="auto", paths=[d],
+			done=lambda n: QMessageBox.information(self, "完成", f"重命名 {n} 个视频"))
 
 	def action_folder_mark_C(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.folder_and_files_rename(Path(self.folder_mark_dir.text()), mode='C')
-		QMessageBox.information(self, "完成", f"处理 {n} 个文件夹")
+		d = Path(self.folder_mark_dir.text())
+		self.run_tool("文件夹标记-C", "folder_and_files_rename", d, mode='C', paths=[d],
+			done=lambda n: QMessageBox.information(self, "完成", f"处理 {n} 个文件夹"))
 
 	def action_folder_mark_4k(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.folder_and_files_rename(Path(self.folder_mark_dir.text()), mode='4K')
-		QMessageBox.information(self, "完成", f"处理 {n} 个文件夹")
+		d = Path(self.folder_mark_dir.text())
+		self.run_tool("文件夹标记-4K", "folder_and_files_rename", d, mode='4K', paths=[d],
+			done=lambda n: QMessageBox.information(self, "完成", f"处理 {n} 个文件夹"))
+
+	def action_folder_mark_auto(self):
+		d = Path(self.folder_mark_dir.text())
+		self.run_tool("文件夹标记-自动", "folder_and_files_rename", d, mode='auto', paths=[d],
+			done=lambda n: QMessageBox.information(self, "完成", f"处理 {n} 个文件夹"))
 
 	def action_nfo(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.nfo_organize_by_maker(Path(self.nfo_src.text()), Path(self.nfo_dst.text()))
-		QMessageBox.information(self, "完成", f"移动 {n} 个文件夹")
+		src, dst = Path(self.nfo_src.text()), Path(self.nfo_dst.text())
+		self.run_tool("NFO厂商整理", "nfo_organize_by_maker", src, dst, paths=[src, dst],
+			done=lambda n: QMessageBox.information(self, "完成", f"移动 {n} 个文件夹"))
 
 	def action_poster_match(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
-		n = self.tools.poster_replace_from_source(Path(self.poster_tpl.text()), Path(self.poster_src.text()))
-		QMessageBox.information(self, "完成", f"替换 {n} 个Poster")
+		tpl = Path(self.poster_tpl.text())
+		self.run_tool("Poster匹配替换", "poster_replace_from_source", tpl, Path(self.poster_src.text()), paths=[tpl],
+			done=lambda n: QMessageBox.information(self, "完成", f"替换 {n} 个Poster"))
+
+	def action_find_duplicates(self):
+		roots = [Path(x.strip()) for x in self.dupe_roots.text().split(';') if x.strip()]
+		exts = (tuple(SETTINGS["VIDEO_EXTENSIONS"]) if self.dupe_video.isChecked() else ()) + \
+			(tuple(SETTINGS["IMAGE_EXTENSIONS"]) if self.dupe_image.isChecked() else ())
+		if not roots or not exts:
+			QMessageBox.warning(self, "警告", "请填写目录并至少选择一种文件类型！"); return
+		try: min_size = max(1, int(float(self.dupe_min.text() or 0) * 1024 * 1024))
+		except ValueError:
+			QMessageBox.warning(self, "错误", "最小大小应为数字（MB）"); return
+		self.dupe_summary.setText("查找中……")
+		self.run_tool("重复文件查找", "find_duplicates", roots, exts=exts, min_size=min_size, paths=roots, done=self.show_duplicates)
+
+	def show_duplicates(self, result):
+		self.dupe_tree.clear()
+		groups = {}
+		with open(result["report"], newline="", encoding="utf-8") as f:
+			for row in csv.DictReader(f): groups.setdefault(row["group"], []).append(row)
+		for gid, rows in groups.items():
+			size = int(rows[0]["size"])
+			top = QTreeWidgetItem([f"#{gid}  {Path(rows[0]['path']).name}  × {len(rows)}", f"{size / 1048576:.1f} MB"])
+			for row in rows:
+				child = QTreeWidgetItem([row["path"], ""]); child.setToolTip(0, row["path"]); top.addChild(child)
+			self.dupe_tree.addTopLevelItem(top)
+		self.dupe_summary.setText(f"重复组 {result['groups']}，多余文件 {result['duplicates']} 个，"
+			f"可节省 {result['wasted_bytes'] / 1073741824:.2f} GB　报告: {result['report']}")
 
 	def action_seq_download(self):
-		self.progress_bar.setVisible(True); self.progress_bar.setValue(0)
 		try:
 			start, end = [int(x) for x in self.dl_range.text().split('-',1)]
 		except Exception:
 			QMessageBox.warning(self, "错误", "范围格式应为 起-止，例如 1-1000"); return
-		ok, fail = self.tools.sequence_download(self.dl_url.text(), Path(self.dl_save.text()), start, end)
-		QMessageBox.information(self, "完成", f"成功 {ok} 失败 {fail}")
+		save = Path(self.dl_save.text())
+		self.run_tool("序列下载", "sequence_download", self.dl_url.text(), save, start, end, paths=[save],
+			done=lambda r: QMessageBox.information(self, "完成", f"成功 {r[0]} 失败 {r[1]}"))
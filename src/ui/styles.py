@@ -132,6 +132,10 @@ class ModernStyles:
 			QListWidget::item:hover {{ background-color: #ecf0f1; }}
 		"""
 
+	@classmethod
+	def get_tree_style(cls, s=1.0):
+		return cls.get_list_style(s).replace("QListWidget", "QTreeWidget")
+
 	@classmethod
 	def get_log_style(cls, s=1.0):
 		return f"""
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩包预处理：用假解压器（不依赖 Bandizip）验证分卷归组、同名成员与失败时的清理
+"""
+
+import json, sys, tempfile, threading, time, unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from config import SETTINGS
+
+_TMP = tempfile.mkdtemp()
+SETTINGS.update(LOG_DIR_PATH=_TMP, CATALOG_ENABLED=False, ARCHIVE_WORKERS=4, ARCHIVE_PER_DISK_LIMIT=4)
+
+from media_organizer import MediaToolkit, _archive_sets
+
+
+class FakeExtractor:
+	"""压缩包内容就是 {成员名: 文本} 的 JSON；分卷只在首卷里写内容。逐字节慢慢写出，放大并发写同一文件的问题"""
+
+	def __init__(self, fail=()):
+		self.calls, self.fail, self.lock = [], set(fail), threading.Lock()
+		self.active: dict = {}
+		self.max_same_dir = 0
+
+	def __call__(self, arc: Path, out_dir: Path, pwd):
+		with self.lock:
+			self.calls.append(arc.name)
+			self.active[out_dir] = self.active.get(out_dir, 0) + 1
+			self.max_same_dir = max(self.max_same_dir, self.active[out_dir])
+		try:
+			if arc.name in self.fail: raise RuntimeError("损坏的压缩包")
+			members = json.loads(arc.read_text(encoding="utf-8"))
+			for name, text in members.items():
+				dst = Path(out_dir) / name
+				dst.parent.mkdir(parents=True, exist_ok=True)
+				with open(dst, "w", encoding="utf-8") as f:
+					for ch in text: f.write(ch); f.flush(); time.sleep(0.001)
+			# 解压过程中其余分卷必须一直存在
+			for vol in arc.parent.glob(arc.name.split(".")[0] + ".*"):
+				assert vol.exists()
+		finally:
+			with self.lock: self.active[out_dir] -= 1
+
+
+def write_archive(path: Path, members: dict = None):
+	path.write_text(json.dumps(members or {}), encoding="utf-8")
+
+
+class ArchiveSetTest(unittest.TestCase):
+	def test_grouping(self):
+		names = ["a.part1.rar", "a.part2.rar", "a.part10.rar", "b.7z.001", "b.7z.002", "c.rar", "c.r00", "c.r01",
+			"d.zip", "e.7z", "f.part2.rar", "g.r00", "note.txt"]
+		sets = _archive_sets([Path(n) for n in names])
+		self.assertEqual({k.name: [p.name for p in v] for k, v in sets.items()}, {
+			"a.part1.rar": ["a.part1.rar", "a.part2.rar", "a.part10.rar"],
+			"b.7z.001": ["b.7z.001", "b.7z.002"],
+			"c.rar": ["c.rar", "c.r00", "c.r01"],
+			"d.zip": ["d.zip"], "e.7z": ["e.7z"]})
+
+
+class PreprocessArchivesTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = Path(tempfile.mkdtemp())
+
+	def run_tool(self, fake):
+		MediaToolkit(extractor=fake)._preprocess_archives(self.dir)
+		return sorted(p.name for p in self.dir.iterdir())
+
+	def test_multi_volume_is_one_job(self):
+		write_archive(self.dir / "movie.part1.rar", {"movie.txt": "第一卷内容" * 5})
+		write_archive(self.dir / "movie.part2.rar"); write_archive(self.dir / "movie.part3.rar")
+		write_archive(self.dir / "pack.7z.001", {"pack.txt": "pack"}); write_archive(self.dir / "pack.7z.002")
+		fake = FakeExtractor()
+		self.assertEqual(self.run_tool(fake), ["movie.txt", "pack.txt"])
+		self.assertEqual(sorted(fake.calls), ["movie.part1.rar", "pack.7z.001"])
+		self.assertEqual((self.dir / "movie.txt").read_text(encoding="utf-8"), "第一卷内容" * 5)
+
+	def test_shared_member_names(self):
+		for i in range(6):
+			write_archive(self.dir / f"a{i}.rar", {"readme.txt": str(i) * 40, f"sub/{i}.txt": "x", "sub/common.txt": str(i)})
+		fake = FakeExtractor()
+		self.assertEqual(self.run_tool(fake), ["readme.txt", "sub"])
+		self.assertEqual(fake.max_same_dir, 1)
+		# 按首卷名顺序合并，最后一个同名成员生效，且内容完整
+		self.assertEqual((self.dir / "readme.txt").read_text(encoding="utf-8"), "5" * 40)
+		self.assertEqual((self.dir / "sub" / "common.txt").read_text(encoding="utf-8"), "5")
+		self.assertEqual(sorted(p.name for p in (self.dir / "sub").iterdir()), ["0.txt", "1.txt", "2.txt", "3.txt", "4.txt", "5.txt", "common.txt"])
+
+	def test_failed_set_keeps_volumes(self):
+		write_archive(self.dir / "bad.part1.rar", {"bad.txt": "x"}); write_archive(self.dir / "bad.part2.rar")
+		write_archive(self.dir / "good.rar", {"good.txt": "ok"})
+		names = self.run_tool(FakeExtractor(fail={"bad.part1.rar"}))
+		self.assertEqual(names, ["bad.part1.rar", "bad.part2.rar", "good.txt"])
+
+
+if __name__ == "__main__":
+	unittest.main()
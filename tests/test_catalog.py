@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话快照与目录库：外部增删目录后不能再沿用旧结果，工具自身的写入就地更新；
+目录库的增量刷新（改名、深层新增、删除子树、同前缀的兄弟目录）与完整遍历结果一致
+"""
+
+import os, shutil, sys, tempfile, time, unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from config import SETTINGS
+
+_TMP = tempfile.mkdtemp()
+SETTINGS.update(LOG_DIR_PATH=_TMP, CATALOG_ENABLED=False)
+
+from catalog import FileCatalog, ScanCache
+from media_organizer import MediaToolkit
+from scanner import DirLister
+
+
+def write(path: Path, data: bytes = b"x") -> Path:
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_bytes(data)
+	return path
+
+
+def age(root: Path, seconds: float = 100):
+	"""把目录 mtime 调旧：同一时钟粒度内的修改可能不改变 mtime，测试里先拉开距离"""
+	t = time.time() - seconds
+	for d, _, _ in os.walk(root): os.utime(d, (t, t))
+
+
+class ScanCacheTest(unittest.TestCase):
+	def setUp(self):
+		self.root = Path(tempfile.mkdtemp(dir=_TMP))
+		write(self.root / "A" / "a.jpg"); write(self.root / "B" / "deep" / "b.jpg")
+		age(self.root)
+		self.cache = ScanCache(ttl=600, workers=4)
+
+	def snapshot(self, derive: bool = False):
+		dirs: dict = {}
+		records = list(DirLister(2).walk(self.root, dirs=dirs))
+		self.cache.put(self.root, records, None if derive else dirs)
+
+	def names(self):
+		recs = self.cache.get(self.root)
+		return None if recs is None else sorted(r.path.name for r in recs)
+
+	def test_unchanged_tree_is_reused(self):
+		self.snapshot()
+		self.assertEqual(self.names(), ["a.jpg", "b.jpg"])
+
+	def test_external_delete_invalidates(self):
+		self.snapshot()
+		shutil.rmtree(self.root / "A")
+		self.assertIsNone(self.names())
+
+	def test_external_add_in_subdir_invalidates(self):
+		for derive in (False, True):
+			with self.subTest(derive=derive):
+				self.snapshot(derive)
+				write(self.root / "B" / "deep" / f"new{derive}.jpg")
+				self.assertIsNone(self.names())
+				age(self.root)
+
+	def test_own_writes_update_in_place(self):
+		self.snapshot()
+		write(self.root / "A" / "c.jpg", b"xyz")
+		self.cache.updated([self.root / "A" / "c.jpg"])
+		os.unlink(self.root / "A" / "a.jpg")
+		self.cache.updated([self.root / "A" / "a.jpg"])
+		self.assertEqual(self.names(), ["b.jpg", "c.jpg"])
+
+	def test_moved_drops_affected_snapshots_only(self):
+		other = Path(tempfile.mkdtemp(dir=_TMP))
+		write(other / "o.jpg"); age(other)
+		self.snapshot()
+		self.cache.put(other, list(DirLister(2).walk(other)))
+		os.rename(self.root / "A", self.root / "A2")
+		self.cache.moved(self.root / "A", self.root / "A2")
+		self.assertIsNone(self.cache.get(self.root))
+		self.assertEqual([r.path.name for r in self.cache.get(other)], ["o.jpg"])
+
+
+class FileCatalogTest(unittest.TestCase):
+	"""增量刷新只重新列出 mtime 变化的目录，结果要与完整遍历一致"""
+
+	def setUp(self):
+		self.base = Path(tempfile.mkdtemp(dir=_TMP))
+		self.root = self.base / "lib"
+		for d in ("A", "B/deep/deeper", "C"):
+			write(self.root / d / "f.jpg")
+		write(self.root / "A" / "g.mp4", b"12345")
+		# 与 lib 同前缀的兄弟目录，不能混进 lib 的结果
+		write(self.base / "lib2" / "x.jpg"); write(self.base / "lib-old" / "y.jpg")
+		age(self.base)
+		self.catalog = FileCatalog(self.base / "catalog.sqlite3", workers=2)
+		self.addCleanup(self.catalog.close)
+
+	def scan(self, root=None):
+		return sorted((str(r.path.relative_to(self.base)), r.size) for r in self.catalog.scan(root or self.root))
+
+	def walked(self, root=None):
+		return sorted((str(r.path.relative_to(self.base)), r.size) for r in DirLister(2).walk(root or self.root))
+
+	def test_unchanged_tree_is_reused(self):
+		self.assertEqual(self.scan(), self.walked())
+		stats = self.catalog.refresh(self.root)
+		self.assertEqual(stats["listed"], 0)
+		self.assertEqual(stats["reused"], 6)
+
+	def test_rename(self):
+		self.scan()
+		os.rename(self.root / "B", self.root / "B2")
+		self.assertEqual(self.scan(), self.walked())
+		self.assertFalse(any(p.startswith(os.path.join("lib", "B", "")) for p, _ in self.scan()))
+
+	def test_deep_add(self):
+		self.scan()
+		write(self.root / "B" / "deep" / "deeper" / "new.jpg", b"new")
+		write(self.root / "C" / "sub" / "newer.jpg")
+		stats = self.catalog.refresh(self.root)
+		# 只有 deeper、C 与新建的 C/sub 需要重新列出
+		self.assertEqual(stats["listed"], 3)
+		self.assertEqual(self.scan(), self.walked())
+
+	def test_rmtree(self):
+		self.scan()
+		shutil.rmtree(self.root / "B")
+		self.assertEqual(self.scan(), self.walked())
+		self.assertEqual(self.catalog.dirs(self.root).keys(), {str(self.root), str(self.root / "A"), str(self.root / "C")})
+
+	def test_sibling_prefix_isolation(self):
+		self.scan(); self.scan(self.base / "lib2")
+		self.assertEqual(self.scan(self.base / "lib2"), [(os.path.join("lib2", "x.jpg"), 1)])
+		self.assertNotIn("lib2", {p.split(os.sep)[0] for p, _ in self.scan()})
+		# 删除 lib 不影响 lib2 的记录
+		shutil.rmtree(self.root)
+		self.assertEqual(self.scan(), [])
+		self.assertEqual(len(self.catalog.files(self.base / "lib2")), 1)
+
+	def test_in_place_overwrite_needs_update_files(self):
+		"""就地覆盖不改变目录 mtime：刷新察觉不到，由 update_files 补上"""
+		self.scan()
+		write(self.root / "A" / "g.mp4", b"longer content")
+		self.assertIn((os.path.join("lib", "A", "g.mp4"), 5), self.scan())
+		self.catalog.update_files([self.root / "A" / "g.mp4"])
+		self.assertIn((os.path.join("lib", "A", "g.mp4"), 14), self.scan())
+
+
+class StaleSnapshotToolkitTest(unittest.TestCase):
+	def test_poster_replace_after_external_changes(self):
+		root = Path(tempfile.mkdtemp(dir=_TMP)); source = Path(tempfile.mkdtemp(dir=_TMP))
+		write(root / "ABC-001" / "ABC-001-poster.jpg", b"old")
+		write(root / "ABC-002" / "ABC-002-poster.jpg", b"old")
+		write(source / "ABC-001.jpg", b"new1"); write(source / "ABC-002.jpg", b"new2"); write(source / "ABC-003.jpg", b"new3")
+		age(root)
+		tk = MediaToolkit()
+		self.assertEqual(tk.poster_replace_from_source(root, source), 2)
+		# 在工具之外删掉一个目录、新增一个目录
+		shutil.rmtree(root / "ABC-001")
+		write(root / "ABC-003" / "ABC-003-poster.jpg", b"old")
+		self.assertEqual(tk.poster_replace_from_source(root, source), 2)
+		self.assertEqual((root / "ABC-003" / "ABC-003-poster.jpg").read_bytes(), b"new3")
+		self.assertFalse((root / "ABC-001").exists())
+
+
+if __name__ == "__main__":
+	unittest.main()
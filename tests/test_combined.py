@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+组合任务：run_combined 一次遍历执行多个操作，结果与按相同顺序分别调用各方法一致
+"""
+
+import hashlib, random, shutil, sys, tempfile, unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from config import SETTINGS
+
+_TMP = tempfile.mkdtemp()
+SETTINGS.update(LOG_DIR_PATH=str(Path(_TMP) / "logs"), CATALOG_ENABLED=False)
+
+from media_organizer import MediaToolkit
+
+
+def write(path: Path, data: bytes):
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_bytes(data)
+
+
+def noise(rng: random.Random, lo: int, hi: int) -> bytes:
+	return bytes(rng.getrandbits(8) for _ in range(rng.randint(lo, hi)))
+
+
+def build(base: Path):
+	"""lib 下 60 个番号目录（封面/缩略图/poster/部分有 nfo），covers 为封面库，imgsrc 为 poster 图片源"""
+	rng = random.Random(1)
+	for i in range(60):
+		bid = f"ABC-{i:03d}"
+		d = base / "lib" / f"grp{i % 5}" / bid
+		for kind in ("fanart", "thumb", "poster"):
+			write(d / f"{bid}-{kind}.jpg", noise(rng, 10, 200))
+		if i % 3: write(d / f"{bid}.nfo", f"<movie><maker>M{i % 4}</maker><studio>S</studio></movie>".encode())
+		if i % 2: write(base / "covers" / f"{bid}.jpg", noise(rng, 50, 300))
+		if i % 4 == 0: write(base / "imgsrc" / f"x_{bid}.jpg", noise(rng, 5, 400))
+
+
+def snapshot(base: Path) -> dict:
+	return {str(p.relative_to(base)): hashlib.md5(p.read_bytes()).hexdigest()
+		for p in sorted(base.rglob("*")) if p.is_file()}
+
+
+class ScanCounter(MediaToolkit):
+	def __init__(self):
+		super().__init__()
+		self.scans = []
+
+	def _scan(self, root, exts=None):
+		self.scans.append(Path(root).name)
+		return super()._scan(root, exts)
+
+
+class RunCombinedTest(unittest.TestCase):
+	def test_matches_separate_runs(self):
+		base = Path(tempfile.mkdtemp(dir=_TMP))
+		a, b = base / "A", base / "B"
+		build(a); shutil.copytree(a, b)
+		mapping = Path(SETTINGS["LOG_DIR_PATH"]) / "poster_mapping.csv"
+
+		ta = ScanCounter()
+		separate = [ta.replace_covers_by_size(a / "covers", a / "lib"), ta.poster_replace_from_source(a / "lib", a / "imgsrc"),
+			ta.export_posters_for_enhance(a / "lib", a / "work", open_topaz=False)]
+		mapping_a = mapping.read_text(encoding="utf-8").replace(str(a), "")
+		separate.append(ta.nfo_organize_by_maker(a / "lib", a / "out"))
+
+		tb = ScanCounter()
+		combined = tb.run_combined(b / "lib", cover_repo=b / "covers", image_source=b / "imgsrc", export_dir=b / "work", nfo_dest=b / "out")
+		mapping_b = mapping.read_text(encoding="utf-8").replace(str(b), "")
+
+		self.assertEqual(list(combined), ["replace_covers", "poster_replace", "export_posters", "nfo_organize"])
+		self.assertEqual(list(combined.values()), separate)
+		self.assertTrue(all(separate))
+		self.assertEqual(snapshot(a), snapshot(b))
+		self.assertEqual(mapping_a, mapping_b)
+		# 组合任务只遍历一次 lib（另有封面库一次），分别调用时每个操作各遍历一次
+		self.assertEqual(tb.scans.count("lib"), 1)
+		self.assertEqual(ta.scans.count("lib"), 4)
+
+	def test_nothing_selected(self):
+		root = Path(tempfile.mkdtemp(dir=_TMP))
+		self.assertEqual(MediaToolkit().run_combined(root), {})
+
+
+if __name__ == "__main__":
+	unittest.main()
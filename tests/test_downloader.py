@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载引擎：对本地 http.server 验证 成功 / 跳过 / 失败 / 断点续传，以及 If-None-Match、If-Range 条件请求
+"""
+
+import gzip, sys, tempfile, threading, unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from config import SETTINGS
+
+SETTINGS.update(LOG_DIR_PATH=tempfile.mkdtemp(), CATALOG_ENABLED=False)
+
+from downloader import DownloadEngine, DownloadManifest
+
+
+class FakeServer(BaseHTTPRequestHandler):
+	"""files: 名称 -> (内容, ETag)；truncate 中的文件只发一半内容就断开；gzip 中的文件不管请求头一律压缩发送"""
+	files, truncate, gzip, requests = {}, set(), set(), []
+
+	def log_message(self, *args): pass
+
+	def do_GET(self):
+		name = self.path.lstrip("/")
+		FakeServer.requests.append((name, dict(self.headers)))
+		if name not in self.files:
+			self.send_error(404); return
+		body, etag = self.files[name]
+		if self.headers.get("If-None-Match") == etag:
+			self.send_response(304); self.end_headers(); return
+		rng, start = self.headers.get("Range"), 0
+		if rng and self.headers.get("If-Range") in (None, etag):
+			start = int(rng.split("=")[1].rstrip("-"))
+			if start >= len(body):
+				self.send_response(416); self.send_header("Content-Length", "0"); self.end_headers(); return
+			self.send_response(206)
+		else:
+			self.send_response(200)
+		data = body[start:]
+		if name in self.gzip:
+			data = gzip.compress(data); self.send_header("Content-Encoding", "gzip")
+		self.send_header("ETag", etag)
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data[:len(data) // 2] if name in self.truncate else data)
+		if name in self.truncate: self.close_connection = True
+
+
+class DownloadEngineTest(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeServer)
+		threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+		cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown(); cls.server.server_close()
+
+	def setUp(self):
+		FakeServer.files = {f"{i:03d}.jpg": (bytes([i]) * (1000 + i), f'"v1-{i}"') for i in range(1, 11)}
+		FakeServer.truncate, FakeServer.gzip, FakeServer.requests = set(), set(), []
+		self.dir = Path(tempfile.mkdtemp())
+		self.engine = DownloadEngine(workers=4)
+
+	def tearDown(self):
+		self.engine.close()
+
+	def run_jobs(self, names):
+		return self.engine.run([(self.base + n, self.dir / n) for n in names])
+
+	def test_ok_skip_fail(self):
+		names = list(FakeServer.files) + ["missing.jpg"]
+		counts = self.run_jobs(names)
+		self.assertEqual((counts["ok"], counts["skip"], counts["fail"]), (10, 0, 1))
+		for n, (body, _) in FakeServer.files.items():
+			self.assertEqual((self.dir / n).read_bytes(), body)
+		self.assertFalse((self.dir / "missing.jpg").exists())
+		# 第二次：清单里有 ETag，发 If-None-Match，服务器 304
+		FakeServer.requests = []
+		counts = self.run_jobs(list(FakeServer.files))
+		self.assertEqual(counts["skip"], 10)
+		self.assertTrue(all(h.get("If-None-Match") for _, h in FakeServer.requests))
+
+	def test_identity_encoding(self):
+		self.run_jobs(["001.jpg"])
+		self.assertEqual(FakeServer.requests[0][1].get("Accept-Encoding"), "identity")
+		# 服务器无视请求头照样压缩：Content-Length 是压缩后的长度，不能拿来校验解码后的文件
+		FakeServer.gzip = {"002.jpg"}
+		self.assertEqual(self.run_jobs(["002.jpg"])["ok"], 1)
+		self.assertEqual((self.dir / "002.jpg").read_bytes(), FakeServer.files["002.jpg"][0])
+
+	def test_existing_file_without_manifest_is_skipped(self):
+		(self.dir / "001.jpg").write_bytes(b"local")
+		self.assertEqual(self.run_jobs(["001.jpg"])["skip"], 1)
+		self.assertEqual(FakeServer.requests, [])
+		self.assertEqual((self.dir / "001.jpg").read_bytes(), b"local")
+
+	def test_changed_file_is_downloaded_again(self):
+		self.run_jobs(["001.jpg"])
+		FakeServer.files["001.jpg"] = (b"new" * 500, '"v2-1"')
+		self.assertEqual(self.run_jobs(["001.jpg"])["ok"], 1)
+		self.assertEqual((self.dir / "001.jpg").read_bytes(), b"new" * 500)
+
+	def truncate(self, name):
+		"""换成足够大的内容：连接中断时最后一个不完整的块会丢弃，需要有完整的块先落盘"""
+		body, etag = FakeServer.files[name]
+		FakeServer.files[name] = (body * 300, etag)
+		FakeServer.truncate = {name}
+
+	def test_truncated_then_resumed(self):
+		self.truncate("005.jpg")
+		self.assertEqual(self.run_jobs(["005.jpg"])["fail"], 1)
+		part = self.dir / "005.jpg.part"
+		self.assertTrue(0 < part.stat().st_size < len(FakeServer.files["005.jpg"][0]))
+		offset = part.stat().st_size
+		FakeServer.truncate, FakeServer.requests = set(), []
+		self.assertEqual(self.run_jobs(["005.jpg"])["ok"], 1)
+		_, headers = FakeServer.requests[0]
+		self.assertEqual(headers.get("Range"), f"bytes={offset}-")
+		self.assertEqual(headers.get("If-Range"), '"v1-5"')
+		self.assertEqual((self.dir / "005.jpg").read_bytes(), FakeServer.files["005.jpg"][0])
+		self.assertFalse(part.exists())
+		self.assertTrue(DownloadManifest(self.dir).get("005.jpg")["complete"])
+
+	def test_if_range_mismatch_restarts_from_zero(self):
+		self.truncate("006.jpg")
+		self.run_jobs(["006.jpg"])
+		FakeServer.truncate = set()
+		FakeServer.files["006.jpg"] = (b"changed" * 300, '"v2-6"')
+		self.assertEqual(self.run_jobs(["006.jpg"])["ok"], 1)
+		self.assertEqual((self.dir / "006.jpg").read_bytes(), b"changed" * 300)
+
+	def test_range_not_satisfiable_drops_part(self):
+		self.truncate("007.jpg")
+		self.run_jobs(["007.jpg"])
+		FakeServer.truncate = set()
+		FakeServer.files["007.jpg"] = (b"x", '"v1-7"')  # 同一 ETag 但比 .part 还短
+		self.assertEqual(self.run_jobs(["007.jpg"])["fail"], 1)
+		self.assertFalse((self.dir / "007.jpg.part").exists())
+		self.assertEqual(self.run_jobs(["007.jpg"])["ok"], 1)
+
+	def test_sequence_download_counts(self):
+		from media_organizer import MediaToolkit
+		ok, fail = MediaToolkit().sequence_download(self.base + "{num}.jpg", self.dir, 1, 12, padding=3, batch=0, pause=0, workers=4)
+		self.assertEqual((ok, fail), (10, 2))
+		ok, fail = MediaToolkit().sequence_download(self.base + "{num}.jpg", self.dir, 1, 10, padding=3, batch=0, pause=0, workers=4)
+		self.assertEqual((ok, fail), (10, 0))
+
+
+if __name__ == "__main__":
+	unittest.main()
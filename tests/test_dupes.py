@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重复文件查找：硬链接不算重复，取消后不再提交排队的哈希
+"""
+
+import os, sys, tempfile, threading, unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from config import SETTINGS
+
+_TMP = tempfile.mkdtemp()
+SETTINGS.update(LOG_DIR_PATH=_TMP, CATALOG_ENABLED=False)
+
+from dupes import DuplicateFinder
+from hashcache import HashCache
+from scanner import walk_files
+
+
+def write(path: Path, data: bytes) -> Path:
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_bytes(data)
+	return path
+
+
+class DuplicateFinderTest(unittest.TestCase):
+	def setUp(self):
+		self.root = Path(tempfile.mkdtemp(dir=_TMP))
+		self.hashes = HashCache(self.root / "hashes.sqlite3")
+
+	def tearDown(self):
+		self.hashes.close()
+
+	def find(self, root: Path, **kwargs):
+		finder = DuplicateFinder(self.hashes, workers=2, block=4096, **kwargs)
+		groups = finder.find(walk_files(root, [".bin"]))
+		return finder, [[r.path.name for r in g] for g in groups]
+
+	@unittest.skipUnless(hasattr(os, "link"), "需要硬链接")
+	def test_hardlinks_are_not_duplicates(self):
+		data = os.urandom(20000)
+		a = write(self.root / "a.bin", data)
+		os.link(a, self.root / "a_link.bin")
+		write(self.root / "b.bin", os.urandom(20000))
+		finder, groups = self.find(self.root)
+		self.assertEqual(groups, [])
+		self.assertEqual(finder.stats["hardlinks"], 1)
+		write(self.root / "c.bin", data)
+		self.assertEqual(self.find(self.root)[1], [["a.bin", "c.bin"]])
+
+	def test_cancel_stops_queued_hashes(self):
+		for i in range(40): write(self.root / f"{i:02d}.bin", bytes([i]) * 10000)
+		cancel, hashed = threading.Event(), []
+		def progress(done, total):
+			hashed.append(done)
+			if done >= 2: cancel.set()
+		finder, groups = self.find(self.root, progress=progress, cancelled=cancel.is_set)
+		self.assertEqual(groups, [])
+		# 最多再收到一个窗口（2×workers）内的结果
+		self.assertLessEqual(max(hashed), 2 + 4)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ED2K 链接块：按字节查找（bytes / mmap）与整体解码后逐行解析的结果对比
+"""
+
+import io, mmap, random, sys, tempfile, unittest, zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from ed2k import links_from_buffer, links_from_file, links_from_text, links_from_zip
+
+HEADER = "115視頻格式離綫下載地址："
+PARTS = ["", "\n", "\r\n", "\r", HEADER, "ed2k://|file|a.mp4|1|X|/", " ed2k://|file|b 視頻|/ ", "說明：", "text", ":",
+	"\u2028", "\x85", "\x0c", "foo" + HEADER + "bar", "論壇導出內容"]
+
+
+def random_text(rng: random.Random, n: int) -> str:
+	return "".join(rng.choice(PARTS) for _ in range(n))
+
+
+class BufferScanTest(unittest.TestCase):
+	def test_random_buffers_match_text_parser(self):
+		rng = random.Random(20240601)
+		for _ in range(5000):
+			data = random_text(rng, rng.randint(0, 30)).encode("utf-8")
+			# 行首插入的非法字节：两种方式都会忽略
+			if rng.random() < 0.2: data = data.replace(b"\n", b"\n\xff", 1)
+			self.assertEqual(links_from_buffer(data, HEADER), links_from_text(data.decode("utf-8", "ignore"), HEADER), data)
+
+	def test_blocks_across_page_boundaries(self):
+		rng = random.Random(7)
+		page = mmap.ALLOCATIONGRANULARITY
+		for offset in (0, 1, page - len(HEADER.encode("utf-8")) // 2, page - 1, 3 * page - 2):
+			# header、链接与块结尾分别跨过映射页边界
+			block = (HEADER + "\n" + "".join(f"ed2k://|file|{i}-視頻.mp4|{i}|X|/\n" for i in range(200)) + "\n")
+			filler = random_text(rng, 50).replace(HEADER, "")
+			data = ("x" * offset).encode("utf-8") + block.encode("utf-8") + filler.encode("utf-8")
+			path = Path(tempfile.mkdtemp()) / "links.txt"
+			path.write_bytes(data)
+			with self.subTest(offset=offset):
+				links = links_from_file(path, HEADER)
+				self.assertEqual(len(links), 200)
+				self.assertEqual(links, links_from_text(data.decode("utf-8"), HEADER))
+
+	def test_large_random_file(self):
+		rng = random.Random(3)
+		text = "".join(random_text(rng, 40) + "\n" for _ in range(3000))
+		path = Path(tempfile.mkdtemp()) / "big.txt"
+		path.write_text(text, encoding="utf-8")
+		self.assertEqual(links_from_file(path, HEADER), links_from_text(text, HEADER))
+
+	def test_invalid_bytes_inside_header_are_not_matched(self):
+		"""整体解码会丢掉非法字节拼出 header，按字节查找不会：这是两者已知的差异"""
+		raw = HEADER.encode("utf-8")
+		data = raw[:6] + b"\xff" + raw[6:] + b"\ned2k://|file|a|/\n"
+		self.assertEqual(links_from_text(data.decode("utf-8", "ignore"), HEADER), ["ed2k://|file|a|/"])
+		self.assertEqual(links_from_buffer(data, HEADER), [])
+
+	def test_empty_and_missing(self):
+		path = Path(tempfile.mkdtemp()) / "empty.txt"
+		path.write_bytes(b"")
+		self.assertEqual(links_from_file(path, HEADER), [])
+		self.assertEqual(links_from_file(path.with_name("missing.txt"), HEADER), [])
+
+
+class ZipScanTest(unittest.TestCase):
+	def test_members_match_text_parser(self):
+		rng = random.Random(11)
+		texts = {f"dir/{i}.txt": random_text(rng, 60) for i in range(5)}
+		buf = io.BytesIO()
+		with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+			for name, text in texts.items(): zf.writestr(name, text.encode("utf-8"))
+			zf.writestr("cover.jpg", b"\xff\xd8")
+		with zipfile.ZipFile(buf) as zf:
+			result = links_from_zip(zf, HEADER)
+		self.assertEqual(result, {name: links_from_text(text, HEADER) for name, text in texts.items()})
+
+
+if __name__ == "__main__":
+	unittest.main()
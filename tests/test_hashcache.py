@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+哈希缓存：大小或 mtime 变化后缓存失效并重新计算；不同 kind 互不影响
+"""
+
+import os, sys, tempfile, unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from hashcache import HashCache, cached_batch, hash_file, partial_hash
+
+
+class HashCacheTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = Path(tempfile.mkdtemp())
+		self.cache = HashCache(self.dir / "hashes.sqlite3")
+		self.addCleanup(self.cache.close)
+		self.file = self.dir / "a.bin"
+		self.file.write_bytes(b"a" * 1000)
+		os.utime(self.file, ns=(10**18, 10**18))
+
+	def test_digest_is_reused_while_unchanged(self):
+		d = self.cache.digest(self.file)
+		self.assertEqual(d, hash_file(self.file))
+		self.assertEqual(self.cache.digest(self.file), d)
+		self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+	def test_size_change_invalidates(self):
+		old = self.cache.digest(self.file)
+		self.file.write_bytes(b"b" * 2000)
+		os.utime(self.file, ns=(10**18, 10**18))  # mtime 不变，只有大小变化
+		self.assertIsNone(self.cache.get(self.file, "full", os.stat(self.file)))
+		self.assertNotEqual(self.cache.digest(self.file), old)
+		self.assertEqual(self.cache.digest(self.file), hash_file(self.file))
+
+	def test_mtime_change_invalidates(self):
+		old = self.cache.digest(self.file)
+		self.file.write_bytes(b"c" * 1000)  # 大小不变
+		os.utime(self.file, ns=(10**18, 10**18 + 1))
+		self.assertIsNone(self.cache.get(self.file, "full", os.stat(self.file)))
+		self.assertNotEqual(self.cache.digest(self.file), old)
+
+	def test_same_size_and_mtime_is_trusted(self):
+		"""已知限制：大小与 mtime 都被还原时沿用旧值（与目录库相同的判断依据）"""
+		old = self.cache.digest(self.file)
+		self.file.write_bytes(b"d" * 1000)
+		os.utime(self.file, ns=(10**18, 10**18))
+		self.assertEqual(self.cache.digest(self.file), old)
+
+	def test_kinds_are_independent(self):
+		st = os.stat(self.file)
+		self.cache.put(self.file, "full", st, "F")
+		self.cache.put(self.file, "partial65536", st, "P")
+		self.assertEqual(self.cache.get(self.file, "full", st), "F")
+		self.assertEqual(self.cache.get(self.file, "partial65536", st), "P")
+		self.assertIsNone(self.cache.get(self.file, "image_size", st))
+
+	def test_cached_batch(self):
+		other = self.dir / "b.bin"; other.write_bytes(b"xyz")
+		calls = []
+		def size_or_none(p):
+			calls.append(p.name)
+			return None if p == other else os.path.getsize(p)
+		paths = [self.file, other, self.dir / "missing.bin"]
+		first = cached_batch(paths, "probe", size_or_none, self.cache, dumps=str, loads=int)
+		self.assertEqual(first, {self.file: 1000, other: None, self.dir / "missing.bin": None})
+		# 第二次全部命中（包括结果为 None 的）
+		self.assertEqual(cached_batch(paths, "probe", size_or_none, self.cache, dumps=str, loads=int), first)
+		self.assertEqual(sorted(calls), ["a.bin", "b.bin"])
+		# 改动后只重新计算变化的文件
+		other.write_bytes(b"longer")
+		cached_batch(paths, "probe", size_or_none, self.cache, dumps=str, loads=int)
+		self.assertEqual(sorted(calls), ["a.bin", "b.bin", "b.bin"])
+
+	def test_partial_hash(self):
+		big = self.dir / "big.bin"
+		big.write_bytes(b"\0" * 300000)
+		before = partial_hash(big, 4096)
+		with open(big, "r+b") as f:
+			f.seek(150000); f.write(b"\1")  # 中间的改动部分哈希看不到
+		self.assertEqual(partial_hash(big, 4096), before)
+		with open(big, "r+b") as f:
+			f.seek(300000 - 10); f.write(b"\1")
+		self.assertNotEqual(partial_hash(big, 4096), before)
+		self.assertEqual(partial_hash(self.file, 4096), partial_hash(self.file, 1 << 20))
+
+
+if __name__ == "__main__":
+	unittest.main()
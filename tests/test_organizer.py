@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体整理：边扫描边移动与先扫描后移动结果一致；中途停止不丢文件、不留半成品，再次运行可继续
+"""
+
+import os, sys, tempfile, threading, unittest
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from config import SETTINGS
+
+_TMP = tempfile.mkdtemp()
+SETTINGS.update(LOG_DIR_PATH=_TMP, ORGANIZE_WORKERS=4, ORGANIZE_QUEUE_SIZE=8)
+
+from PyQt5.QtCore import QCoreApplication
+from organizer import MediaOrganizerWorker
+
+_APP = QCoreApplication.instance() or QCoreApplication([])
+
+
+def build(root: Path, n: int):
+	"""n 个文件分散在多层目录；同名文件会映射到同一目标（先到者移动，后来者留在原处）"""
+	for i in range(n):
+		d = root / f"d{i % 20}" / f"s{i % 7}"
+		d.mkdir(parents=True, exist_ok=True)
+		p = d / f"f{i % 300}.{['jpg', 'mp4', 'txt', 'mp3', 'xyz'][i % 5]}"
+		p.write_bytes(b"x" * 10)
+		os.utime(p, (1e9 + i * 86400 * 3,) * 2)
+
+
+def tree(root: Path):
+	return sorted(str(p.relative_to(root)) for p in root.rglob("*") if p.is_file()) if root.exists() else []
+
+
+def run(src: Path, dst: Path, streaming: bool, stop_after: int = 0):
+	worker = MediaOrganizerWorker(str(src), str(dst), streaming=streaming)
+	events = {"progress": [], "finished": 0, "error": []}
+	worker.progress.connect(events["progress"].append)
+	worker.error.connect(events["error"].append)
+	worker.finished.connect(lambda: events.__setitem__("finished", events["finished"] + 1))
+	if stop_after:
+		moved, lock, move = [0], threading.Lock(), worker._move_to
+		def counted(a, b):
+			move(a, b)
+			with lock:
+				moved[0] += 1
+				if moved[0] == stop_after: worker.stop()
+		worker._move_to = counted
+	worker.run()
+	return events
+
+
+class OrganizerTest(unittest.TestCase):
+	def setUp(self):
+		self.base = Path(tempfile.mkdtemp(dir=_TMP))
+
+	def test_streaming_matches_sequential(self):
+		results = {}
+		for streaming in (False, True):
+			src, dst = self.base / f"src{streaming}", self.base / f"dst{streaming}"
+			build(src, 1500)
+			events = run(src, dst, streaming)
+			self.assertEqual((events["error"], events["finished"]), ([], 1))
+			self.assertEqual(events["progress"][-1], 100)
+			results[streaming] = (tree(src), tree(dst))
+		self.assertEqual(results[False], results[True])
+		self.assertTrue(results[True][1])
+
+	def test_cancel_then_resume(self):
+		src, dst = self.base / "src", self.base / "dst"
+		build(src, 1500)
+		before = len(tree(src))
+		events = run(src, dst, True, stop_after=50)
+		self.assertEqual((events["error"], events["finished"]), ([], 1))
+		self.assertLess(events["progress"][-1], 100)
+		moved, left = tree(dst), tree(src)
+		# 停止后排队中的任务不再执行：只多出在途的几个
+		self.assertTrue(50 <= len(moved) < 50 + 4 + 8 + 1, len(moved))
+		self.assertEqual(len(moved) + len(left), before)
+		self.assertFalse([p for p in moved if p.endswith(".moving")])
+		# 再次运行把剩下的整理完，结果与一次整理完全相同
+		run(src, dst, True)
+		ref_src, ref_dst = self.base / "ref_src", self.base / "ref_dst"
+		build(ref_src, 1500); run(ref_src, ref_dst, False)
+		self.assertEqual((tree(src), tree(dst)), (tree(ref_src), tree(ref_dst)))
+
+	def test_target_inside_source(self):
+		src = self.base / "src"
+		build(src, 300)
+		events = run(src, src / "out", True)
+		self.assertEqual(events["error"], [])
+		moved = tree(src / "out")
+		self.assertTrue(moved)
+		# 移入 out 的文件不会被再次处理
+		self.assertFalse([p for p in moved if p.startswith("out")])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体头部探测：手工构造的 JPEG / PNG / WebP 文件头（有 Pillow 时再与其解码结果对照），
+以及 MP4（tkhd v0/v1、moov 在 mdat 之后）与 Matroska（经 SeekHead 定位 Tracks、未知长度的 Segment）
+"""
+
+import io, struct, sys, tempfile, unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from config import SETTINGS
+
+_TMP = tempfile.mkdtemp()
+SETTINGS.update(LOG_DIR_PATH=_TMP)
+
+from probe import image_size, video_size
+
+try:
+	from PIL import Image, features
+except ImportError:
+	Image = None
+
+
+def write(name: str, data: bytes) -> Path:
+	path = Path(tempfile.mkdtemp(dir=_TMP)) / name
+	path.write_bytes(data)
+	return path
+
+
+def segment(marker: int, payload: bytes) -> bytes:
+	return bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def jpeg(w: int, h: int, sof: int = 0xC0, exif: bytes = b"", fill: bool = False) -> bytes:
+	"""SOI [APP1 EXIF] DQT [DHT] SOFn SOS ... EOI；fill 时在 SOF 标记前塞入填充的 0xFF"""
+	data = b"\xff\xd8"
+	if exif: data += segment(0xE1, b"Exif\0\0" + exif)
+	data += segment(0xDB, b"\0" * 65) + segment(0xC4, b"\0" * 30)
+	data += (b"\xff" * 3 if fill else b"") + segment(sof, struct.pack(">BHHB", 8, h, w, 3) + b"\x01\x22\x00\x02\x11\x01\x03\x11\x01")
+	return data + segment(0xDA, b"\x03" + b"\0" * 9) + b"\x12\x34\xff\x00\x56" + b"\xff\xd9"
+
+
+def png(w: int, h: int) -> bytes:
+	ihdr = struct.pack(">II5B", w, h, 8, 6, 0, 0, 0)
+	return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + b"\0" * 4 + b"\0\0\0\0IEND\xaeB`\x82"
+
+
+def riff(chunk: bytes, payload: bytes) -> bytes:
+	body = b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+	return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def webp_vp8(w: int, h: int) -> bytes:
+	# 帧标记 3 字节 + 起始码 + 14 位宽高（高 2 位是缩放，应被忽略）
+	return riff(b"VP8 ", b"\x50\x02\x00\x9d\x01\x2a" + struct.pack("<HH", w | 0x4000, h | 0x8000) + b"\0" * 20)
+
+
+def webp_vp8l(w: int, h: int) -> bytes:
+	bits = (w - 1) | (h - 1) << 14
+	return riff(b"VP8L", b"\x2f" + struct.pack("<I", bits) + b"\0" * 20)
+
+
+def webp_vp8x(w: int, h: int) -> bytes:
+	return riff(b"VP8X", b"\x10\0\0\0" + (w - 1).to_bytes(3, "little") + (h - 1).to_bytes(3, "little"))
+
+
+class ImageSizeTest(unittest.TestCase):
+	def test_jpeg_variants(self):
+		thumb = jpeg(160, 120)
+		cases = {
+			"baseline.jpg": (jpeg(1920, 1080), (1920, 1080)),
+			"progressive.jpg": (jpeg(800, 1200, sof=0xC2), (800, 1200)),
+			"fill.jpg": (jpeg(640, 480, fill=True), (640, 480)),
+			# EXIF 里带缩略图（自己的 SOF），必须整段跳过
+			"exif.jpg": (jpeg(4000, 3000, exif=b"MM\0*" + b"\0" * 2000 + thumb + b"\0" * 30000), (4000, 3000)),
+			"no_sof.jpg": (b"\xff\xd8" + segment(0xDB, b"\0" * 65) + segment(0xDA, b"\0" * 10) + b"\xff\xd9", None),
+			"truncated.jpg": (jpeg(1920, 1080)[:100], None),
+		}
+		for name, (data, expected) in cases.items():
+			with self.subTest(name=name):
+				self.assertEqual(image_size(write(name, data)), expected)
+
+	def test_png(self):
+		self.assertEqual(image_size(write("a.png", png(1280, 720))), (1280, 720))
+		self.assertIsNone(image_size(write("bad.png", png(1, 1).replace(b"IHDR", b"IDAT"))))
+
+	def test_webp_variants(self):
+		cases = {"lossy.webp": webp_vp8(1000, 600), "lossless.webp": webp_vp8l(16383, 3),
+			"extended.webp": webp_vp8x(16777216, 1)}
+		expected = {"lossy.webp": (1000, 600), "lossless.webp": (16383, 3), "extended.webp": (16777216, 1)}
+		for name, data in cases.items():
+			with self.subTest(name=name):
+				self.assertEqual(image_size(write(name, data)), expected[name])
+
+	def test_unknown_and_empty(self):
+		self.assertIsNone(image_size(write("a.gif", b"GIF89a" + b"\0" * 20)))
+		self.assertIsNone(image_size(write("empty.jpg", b"")))
+		self.assertIsNone(image_size(Path(_TMP) / "missing.jpg"))
+
+	@unittest.skipIf(Image is None, "需要 Pillow")
+	def test_matches_pillow(self):
+		formats = [("JPEG", {}), ("JPEG", {"progressive": True}), ("PNG", {})]
+		if features.check("webp"):
+			# 带 EXIF 的 WebP 使用扩展格式（VP8X）
+			formats += [("WEBP", {"lossless": False}), ("WEBP", {"lossless": True}), ("WEBP", {"exif": b"Exif\0\0MM\0*"})]
+		for fmt, opts in formats:
+			for size in [(1, 1), (333, 217), (4096, 2160)]:
+				img = Image.new("RGBA" if fmt == "WEBP" and opts.get("lossless") else "RGB", size, (10, 20, 30))
+				if fmt == "JPEG":
+					exif = Image.Exif(); exif[0x010F] = "test"
+					opts = dict(opts, exif=exif.tobytes())
+				buf = io.BytesIO(); img.save(buf, fmt, **opts)
+				with self.subTest(fmt=fmt, opts=opts, size=size):
+					self.assertEqual(image_size(write("pil." + fmt.lower(), buf.getvalue())), size)
+
+
+# ------------ 视频 ------------
+def box(typ: bytes, payload: bytes) -> bytes:
+	return struct.pack(">I4s", 8 + len(payload), typ) + payload
+
+
+def tkhd(w: int, h: int, version: int = 0) -> bytes:
+	"""version 0 的时间字段为 32 位（内容 84 字节），version 1 为 64 位（96 字节）；宽高是末尾的 16.16 定点数"""
+	times = b"\0" * (20 if version == 0 else 32)
+	return box(b"tkhd", bytes([version]) + b"\0" * 3 + times + b"\0" * 52 + struct.pack(">II", w << 16, h << 16))
+
+
+def mp4(w: int, h: int, version: int = 0, moov_last: bool = True) -> bytes:
+	"""ftyp + mdat（64 位长度头）+ moov；moov 内先是音轨（0x0）再是视频轨"""
+	moov = box(b"moov", box(b"mvhd", b"\0" * 100) + box(b"trak", tkhd(0, 0, version) + box(b"mdia", b"\0" * 500))
+		+ box(b"trak", tkhd(w, h, version) + box(b"mdia", b"\0" * 50)))
+	mdat = struct.pack(">I4sQ", 1, b"mdat", 16 + 4096) + b"\0" * 4096
+	ftyp = box(b"ftyp", b"isom\0\0\0\0isom")
+	return ftyp + (mdat + moov if moov_last else moov + mdat)
+
+
+def vint(n: int) -> bytes:
+	for length in range(1, 9):
+		if n < (1 << 7 * length) - 1: return ((1 << 7 * length) | n).to_bytes(length, "big")
+	raise ValueError(n)
+
+
+def element(eid: int, payload: bytes) -> bytes:
+	return eid.to_bytes((eid.bit_length() + 7) // 8, "big") + vint(len(payload)) + payload
+
+
+def uint(eid: int, n: int) -> bytes:
+	return element(eid, n.to_bytes(2, "big"))
+
+
+def mkv(w: int, h: int, tracks_after_cluster: bool = False, unknown_segment: bool = False) -> bytes:
+	"""EBML 头 + Segment(SeekHead, Info, Tracks, Cluster)；tracks_after_cluster 时 Tracks 放在 Cluster 之后，只能经 SeekHead 找到"""
+	tracks = element(0x1654AE6B, element(0xAE, uint(0x83, 2)) + element(0xAE, uint(0x83, 1) + element(0xE0, uint(0xB0, w) + uint(0xBA, h))))
+	cluster = element(0x1F43B675, b"\0" * 3000)
+	info = element(0x1549A966, b"\0" * 20)
+	def seekhead(pos: int) -> bytes:
+		return element(0x114D9B74, element(0x4DBB, element(0x53AB, (0x1654AE6B).to_bytes(4, "big")) + element(0x53AC, pos.to_bytes(4, "big"))))
+	if tracks_after_cluster:
+		# SeekPosition 相对于 Segment 内容起点；SeekHead 本身定长
+		body = seekhead(len(seekhead(0)) + len(info) + len(cluster)) + info + cluster + tracks
+	else:
+		body = seekhead(0) + info + tracks + cluster
+	size = b"\x01\xff\xff\xff\xff\xff\xff\xff" if unknown_segment else vint(len(body))
+	return element(0x1A45DFA3, b"\x42\x86\x81\x01") + (0x18538067).to_bytes(4, "big") + size + body
+
+
+class VideoSizeTest(unittest.TestCase):
+	def test_mp4(self):
+		for version in (0, 1):
+			for moov_last in (True, False):
+				with self.subTest(version=version, moov_last=moov_last):
+					self.assertEqual(video_size(write("a.mp4", mp4(3840, 2160, version, moov_last))), (3840, 2160))
+
+	def test_mp4_moov_after_large_mdat(self):
+		"""moov 在 4 GB 以上的 mdat（稀疏文件）之后：只读 box 头就能跳过去"""
+		path = Path(tempfile.mkdtemp(dir=_TMP)) / "big.mp4"
+		with open(path, "wb") as f:
+			f.write(box(b"ftyp", b"isom\0\0\0\0"))
+			f.write(struct.pack(">I4sQ", 1, b"mdat", 16 + 5 * 2**30)); f.seek(5 * 2**30, 1)
+			f.write(box(b"moov", box(b"trak", tkhd(1920, 1080, 1))))
+		self.assertEqual(video_size(path), (1920, 1080))
+
+	def test_mkv(self):
+		cases = {
+			"plain.mkv": (mkv(4096, 1716), (4096, 1716)),
+			"seekhead.mkv": (mkv(1280, 720, tracks_after_cluster=True), (1280, 720)),
+			"unknown.webm": (mkv(3840, 1600, unknown_segment=True), (3840, 1600)),
+			"unknown_seekhead.mkv": (mkv(1920, 1080, True, True), (1920, 1080)),
+		}
+		for name, (data, expected) in cases.items():
+			with self.subTest(name=name):
+				self.assertEqual(video_size(write(name, data)), expected)
+
+	def test_unrecognized(self):
+		self.assertIsNone(video_size(write("bad.mp4", b"garbage" * 10)))
+		self.assertIsNone(video_size(write("audio.mp4", box(b"ftyp", b"M4A \0\0\0\0") + box(b"moov", box(b"trak", tkhd(0, 0))))))
+		self.assertIsNone(video_size(write("cut.mkv", mkv(1920, 1080)[:30])))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨设备移动目录（模拟为不同设备）：内容、符号链接都要完整带到目标
+"""
+
+import os, sys, tempfile, unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from config import SETTINGS
+
+_TMP = tempfile.mkdtemp()
+SETTINGS.update(LOG_DIR_PATH=_TMP)
+
+import transfer
+from transfer import TransferEngine
+
+
+def _can_symlink() -> bool:
+	probe = Path(tempfile.mkdtemp(dir=_TMP)) / "link"
+	try: os.symlink(_TMP, probe, target_is_directory=True)
+	except (OSError, NotImplementedError): return False
+	return True
+
+
+class CrossDeviceMoveTest(unittest.TestCase):
+	def setUp(self):
+		self.base = Path(tempfile.mkdtemp(dir=_TMP))
+		self.src = self.base / "src"
+		(self.src / "sub").mkdir(parents=True)
+		(self.src / "a.jpg").write_bytes(b"a" * 1000)
+		(self.src / "sub" / "b.mp4").write_bytes(b"b" * 5000)
+		patcher = mock.patch.object(transfer, "same_device", lambda a, b: False)
+		patcher.start(); self.addCleanup(patcher.stop)
+
+	def test_tree_is_copied_then_removed(self):
+		dst = self.base / "dst"
+		self.assertEqual(TransferEngine().move(self.src, dst), "copy")
+		self.assertFalse(self.src.exists())
+		self.assertEqual((dst / "sub" / "b.mp4").read_bytes(), b"b" * 5000)
+		self.assertFalse((self.base / "dst.moving").exists())
+
+	@unittest.skipUnless(_can_symlink(), "需要创建符号链接的权限")
+	def test_symlinks_are_recreated(self):
+		outside = self.base / "outside"
+		outside.mkdir(); (outside / "c.jpg").write_bytes(b"c")
+		os.symlink(outside, self.src / "linked_dir", target_is_directory=True)
+		os.symlink("a.jpg", self.src / "alias.jpg")
+		dst = self.base / "dst"
+		TransferEngine().move(self.src, dst)
+		self.assertTrue((dst / "linked_dir").is_symlink())
+		self.assertEqual(os.readlink(dst / "linked_dir"), str(outside))
+		self.assertEqual((dst / "linked_dir" / "c.jpg").read_bytes(), b"c")
+		self.assertEqual(os.readlink(dst / "alias.jpg"), "a.jpg")
+		# 链接指向的目录不受影响
+		self.assertTrue((outside / "c.jpg").exists())
+
+
+if __name__ == "__main__":
+	unittest.main()